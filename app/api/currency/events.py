@@ -0,0 +1,42 @@
+import time
+from datetime import timezone
+
+from app.api.currency.repository.currency_event import NOOP_EVENT
+from app.api.currency.repository.database import currencies_cache
+from app.api.helpers.metrics import metrics
+
+
+class CurrencyEventFeed:
+    """
+    Applies currency events written by any worker to the local caches.
+
+    Lag is measured from the writer's clock, so it includes clock skew between
+    hosts.
+    """
+
+    def __init__(self):
+        self.applied = 0
+        self.last_lag: float = None
+        self.max_lag = 0.0
+
+    def apply(self, event: dict) -> None:
+        if event["action"] == NOOP_EVENT:
+            return
+
+        currencies_cache.clear()
+
+        emitted_at = event["emitted_at"].replace(tzinfo=timezone.utc).timestamp()
+        self.last_lag = max(time.time() - emitted_at, 0.0)
+        self.max_lag = max(self.max_lag, self.last_lag)
+        self.applied += 1
+
+    def stats(self) -> dict:
+        return {
+            "applied": self.applied,
+            "last_lag_ms": None if self.last_lag is None else self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
+
+
+currency_event_feed = CurrencyEventFeed()
+metrics.register("currency_event_feed", currency_event_feed.stats)
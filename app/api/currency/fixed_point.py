@@ -0,0 +1,130 @@
+from decimal import MAX_PREC, ROUND_HALF_EVEN, Context, Decimal
+from typing import Dict, List, Sequence, Tuple
+
+from app.api.currency.rates import RateTable
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+# Amounts are converted in cents, the 2 places every conversion is quantized to.
+MINOR_UNIT_DECIMALS = 2
+MINOR_UNIT_SCALE = 10**MINOR_UNIT_DECIMALS
+
+# Scaling by a power of ten is exact, it must not round to 28 digits.
+EXACT_CONTEXT = Context(prec=MAX_PREC)
+
+
+def to_minor_units(amount: Decimal) -> int:
+    """Round an amount half-even to the cent and scale it to an integer."""
+    return int(
+        Decimal(amount)
+        .scaleb(MINOR_UNIT_DECIMALS, EXACT_CONTEXT)
+        .to_integral_value(ROUND_HALF_EVEN)
+    )
+
+
+def from_minor_units(amount_minor: int) -> Decimal:
+    return Decimal(amount_minor).scaleb(-MINOR_UNIT_DECIMALS, EXACT_CONTEXT)
+
+
+def _divide_half_even(numerator: int, denominator: int) -> int:
+    quotient, remainder = divmod(numerator, denominator)
+    twice_remainder = 2 * remainder
+    if twice_remainder > denominator or (
+        twice_remainder == denominator and quotient % 2
+    ):
+        quotient += 1
+    return quotient
+
+
+class FixedPointRateTable:
+    """
+    Unit rates of a RateTable as exact integer ratios.
+
+    Each Decimal rate is its own numerator / denominator, whatever its digits
+    or magnitude, so
+
+        converted = round_half_even(
+            amount_minor * numerator[target] * denominator[base]
+            / (denominator[target] * numerator[base])
+        )
+
+    is exact for the rates given. The cross rate is never materialized, so a
+    conversion rounds exactly once, on the final cent, and only takes integer
+    operations. Currencies whose rate is not a finite positive number are left
+    out.
+    """
+
+    def __init__(self, rate_table: RateTable):
+        self.rate_table = rate_table
+        self.ratios: Dict[str, Tuple[int, int]] = {
+            iso_4217: rate.as_integer_ratio()
+            for iso_4217, rate in rate_table.rates.items()
+            if rate.is_finite() and rate > 0
+        }
+
+    def ratio_of(self, iso_4217: str) -> Tuple[int, int]:
+        try:
+            return self.ratios[iso_4217]
+        except KeyError:
+            raise CurrencyDoesNotExistException(f"Currency {iso_4217} does not exist")
+
+    def convert_minor(
+        self, amount_minor: int, base_currency: str, target_currency: str
+    ) -> int:
+        base_numerator, base_denominator = self.ratio_of(base_currency)
+        target_numerator, target_denominator = self.ratio_of(target_currency)
+        return _divide_half_even(
+            amount_minor * target_numerator * base_denominator,
+            target_denominator * base_numerator,
+        )
+
+    def convert_many_minor(
+        self,
+        amounts_minor: Sequence[int],
+        base_currencies: Sequence[str],
+        target_currencies: Sequence[str],
+    ) -> List[int]:
+        """
+        Convert column-wise, looking each distinct currency up once.
+
+        The half-even division is inlined, this loop is the batch hot path.
+        """
+        ratios = {
+            iso_4217: self.ratio_of(iso_4217)
+            for iso_4217 in {*base_currencies, *target_currencies}
+        }
+        converted = []
+        append = converted.append
+        for amount_minor, base, target in zip(
+            amounts_minor, base_currencies, target_currencies
+        ):
+            base_numerator, base_denominator = ratios[base]
+            target_numerator, target_denominator = ratios[target]
+            denominator = target_denominator * base_numerator
+            quotient, remainder = divmod(
+                amount_minor * target_numerator * base_denominator, denominator
+            )
+            remainder += remainder
+            if remainder > denominator or (remainder == denominator and quotient & 1):
+                quotient += 1
+            append(quotient)
+        return converted
+
+
+class FixedPointRateTableCache:
+    """The FixedPointRateTable of the latest rate table."""
+
+    def __init__(self):
+        self._table: FixedPointRateTable = None
+
+    def get(self, rate_table: RateTable) -> FixedPointRateTable:
+        table = self._table
+        if table is None or table.rate_table is not rate_table:
+            table = FixedPointRateTable(rate_table)
+            self._table = table
+        return table
+
+    def clear(self) -> None:
+        self._table = None
+
+
+fixed_point_rate_table_cache = FixedPointRateTableCache()
@@ -1,10 +1,13 @@
+from datetime import date
 from decimal import Decimal
+from typing import List, Literal, Optional
 
 from bson.objectid import ObjectId
 from pydantic import BaseModel, Field
-from pydantic.class_validators import validator
+from pydantic.class_validators import root_validator, validator
 
-from app.api.currency.validators import iso_4217_check
+from app.api.currency.validators import finite_amounts_check, iso_4217_check
+from app.settings import settings
 
 
 class PyObjectId(ObjectId):
@@ -86,6 +89,167 @@ class CurrenciesPriceOutputSchema(BaseModel):
         }
 
 
+class CurrenciesBatchConversionInputSchema(BaseModel):
+    amounts: List[Decimal] = Field(
+        ..., min_items=1, max_items=settings.currency_batch_max_items
+    )
+    base_currencies: List[str]
+    target_currencies: List[str]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "amounts": [50.0, 10.5],
+                "base_currencies": ["BRL", "USD"],
+                "target_currencies": ["USD", "EUR"],
+            }
+        }
+
+    _finite_amounts_check = validator("amounts", allow_reuse=True)(finite_amounts_check)
+    _iso_4217_check = validator(
+        "base_currencies", "target_currencies", each_item=True, allow_reuse=True
+    )(iso_4217_check)
+
+    @root_validator(skip_on_failure=True)
+    def check_same_lengths(cls, values):
+        if not (
+            len(values["amounts"])
+            == len(values["base_currencies"])
+            == len(values["target_currencies"])
+        ):
+            raise ValueError(
+                "amounts, base_currencies and target_currencies must have the "
+                "same length."
+            )
+        return values
+
+
+class CurrenciesBatchConversionOutputSchema(BaseModel):
+    amounts: List[float]
+    rates: List[float]
+
+    class Config:
+        schema_extra = {
+            "example": {"amounts": [9.68, 9.64], "rates": [0.193604, 0.918273]}
+        }
+
+
+class CrossRateMatrixOutputSchema(BaseModel):
+    currencies: List[str]
+    rates: List[List[float]]
+
+    class Config:
+        schema_extra = {
+            "example": {"currencies": ["BRL", "USD"], "rates": [[1.0, 0.2], [5.0, 1.0]]}
+        }
+
+
+class RateHistoryPointSchema(BaseModel):
+    date: date
+    rate: Decimal
+
+
+class RateHistoryOutputSchema(BaseModel):
+    base_currency: str
+    iso_4217: str
+    rates: List[RateHistoryPointSchema]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "base_currency": "BRL",
+                "iso_4217": "USD",
+                "rates": [
+                    {"date": "2022-04-28", "rate": "0.2011"},
+                    {"date": "2022-04-29", "rate": "0.2023"},
+                ],
+            }
+        }
+
+
+class RateStatsOutputSchema(BaseModel):
+    base_currency: str
+    iso_4217: str
+    days: int
+    min: float
+    max: float
+    mean: float
+    last: float
+    count: int
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "base_currency": "EUR",
+                "iso_4217": "USD",
+                "days": 30,
+                "min": 1.0712,
+                "max": 1.0987,
+                "mean": 1.0843,
+                "last": 1.0801,
+                "count": 43200,
+            }
+        }
+
+
+class CurrencyBulkOperationSchema(BaseModel):
+    action: Literal["create", "update", "delete"]
+    id: Optional[PyObjectId] = Field(None, alias="_id")
+    name: str = None
+    iso_4217: str = None
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+        schema_extra = {
+            "example": {"action": "create", "name": "real", "iso_4217": "BRL"}
+        }
+
+    _iso_4217_check = validator("iso_4217", allow_reuse=True)(iso_4217_check)
+
+    @root_validator(skip_on_failure=True)
+    def check_action_fields(cls, values):
+        if values["action"] == "create":
+            if values["id"] is not None:
+                raise ValueError("create must not have an _id.")
+            if not values["name"] or not values["iso_4217"]:
+                raise ValueError("create must have a name and an iso_4217.")
+        elif values["id"] is None:
+            raise ValueError(f"{values['action']} must have an _id.")
+        return values
+
+
+class CurrencyBulkInputSchema(BaseModel):
+    operations: List[CurrencyBulkOperationSchema] = Field(
+        ..., min_items=1, max_items=settings.currency_bulk_max_operations
+    )
+
+
+class CurrencyBulkOutputSchema(BaseModel):
+    index: int
+    action: str
+    status_code: int
+    id: Optional[PyObjectId] = Field(None, alias="_id")
+    error_code: Optional[str] = None
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+        schema_extra = {
+            "example": {
+                "index": 0,
+                "action": "create",
+                "status_code": 201,
+                "_id": "62a8f1d1c2a8f1d1c2a8f1d1",
+                "error_code": None,
+            }
+        }
+
+
 class MessageError(BaseModel):
     error_code: str
     error_message: str
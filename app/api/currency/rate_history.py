@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+from app.api.currency.rates import RateTable
+from app.settings import settings
+
+
+class DailyRateTables:
+    """
+    Closing reference rate table of past days, kept for the process lifetime.
+
+    Past days never change, so entries are only evicted, least recently used
+    first, to bound memory. A day without any recorded rate table is kept as
+    None.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._tables: "OrderedDict[date, RateTable]" = OrderedDict()
+
+    def __contains__(self, day: date) -> bool:
+        return day in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def get(self, day: date) -> Optional[RateTable]:
+        rate_table = self._tables.get(day)
+        if rate_table is not None:
+            self._tables.move_to_end(day)
+        return rate_table
+
+    def set(self, day: date, rate_table: Optional[RateTable]) -> None:
+        self._tables[day] = rate_table
+        self._tables.move_to_end(day)
+        while len(self._tables) > self.max_size:
+            self._tables.popitem(last=False)
+
+    def clear(self) -> None:
+        self._tables.clear()
+
+
+daily_rate_tables = DailyRateTables(settings.rate_history_cache_size)
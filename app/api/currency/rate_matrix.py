@@ -0,0 +1,129 @@
+import json
+import math
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from app.api.currency.rates import RateTable
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+
+class RateMatrix:
+    """
+    Every cross rate of a RateTable as a float64 matrix indexed by ordinal.
+
+        matrix[ordinals[base], ordinals[target]] == rate(base, target)
+
+    Rates are float64, about 15 significant digits; amounts are converted by
+    the integer kernel in fixed_point. Currencies whose rate is not a finite
+    positive float64 are left out, so no cross rate is infinite or NaN.
+    """
+
+    def __init__(self, rate_table: RateTable):
+        self.rate_table = rate_table
+        float_rates = {
+            iso_4217: float(rate) for iso_4217, rate in rate_table.rates.items()
+        }
+        float_rates = {
+            iso_4217: rate
+            for iso_4217, rate in float_rates.items()
+            if math.isfinite(rate) and rate > 0
+        }
+        self.currencies: Tuple[str, ...] = tuple(sorted(float_rates))
+        self.ordinals: Dict[str, int] = {
+            iso_4217: ordinal for ordinal, iso_4217 in enumerate(self.currencies)
+        }
+        unit_rates = np.array([float_rates[iso_4217] for iso_4217 in self.currencies])
+        self.matrix: np.ndarray = unit_rates[np.newaxis, :] / unit_rates[:, np.newaxis]
+
+    def __contains__(self, iso_4217: str) -> bool:
+        return iso_4217 in self.ordinals
+
+    def ordinals_of(self, currencies: Sequence[str]) -> np.ndarray:
+        """
+        Map currency codes to ordinals, looking up each distinct code once.
+
+        :raises CurrencyDoesNotExistException: for a code missing from the table
+        """
+        codes, inverse = np.unique(
+            np.asarray(currencies, dtype=str), return_inverse=True
+        )
+        try:
+            ordinals = np.array(
+                [self.ordinals[iso_4217] for iso_4217 in codes.tolist()],
+                dtype=np.intp,
+            )
+        except KeyError as exception:
+            raise CurrencyDoesNotExistException(
+                f"Currency {exception.args[0]} does not exist"
+            )
+        return ordinals[inverse]
+
+    def cross_rates(
+        self, base_currencies: Sequence[str], target_currencies: Sequence[str]
+    ) -> np.ndarray:
+        """Rate of every base -> target pair, gathered in one indexed read."""
+        return self.matrix[
+            self.ordinals_of(base_currencies), self.ordinals_of(target_currencies)
+        ]
+
+
+class RateMatrixCache:
+    """The RateMatrix of the latest rate table, rebuilt when the table changes."""
+
+    def __init__(self):
+        self._rate_matrix: RateMatrix = None
+
+    def get(self, rate_table: RateTable) -> RateMatrix:
+        rate_matrix = self._rate_matrix
+        if rate_matrix is None or rate_matrix.rate_table is not rate_table:
+            rate_matrix = RateMatrix(rate_table)
+            self._rate_matrix = rate_matrix
+        return rate_matrix
+
+    def clear(self) -> None:
+        self._rate_matrix = None
+
+
+class CrossRateMatrixJSONCache:
+    """
+    Serialized cross-rate matrix of the saved currencies.
+
+    The bytes are reused until the rate table or the set of saved currencies
+    changes, so repeated requests skip both the matrix slicing and the JSON
+    encoding.
+    """
+
+    def __init__(self, rate_matrices: RateMatrixCache):
+        self._rate_matrices = rate_matrices
+        self._cached: Tuple[RateTable, Tuple[str, ...], bytes] = None
+
+    def get(self, rate_table: RateTable, currencies: Sequence[str]) -> bytes:
+        """
+        :return: JSON with `currencies` and `rates`, where rates[i][j] is the
+            price of one currencies[i] in currencies[j]
+        """
+        currencies = tuple(currencies)
+        cached = self._cached
+        if cached is not None and cached[0] is rate_table and cached[1] == currencies:
+            return cached[2]
+
+        rate_matrix = self._rate_matrices.get(rate_table)
+        ordinals = rate_matrix.ordinals_of(currencies)
+        content = json.dumps(
+            {
+                "currencies": list(currencies),
+                "rates": rate_matrix.matrix[np.ix_(ordinals, ordinals)].tolist(),
+            },
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self._cached = (rate_table, currencies, content)
+        return content
+
+    def clear(self) -> None:
+        self._cached = None
+
+
+rate_matrix_cache = RateMatrixCache()
+cross_rate_matrix_json_cache = CrossRateMatrixJSONCache(rate_matrix_cache)
@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def period_starts(day: date) -> Dict[str, date]:
+    """First day of every rollup period `day` belongs to, weeks start on Monday."""
+    return {
+        DAY: day,
+        WEEK: day - timedelta(days=day.weekday()),
+        MONTH: day.replace(day=1),
+    }
+
+
+def cover_window(start: date, end: date) -> List[Tuple[str, date]]:
+    """
+    Split start..end into the fewest rollup periods that fit in it.
+
+    Weeks may straddle months, so taking the largest period first is not
+    always best: a Monday week running into a whole month would split it into
+    days. The fewest periods are found by walking the days backwards, each day
+    keeping the best of a day, a week or a month starting on it.
+
+    :param start: first day, included
+    :param end: last day, included
+
+    :return: (period, first day) of each rollup, in order
+    """
+    days_count = (end - start).days + 1
+    if days_count <= 0:
+        return []
+
+    # fewest[offset]: (count, period, length) of the best cover of the days
+    # from start + offset, ties going to the longer first period
+    fewest: List[Tuple[int, str, int]] = [(0, DAY, 0)] * (days_count + 1)
+    for offset in range(days_count - 1, -1, -1):
+        day = start + timedelta(days=offset)
+        candidates = [(DAY, 1)]
+        if day.weekday() == 0:
+            candidates.append((WEEK, 7))
+        if day.day == 1:
+            candidates.append((MONTH, (_next_month(day) - day).days))
+        fewest[offset] = min(
+            (
+                (fewest[offset + length][0] + 1, period, length)
+                for period, length in candidates
+                if offset + length <= days_count
+            ),
+            key=lambda cover: (cover[0], -cover[2]),
+        )
+
+    periods = []
+    offset = 0
+    while offset < days_count:
+        _, period, length = fewest[offset]
+        periods.append((period, start + timedelta(days=offset)))
+        offset += length
+    return periods
+
+
+def merge_rate_stats(rate_stats: Iterable[Dict]) -> Optional[Dict]:
+    """
+    Merge the stats of one currency over several rollups.
+
+    :param rate_stats: min, max, sum, count, last and last_at of each rollup
+
+    :return: min, max, mean, last and count of the whole window, None when
+        nothing was recorded
+    """
+    merged = None
+    for stats in rate_stats:
+        if merged is None:
+            merged = dict(stats)
+            continue
+        merged["min"] = min(merged["min"], stats["min"])
+        merged["max"] = max(merged["max"], stats["max"])
+        merged["sum"] += stats["sum"]
+        merged["count"] += stats["count"]
+        if stats["last_at"] > merged["last_at"]:
+            merged["last"] = stats["last"]
+            merged["last_at"] = stats["last_at"]
+
+    if merged is None:
+        return None
+    return dict(
+        min=merged["min"],
+        max=merged["max"],
+        mean=merged["sum"] / merged["count"],
+        last=merged["last"],
+        count=merged["count"],
+    )
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+from typing import Dict, Iterable, Set
+
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+# Provider rates carry about 6 significant digits, 18 keeps the division exact
+# enough that only the final 2-place quantization rounds.
+CROSS_RATE_CONTEXT = Context(prec=18, rounding=ROUND_HALF_EVEN)
+
+# A cross rate inherits the relative error of both reference rates, so an amount
+# converted from it may differ from the provider's direct 2-place answer by one
+# unit in the last place plus this relative share of the amount.
+CROSS_RATE_RELATIVE_TOLERANCE = Decimal("2e-6")
+
+
+class RateTable:
+    """
+    Unit rates of every currency against a single reference currency.
+
+    Any base -> target rate is derived locally by triangulation, so one upstream
+    snapshot serves every base currency:
+
+        rate(base, target) = rates[target] / rates[base]
+    """
+
+    def __init__(
+        self, reference: str, rates: Dict[str, Decimal], fetched_at: float = None
+    ):
+        self.reference = reference
+        self.rates = dict(rates)
+        self.rates[reference] = Decimal(1)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def __contains__(self, iso_4217: str) -> bool:
+        return iso_4217 in self.rates
+
+    def age(self) -> float:
+        return max(time.time() - self.fetched_at, 0.0)
+
+    def cross_rate(self, base_currency: str, target_currency: str) -> Decimal:
+        try:
+            base_rate = self.rates[base_currency]
+            target_rate = self.rates[target_currency]
+        except KeyError:
+            raise CurrencyDoesNotExistException
+        return CROSS_RATE_CONTEXT.divide(target_rate, base_rate)
+
+    def rebase(self, reference: str) -> "RateTable":
+        if reference == self.reference:
+            return self
+        return RateTable(reference, self.rates_for(reference), self.fetched_at)
+
+    def rates_for(
+        self, base_currency: str, currencies_list: Iterable[str] = None
+    ) -> Dict[str, Decimal]:
+        """
+        Get the unit rates against `base_currency`.
+
+        :param base_currency: Base currency, the reference when omitted
+
+        :param currencies_list: Targets to price, every known one when omitted
+
+        :return: rates by iso_4217
+        """
+        base_currency = base_currency or self.reference
+        if base_currency not in self.rates:
+            raise CurrencyDoesNotExistException
+
+        if currencies_list is None:
+            currencies_list = self.rates
+        return {
+            iso_4217: self.cross_rate(base_currency, iso_4217)
+            for iso_4217 in currencies_list
+            if iso_4217 in self.rates
+        }
+
+
+class RateSnapshot:
+    """Latest reference rate table of this worker, shared by every request."""
+
+    def __init__(self):
+        self.rate_table: RateTable = None
+        self.revalidation: asyncio.Task = None
+        # Held until done, the event loop only keeps weak references to tasks.
+        self.history_recordings: Set[asyncio.Task] = set()
+
+    def clear(self) -> None:
+        self.rate_table = None
+        self.revalidation = None
+        self.history_recordings = set()
+
+
+rate_snapshot = RateSnapshot()
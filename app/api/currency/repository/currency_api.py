@@ -1,12 +1,33 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from decimal import Decimal
-from typing import Dict, List
+from functools import partial
+from typing import List, Set
 
-import httpx
+from pymongo.errors import PyMongoError
 
+from app.api.currency.rates import RateTable, rate_snapshot
+from app.api.currency.repository.providers import (
+    RatesProviderRouter,
+    build_rates_provider_router,
+)
+from app.api.currency.repository.rate_history import RateHistoryRepository
+from app.api.currency.repository.rate_rollup import RateRollupRepository
+from app.api.currency.repository.rate_snapshot import RateSnapshotRepository
+from app.api.currency.shared_rates import shared_rates
+from app.api.currency.symbols import currency_symbols
 from app.api.helpers.exception import ExternalAPIUnreachableException
+from app.api.helpers.metrics import metrics
+from app.api.helpers.singleflight import SingleFlight
+from app.db.mongodb import AsyncIOMotorClient, db
 from app.settings import Settings, settings
 
+upstream_calls = SingleFlight()
+rates_providers = build_rates_provider_router(settings)
+metrics.register("currency_api_upstream_calls", upstream_calls.stats)
+metrics.register("currency_api_providers", rates_providers.stats)
+metrics.register("currency_rates_shared_memory", shared_rates.stats)
+
 
 class CurrencyExternalAPIRepositoryAbstract(ABC):
     @abstractmethod
@@ -14,66 +35,287 @@ class CurrencyExternalAPIRepositoryAbstract(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_currencies_price(
-        self, base_currency: str, currencies_list: List[str], amount: Decimal
-    ) -> List[Dict]:
+    def get_unknown_currencies(self, iso_4217_codes: Set[str]) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_symbols(self) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rate_table(self) -> RateTable:
+        raise NotImplementedError
+
+    @abstractmethod
+    def refresh_rate_table(self) -> RateTable:
         raise NotImplementedError
 
     @abstractmethod
     def _url_builder(
         self,
-        currencies_list: List[str],
-        amount: Decimal = None,
+        currencies_list: List[str] = None,
         base_currency: str = None,
     ) -> str:
         raise NotImplementedError
 
 
 class CurrencyExternalAPIRepository(CurrencyExternalAPIRepositoryAbstract):
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        conn: AsyncIOMotorClient = None,
+        providers: RatesProviderRouter = None,
+    ):
         self._settings = settings
+        self._conn = conn
+        self._providers = providers or rates_providers
+        self.rate_table: RateTable = None
+        self.rates_stale = False
+
+    @property
+    def rate_snapshot_repository(self) -> RateSnapshotRepository:
+        conn = self._conn or db.client
+        if conn is None:
+            return None
+        return RateSnapshotRepository(self._settings, conn)
+
+    @property
+    def rate_history_repository(self) -> RateHistoryRepository:
+        conn = self._conn or db.client
+        if conn is None:
+            return None
+        return RateHistoryRepository(self._settings, conn)
+
+    @property
+    def rate_rollup_repository(self) -> RateRollupRepository:
+        conn = self._conn or db.client
+        if conn is None:
+            return None
+        return RateRollupRepository(self._settings, conn)
+
+    async def check_if_currency_exist(self, iso_4217: str) -> bool:
+        """
+        Check iso_4217 against the cached currency symbols.
+
+        Only the first call of a cold worker reaches the external API.
+
+        :param iso_4217: Currency code
+
+        :return: True when the external API knows the currency
+        """
+        if not currency_symbols.is_loaded:
+            await currency_symbols.refresh(self.get_symbols)
+
+        if iso_4217 in currency_symbols:
+            return True
+
+        if iso_4217 not in currency_symbols.unknown:
+            currency_symbols.unknown.set(iso_4217, True)
+            currency_symbols.request_refresh(self.get_symbols)
+        return False
+
+    async def get_unknown_currencies(self, iso_4217_codes: Set[str]) -> Set[str]:
+        """
+        Check a batch of iso_4217 codes against the cached currency symbols.
+
+        :param iso_4217_codes: Currency codes
+
+        :return: the codes the external API does not know
+        """
+        return {
+            iso_4217
+            for iso_4217 in iso_4217_codes
+            if not await self.check_if_currency_exist(iso_4217)
+        }
+
+    async def get_symbols(self) -> Set[str]:
+        return await upstream_calls.do("symbols", self._providers.get_symbols)
+
+    async def get_rate_table(self) -> RateTable:
+        """
+        Get the rates of every currency against `currency_reference_base`.
 
-    async def check_if_currency_exist(self, iso_4217: str):
-        url_query = f"{settings.currency_api_url}/latest?symbols={iso_4217}"
-        async with httpx.AsyncClient() as client:
+        Every base currency is derived from this table, so a single upstream
+        request serves them all. The in-memory snapshot is served while it is
+        younger than `currency_rates_max_staleness`; past
+        `currency_rates_refresh_interval` it is revalidated in background, past
+        the max staleness the request waits for a fresh one.
+
+        When the external API cannot be reached (or its circuit is open), the last
+        known good snapshot is served whatever its age and `rates_stale` is set.
+
+        On multi-worker nodes the snapshot published in shared memory by the
+        elected worker is adopted first when it is newer. The elected worker's
+        refresher keeps that snapshot fresh, so the other workers don't
+        revalidate it and only fetch one themselves past the max staleness.
+
+        :return: reference rate table
+        """
+        if shared_rates.is_attached:
+            self._keep_newest_rate_table(shared_rates.read())
+
+        rate_table = rate_snapshot.rate_table
+        if (
+            rate_table is None
+            or rate_table.age() > self._settings.currency_rates_max_staleness
+        ):
             try:
-                response = await client.get(url_query)
-                rates = response.json()["rates"]
-                if len(rates) != 1:
-                    return False
-                return True
-            except httpx.RequestError:
-                raise ExternalAPIUnreachableException
-
-    async def get_currencies_price(
-        self,
-        currencies_list: List[str],
-        amount: Decimal = None,
-        base_currency: str = None,
-    ) -> List[Dict]:
-        url_query = self._url_builder(currencies_list, amount, base_currency)
-        async with httpx.AsyncClient() as client:
+                rate_table = await self.refresh_rate_table()
+            except ExternalAPIUnreachableException:
+                rate_table = rate_snapshot.rate_table
+                if (
+                    rate_table is None
+                    or not self._settings.currency_api_serve_stale_when_unavailable
+                ):
+                    raise
+                self.rates_stale = True
+        elif rate_table.age() > self._settings.currency_rates_refresh_interval and not (
+            shared_rates.is_attached and not shared_rates.is_leader
+        ):
+            self._revalidate_rate_table()
+
+        self.rate_table = rate_table
+        return rate_table
+
+    async def refresh_rate_table(self) -> RateTable:
+        """
+        Replace the in-memory snapshot with the freshest reference rate table.
+
+        Snapshots stored in Mongo by any worker are read first, the external API
+        is only called when the newest one is older than
+        `currency_rates_refresh_interval`, and its answer is stored for the
+        other workers.
+
+        :return: reference rate table
+        """
+        rate_table = await self._get_shared_rate_table()
+        if (
+            rate_table is None
+            or rate_table.age() > self._settings.currency_rates_refresh_interval
+        ):
             try:
-                response = await client.get(url_query)
-                rates = response.json()["rates"]
+                fetched_rate_table = await self._fetch_rate_table()
+            except ExternalAPIUnreachableException:
+                self._keep_newest_rate_table(rate_table)
+                raise
+            await self._save_shared_rate_table(fetched_rate_table)
+            self._schedule_rate_history(fetched_rate_table)
+            rate_table = fetched_rate_table
+
+        self._keep_newest_rate_table(rate_table)
+        if shared_rates.is_leader:
+            try:
+                shared_rates.publish(rate_snapshot.rate_table)
+            except ValueError:
+                logging.warning("Could not publish currency rates to shared memory")
+        return rate_snapshot.rate_table
+
+    async def _fetch_rate_table(self) -> RateTable:
+        """
+        Fetch the reference rate table from the fastest healthy provider.
 
-                return rates
-            except httpx.RequestError:
-                raise ExternalAPIUnreachableException
+        Concurrent calls share a single upstream request, keyed by the
+        normalized query.
+
+        :return: reference rate table
+        """
+        reference = self._settings.currency_reference_base
+        return await upstream_calls.do(
+            self._url_builder(base_currency=reference),
+            partial(self._providers.get_rate_table, reference),
+        )
+
+    @staticmethod
+    def _keep_newest_rate_table(rate_table: RateTable) -> None:
+        current = rate_snapshot.rate_table
+        if rate_table is not None and (
+            current is None or rate_table.fetched_at >= current.fetched_at
+        ):
+            rate_snapshot.rate_table = rate_table
+
+    async def _get_shared_rate_table(self) -> RateTable:
+        rate_snapshot_repository = self.rate_snapshot_repository
+        if rate_snapshot_repository is None:
+            return None
+        try:
+            return await asyncio.wait_for(
+                rate_snapshot_repository.get_latest_rate_table(
+                    self._settings.currency_reference_base
+                ),
+                timeout=self._settings.rate_snapshot_timeout,
+            )
+        except (PyMongoError, asyncio.TimeoutError):
+            logging.warning("Could not read shared currency rates")
+            return None
+
+    async def _save_shared_rate_table(self, rate_table: RateTable) -> None:
+        rate_snapshot_repository = self.rate_snapshot_repository
+        if rate_snapshot_repository is None:
+            return
+        try:
+            await asyncio.wait_for(
+                rate_snapshot_repository.save_rate_table(rate_table),
+                timeout=self._settings.rate_snapshot_timeout,
+            )
+        except (PyMongoError, asyncio.TimeoutError):
+            logging.warning("Could not share currency rates")
+
+    async def _record_rate_history(self, rate_table: RateTable) -> None:
+        repositories = [
+            repository
+            for repository in (
+                self.rate_history_repository,
+                self.rate_rollup_repository,
+            )
+            if repository is not None
+        ]
+        if not repositories or not self._settings.rate_history_enabled:
+            return
+        try:
+            # The raw snapshot and its rollups are written side by side.
+            await asyncio.wait_for(
+                asyncio.gather(
+                    *(
+                        repository.record_rate_table(rate_table)
+                        for repository in repositories
+                    )
+                ),
+                timeout=self._settings.rate_snapshot_timeout,
+            )
+        except (PyMongoError, asyncio.TimeoutError):
+            logging.warning("Could not record currency rates history")
+
+    def _schedule_rate_history(self, rate_table: RateTable) -> None:
+        # The history insert and the rollup writes run in background, a request
+        # that had to fetch the rates does not wait for them.
+        recording = asyncio.create_task(self._record_rate_history(rate_table))
+        rate_snapshot.history_recordings.add(recording)
+        recording.add_done_callback(rate_snapshot.history_recordings.discard)
+
+    def _revalidate_rate_table(self) -> None:
+        revalidation = rate_snapshot.revalidation
+        if revalidation is not None and not revalidation.done():
+            return
+
+        async def revalidate() -> None:
+            try:
+                await self.refresh_rate_table()
+            except ExternalAPIUnreachableException:
+                logging.warning("Could not revalidate currency rates")
+
+        rate_snapshot.revalidation = asyncio.create_task(revalidate())
 
     def _url_builder(
         self,
-        currencies_list: List[str],
-        amount: Decimal = None,
+        currencies_list: List[str] = None,
         base_currency: str = None,
     ) -> str:
-        str_currencies = ",".join(currencies_list)
-        url_query = (
-            f"{settings.currency_api_url}/latest?symbols={str_currencies}&places=2"
-        )
-        if amount:
-            str_amount = str(Decimal(amount).quantize(Decimal("1.00")))
-            url_query += f"&amount={str_amount}"
+        url_query = f"{settings.currency_api_url}/latest"
+        query_params = []
+        if currencies_list:
+            query_params.append(f"symbols={','.join(currencies_list)}")
         if base_currency:
-            url_query += f"&base={base_currency}"
+            query_params.append(f"base={base_currency}")
+        if query_params:
+            url_query += f"?{'&'.join(query_params)}"
         return url_query
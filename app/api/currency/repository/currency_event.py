@@ -0,0 +1,85 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+import pymongo
+from bson.objectid import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from app.db.mongodb import AsyncIOMotorClient
+from app.settings import Settings
+
+CREATE_EVENT = "create"
+UPDATE_EVENT = "update"
+DELETE_EVENT = "delete"
+BULK_EVENT = "bulk"
+NOOP_EVENT = "noop"
+
+
+class CurrencyEventRepositoryAbstract(ABC):
+    @abstractmethod
+    def create_collection(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_event(self, action: str, _id: ObjectId) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_last_event_id(self) -> ObjectId:
+        raise NotImplementedError
+
+    @abstractmethod
+    def tail(self, after_id: ObjectId = None):
+        raise NotImplementedError
+
+
+class CurrencyEventRepository(CurrencyEventRepositoryAbstract):
+    """Writes on the currencies collection, as a capped change feed."""
+
+    def __init__(self, settings: Settings, conn: AsyncIOMotorClient):
+        self.conn = conn
+        self._settings = settings
+        self._database_name = (
+            settings.mongo_test_database_name
+            if settings.test
+            else settings.mongo_database_name
+        )
+
+    @property
+    def _collection(self):
+        return self.conn[self._database_name][
+            self._settings.currency_event_collection_name
+        ]
+
+    async def create_collection(self) -> None:
+        try:
+            await self.conn[self._database_name].create_collection(
+                self._settings.currency_event_collection_name,
+                capped=True,
+                size=self._settings.currency_event_collection_size,
+                max=self._settings.currency_event_collection_max,
+            )
+        except CollectionInvalid:
+            return
+        # A tailable cursor on an empty capped collection dies immediately.
+        await self.append_event(NOOP_EVENT)
+
+    async def append_event(self, action: str, _id: ObjectId = None) -> None:
+        await self._collection.insert_one(
+            {
+                "action": action,
+                "currency_id": _id,
+                "emitted_at": datetime.now(timezone.utc),
+            }
+        )
+
+    async def get_last_event_id(self) -> ObjectId:
+        row = await self._collection.find_one(
+            {}, {"_id": 1}, sort=[("$natural", pymongo.DESCENDING)]
+        )
+        return None if row is None else row["_id"]
+
+    def tail(self, after_id: ObjectId = None):
+        query = {} if after_id is None else {"_id": {"$gt": after_id}}
+        return self._collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
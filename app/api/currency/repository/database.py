@@ -1,14 +1,100 @@
+import json
 from abc import ABC, abstractmethod
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 
+import pymongo
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 
 from app.api.currency.model import CurrencySchema
+from app.api.helpers.cache import TTLCache
+from app.api.helpers.exception import (
+    CurrencyAlreadyExistException,
+    CurrencyDoesNotExistException,
+)
 from app.db.mongodb import AsyncIOMotorClient
-from app.settings import Settings
+from app.db.mongodb_utils import get_read_preference
+from app.settings import Settings, settings
+
+CURRENCIES_CACHE_KEY = "currencies"
+CURRENCY_PROJECTION = {"_id": 1, "name": 1, "iso_4217": 1}
+
+
+def currency_from_row(row: dict) -> CurrencySchema:
+    """Build a CurrencySchema from a stored row, which was validated on write."""
+    return CurrencySchema.construct(
+        id=row["_id"], name=row["name"], iso_4217=row["iso_4217"]
+    )
+
+
+def _currency_to_jsonable(row: dict) -> dict:
+    return {"_id": str(row["_id"]), "name": row["name"], "iso_4217": row["iso_4217"]}
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def currencies_to_json(rows: List[dict]) -> bytes:
+    """Serialize stored rows the way the List[CurrencySchema] response does."""
+    return _dumps([_currency_to_jsonable(row) for row in rows])
+
+
+def currency_to_ndjson(row: dict) -> bytes:
+    """Serialize one stored row as a newline terminated JSON line."""
+    return _dumps(_currency_to_jsonable(row)) + b"\n"
+
+
+class CurrenciesCacheEntry:
+    """The currencies collection with lookups by iso_4217 and _id."""
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+        self.currencies: List[CurrencySchema] = [currency_from_row(row) for row in rows]
+        self.by_iso_4217: Dict[str, dict] = {row["iso_4217"]: row for row in rows}
+        self.by__id: Dict[ObjectId, dict] = {row["_id"]: row for row in rows}
+        self._json: bytes = None
+
+    @property
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = currencies_to_json(self.rows)
+        return self._json
+
+
+currencies_cache = TTLCache(settings.currency_cache_ttl)
+
+
+class CurrencyIndexes:
+    """
+    Whether the unique iso_4217 index is known to exist.
+
+    Until it is, writes check iso_4217 themselves: the index may still be
+    building, or fail to build on a collection holding duplicates.
+    """
+
+    def __init__(self):
+        self.unique_iso_4217 = False
+
+    def clear(self) -> None:
+        self.unique_iso_4217 = False
+
+
+currency_indexes = CurrencyIndexes()
 
 
 class CurrencyRepositoryAbstract(ABC):
+    @abstractmethod
+    def create_indexes(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def has_unique_iso_4217_index(self) -> bool:
+        raise NotImplementedError
+
     @abstractmethod
     def get_currency_by_iso_4217(self, iso_4217: str) -> dict:
         raise NotImplementedError
@@ -21,6 +107,24 @@ class CurrencyRepositoryAbstract(ABC):
     def get_currencies(self) -> List[CurrencySchema]:
         raise NotImplementedError
 
+    @abstractmethod
+    def get_currencies_json(self) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_currencies_page_json(
+        self, limit: int, after: Optional[ObjectId] = None
+    ) -> Tuple[bytes, Optional[ObjectId]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_currencies_ndjson(self) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def invalidate_currencies_cache(self) -> None:
+        raise NotImplementedError
+
     @abstractmethod
     def create_currency(self, name: str, iso_4217: str) -> CurrencySchema:
         raise NotImplementedError
@@ -35,6 +139,18 @@ class CurrencyRepositoryAbstract(ABC):
     def delete_currency(self, _id: ObjectId) -> CurrencySchema:
         raise NotImplementedError
 
+    @abstractmethod
+    def get_iso_4217_by__id(self, ids: List[ObjectId]) -> Dict[ObjectId, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_existing_iso_4217(self, iso_4217_set: Set[str]) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_write(self, requests: list) -> Dict[int, int]:
+        raise NotImplementedError
+
 
 class CurrencyRepository(CurrencyRepositoryAbstract):
     def __init__(self, settings: Settings, conn: AsyncIOMotorClient):
@@ -45,49 +161,272 @@ class CurrencyRepository(CurrencyRepositoryAbstract):
             if settings.test
             else settings.mongo_database_name
         )
+        # The currencies cache is always filled from the primary, so it never
+        # caches a lagging secondary's view of a write it was invalidated for.
+        self._list_read_preference = get_read_preference(settings.mongo_read_preference)
+
+    @property
+    def _collection(self):
+        return self.conn[self._database_name][self._settings.currency_collection_name]
+
+    async def create_indexes(self) -> None:
+        await self._collection.create_index(
+            [("iso_4217", pymongo.ASCENDING)], unique=True
+        )
+        currency_indexes.unique_iso_4217 = True
+
+    async def has_unique_iso_4217_index(self) -> bool:
+        """
+        Check the unique iso_4217 index exists, asking Mongo until it does.
+
+        :return: whether the index rejects duplicated iso_4217
+        """
+        if not currency_indexes.unique_iso_4217:
+            try:
+                index_information = await self._collection.index_information()
+            except PyMongoError:
+                return False
+            currency_indexes.unique_iso_4217 = any(
+                index.get("unique") and [key for key, _ in index["key"]] == ["iso_4217"]
+                for index in index_information.values()
+            )
+        return currency_indexes.unique_iso_4217
+
+    async def _check_iso_4217_is_free(
+        self, iso_4217: str, _id: Optional[ObjectId] = None
+    ) -> None:
+        if await self.has_unique_iso_4217_index():
+            return
+        query = {"iso_4217": iso_4217}
+        if _id is not None:
+            query["_id"] = {"$ne": _id}
+        if await self._collection.find_one(query, {"_id": 1}):
+            raise CurrencyAlreadyExistException
 
     async def get_currency_by_iso_4217(self, iso_4217: str) -> dict:
+        cache_entry = currencies_cache.get(CURRENCIES_CACHE_KEY)
+        if cache_entry is not None:
+            row = cache_entry.by_iso_4217.get(iso_4217)
+            return None if row is None else dict(row)
+
         return await self.conn[self._database_name][
             self._settings.currency_collection_name
         ].find_one({"iso_4217": iso_4217})
 
     async def get_currency_by__id(self, _id: ObjectId) -> dict:
+        cache_entry = currencies_cache.get(CURRENCIES_CACHE_KEY)
+        if cache_entry is not None:
+            row = cache_entry.by__id.get(_id)
+            return None if row is None else dict(row)
 
         return await self.conn[self._database_name][
             self._settings.currency_collection_name
         ].find_one({"_id": _id})
 
     async def get_currencies(self, query={}) -> List[CurrencySchema]:
+        """
+        List currencies.
+
+        The whole collection is read through an in-process cache, invalidated by
+        writes and expired after `currency_cache_ttl` seconds; filtered queries
+        always reach the database.
+
+        :param query: Mongo filter
+
+        :return: list of currency
+        """
+        if not query:
+            return list((await self._get_currencies_cache_entry()).currencies)
+
         currencies: List[CurrencySchema] = []
 
-        rows = self.conn[self._database_name][
-            self._settings.currency_collection_name
-        ].find(query)
+        rows = self._find_currencies(query, self._list_read_preference)
 
         async for row in rows:  # pragma: no cover
-            currencies.append(CurrencySchema(**row))  # pragma: no cover
+            currencies.append(currency_from_row(row))  # pragma: no cover
 
         return currencies  # pragma: no cover
 
+    async def get_currencies_json(self) -> bytes:
+        """
+        List currencies as a JSON array, serialized once per cache fill.
+
+        :return: UTF-8 encoded JSON
+        """
+        return (await self._get_currencies_cache_entry()).json
+
+    async def get_currencies_page_json(
+        self, limit: int, after: Optional[ObjectId] = None
+    ) -> Tuple[bytes, Optional[ObjectId]]:
+        """
+        List one page of currencies ordered by _id.
+
+        Pages are read by keyset on the _id index, so any page costs the same
+        as the first one.
+
+        :param limit: page size
+        :param after: _id of the last currency of the previous page
+
+        :return: the page as a JSON array and the _id to continue after, if any
+        """
+        query = {} if after is None else {"_id": {"$gt": after}}
+        rows = (
+            await self._find_currencies(query, self._list_read_preference)
+            .sort("_id", pymongo.ASCENDING)
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+        if len(rows) <= limit:
+            return currencies_to_json(rows), None
+
+        rows = rows[:limit]
+        return currencies_to_json(rows), rows[-1]["_id"]
+
+    async def stream_currencies_ndjson(self, query={}) -> AsyncIterator[bytes]:
+        """
+        Stream currencies as NDJSON, one line per row as the cursor yields it.
+
+        Rows are never collected, so memory stays flat whatever the collection
+        size. The currencies cache is bypassed.
+
+        :param query: Mongo filter
+
+        :return: async iterator of UTF-8 encoded JSON lines
+        """
+        async for row in self._find_currencies(query, self._list_read_preference):
+            yield currency_to_ndjson(row)
+
+    def _find_currencies(self, query: dict, read_preference=None):
+        collection = self.conn[self._database_name][
+            self._settings.currency_collection_name
+        ]
+        if read_preference is not None:
+            collection = collection.with_options(read_preference=read_preference)
+        return collection.find(
+            query,
+            CURRENCY_PROJECTION,
+            batch_size=self._settings.currency_cursor_batch_size,
+        )
+
+    async def _get_currencies_cache_entry(self) -> CurrenciesCacheEntry:
+        cache_entry = currencies_cache.get(CURRENCIES_CACHE_KEY)
+        if cache_entry is None:
+            generation = currencies_cache.generation
+            rows = self._find_currencies({})
+            cache_entry = CurrenciesCacheEntry([row async for row in rows])
+            # Skipped when a write invalidated the cache while reading.
+            currencies_cache.set(CURRENCIES_CACHE_KEY, cache_entry, generation)
+        return cache_entry
+
+    def invalidate_currencies_cache(self) -> None:
+        currencies_cache.invalidate(CURRENCIES_CACHE_KEY)
+
     async def create_currency(
         self, new_currency_schema: CurrencySchema
     ) -> CurrencySchema:
         currency_dict = dict(
             name=new_currency_schema.name, iso_4217=new_currency_schema.iso_4217
         )
-        await self.conn[self._database_name][
-            self._settings.currency_collection_name
-        ].insert_one(currency_dict)
+        await self._check_iso_4217_is_free(currency_dict["iso_4217"])
+        try:
+            await self.conn[self._database_name][
+                self._settings.currency_collection_name
+            ].insert_one(currency_dict)
+        except DuplicateKeyError:
+            raise CurrencyAlreadyExistException
 
         return CurrencySchema(**currency_dict)
 
     async def update_currency(self, _id: str, update_dict) -> CurrencySchema:
-
-        await self.conn[self._database_name][
+        collection = self.conn[self._database_name][
             self._settings.currency_collection_name
-        ].find_one_and_update({"_id": ObjectId(_id)}, {"$set": update_dict})
+        ]
+        if not update_dict:
+            currency = await collection.find_one({"_id": ObjectId(_id)})
+            if not currency:
+                raise CurrencyDoesNotExistException
+            return CurrencySchema(**currency)
+
+        query = {"_id": ObjectId(_id)}
+        if "iso_4217" in update_dict:
+            await self._check_iso_4217_is_free(update_dict["iso_4217"], ObjectId(_id))
+            # Renaming a currency to its own iso_4217 is a conflict as well.
+            query["iso_4217"] = {"$ne": update_dict["iso_4217"]}
+
+        try:
+            currency = await collection.find_one_and_update(
+                query, {"$set": update_dict}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise CurrencyAlreadyExistException
 
-    async def delete_currency(self, _id: ObjectId) -> None:
-        await self.conn[self._database_name][
+        if not currency:
+            if "iso_4217" in query and await collection.find_one(
+                {"_id": ObjectId(_id)}, {"_id": 1}
+            ):
+                raise CurrencyAlreadyExistException
+            raise CurrencyDoesNotExistException
+
+        return CurrencySchema(**currency)
+
+    async def delete_currency(self, _id: ObjectId) -> CurrencySchema:
+        currency = await self.conn[self._database_name][
             self._settings.currency_collection_name
         ].find_one_and_delete({"_id": ObjectId(_id)})
+
+        if not currency:
+            raise CurrencyDoesNotExistException
+
+        return CurrencySchema(**currency)
+
+    async def get_iso_4217_by__id(self, ids: List[ObjectId]) -> Dict[ObjectId, str]:
+        """
+        Read the iso_4217 of many currencies in one query.
+
+        :param ids: currency _ids
+
+        :return: iso_4217 by _id, for the currencies that exist
+        """
+        return {
+            row["_id"]: row["iso_4217"]
+            async for row in self._find_currencies({"_id": {"$in": ids}})
+        }
+
+    async def get_existing_iso_4217(self, iso_4217_set: Set[str]) -> Set[str]:
+        """
+        Read which iso_4217 are already saved, in one query.
+
+        :param iso_4217_set: iso_4217 codes
+
+        :return: the saved ones
+        """
+        return {
+            row["iso_4217"]
+            async for row in self._find_currencies(
+                {"iso_4217": {"$in": list(iso_4217_set)}}
+            )
+        }
+
+    async def bulk_write(self, requests: list) -> Dict[int, int]:
+        """
+        Run write requests as one unordered bulk write.
+
+        A failing request does not stop the others.
+
+        :param requests: pymongo InsertOne, UpdateOne and DeleteOne requests
+
+        :return: Mongo error code by index of the requests that failed
+        """
+        if not requests:
+            return {}
+
+        try:
+            await self.conn[self._database_name][
+                self._settings.currency_collection_name
+            ].bulk_write(requests, ordered=False)
+        except BulkWriteError as exception:
+            return {
+                error["index"]: error["code"]
+                for error in exception.details["writeErrors"]
+            }
+        return {}
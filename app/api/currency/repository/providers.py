@@ -0,0 +1,254 @@
+import time
+from abc import ABC, abstractmethod
+from decimal import Decimal, InvalidOperation
+from typing import Awaitable, Callable, Dict, List, Set, TypeVar
+
+import httpx
+
+from app.api.currency.rates import RateTable
+from app.api.helpers.circuit_breaker import CircuitBreaker
+from app.api.helpers.exception import (
+    ExternalAPICircuitOpenException,
+    ExternalAPIUnreachableException,
+)
+from app.http_client.client_utils import get_or_open_http_client
+from app.settings import Settings
+
+T = TypeVar("T")
+
+# Weight of the newest sample in the latency moving average.
+LATENCY_EWMA_ALPHA = 0.2
+
+STUB_RATES = {
+    "BRL": "5.2285",
+    "EUR": "1",
+    "GBP": "0.8412",
+    "JPY": "137.2",
+    "USD": "1.0545",
+}
+
+
+class RatesProviderAbstract(ABC):
+    name: str
+
+    @abstractmethod
+    def get_symbols(self) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rate_table(self, reference: str) -> RateTable:
+        raise NotImplementedError
+
+
+class HTTPRatesProvider(RatesProviderAbstract):
+    def __init__(self, settings: Settings, url: str, client: httpx.AsyncClient = None):
+        self._settings = settings
+        self.url = url
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_or_open_http_client()
+
+    async def _get(self, url_query: str) -> dict:
+        """
+        Get a JSON object from the provider.
+
+        Any answer the parsers can't use, a non-2xx status, a non-JSON body or
+        a JSON value other than an object, is treated as the provider being
+        unreachable so the router fails over and the breaker counts it.
+        """
+        try:
+            response = await self.client.get(
+                url_query, timeout=self._settings.currency_api_timeout
+            )
+        except httpx.RequestError:
+            raise ExternalAPIUnreachableException
+        if not response.is_success:
+            raise ExternalAPIUnreachableException
+        try:
+            body = response.json()
+        except ValueError:
+            raise ExternalAPIUnreachableException
+        if not isinstance(body, dict):
+            raise ExternalAPIUnreachableException
+        return body
+
+    @staticmethod
+    def _mapping(response: dict, key: str) -> dict:
+        # Error answers such as {"success": false, ...} come with a 200.
+        value = response.get(key)
+        if not isinstance(value, dict):
+            raise ExternalAPIUnreachableException
+        return value
+
+    @staticmethod
+    def _rate_table(reference: str, rates: Dict[str, float]) -> RateTable:
+        try:
+            return RateTable(
+                reference,
+                {iso_4217: Decimal(str(rate)) for iso_4217, rate in rates.items()},
+            )
+        except InvalidOperation:
+            raise ExternalAPIUnreachableException
+
+
+class ExchangeRateHostProvider(HTTPRatesProvider):
+    """https://exchangerate.host"""
+
+    name = "exchangerate_host"
+
+    async def get_symbols(self) -> Set[str]:
+        response = await self._get(f"{self.url}/symbols")
+        return set(self._mapping(response, "symbols"))
+
+    async def get_rate_table(self, reference: str) -> RateTable:
+        response = await self._get(f"{self.url}/latest?base={reference}")
+        return self._rate_table(
+            response.get("base", reference), self._mapping(response, "rates")
+        )
+
+
+class FrankfurterProvider(HTTPRatesProvider):
+    """https://www.frankfurter.app"""
+
+    name = "frankfurter"
+
+    async def get_symbols(self) -> Set[str]:
+        response = await self._get(f"{self.url}/currencies")
+        return set(response)
+
+    async def get_rate_table(self, reference: str) -> RateTable:
+        response = await self._get(f"{self.url}/latest?from={reference}")
+        return self._rate_table(
+            response.get("base", reference), self._mapping(response, "rates")
+        )
+
+
+class StubRatesProvider(RatesProviderAbstract):
+    """Fixed rates against EUR, for tests and offline development."""
+
+    name = "stub"
+
+    def __init__(self, rates: Dict[str, str] = None):
+        self.rates = {
+            iso_4217: Decimal(rate) for iso_4217, rate in (rates or STUB_RATES).items()
+        }
+
+    async def get_symbols(self) -> Set[str]:
+        return set(self.rates)
+
+    async def get_rate_table(self, reference: str) -> RateTable:
+        return RateTable("EUR", self.rates).rebase(reference)
+
+
+class TrackedRatesProvider:
+    """A provider with its own circuit breaker, latency and error counters."""
+
+    def __init__(self, provider: RatesProviderAbstract, breaker: CircuitBreaker):
+        self.provider = provider
+        self.breaker = breaker
+        self.latency: float = None
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    def sort_key(self):
+        # Breakers taking calls first, a due half-open probe included so a
+        # recovered provider gets its rank back, then the fastest; unmeasured
+        # ones get a chance.
+        return (not self.breaker.accepts_calls, self.latency or 0.0)
+
+    async def call(self, call: Callable[[RatesProviderAbstract], Awaitable[T]]) -> T:
+        started_at = time.perf_counter()
+        self.calls += 1
+        try:
+            result = await self.breaker.call(lambda: call(self.provider))
+        except ExternalAPICircuitOpenException:
+            raise
+        except ExternalAPIUnreachableException:
+            self.errors += 1
+            raise
+
+        elapsed = time.perf_counter() - started_at
+        self.latency = (
+            elapsed
+            if self.latency is None
+            else LATENCY_EWMA_ALPHA * elapsed + (1 - LATENCY_EWMA_ALPHA) * self.latency
+        )
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "latency_ms": None if self.latency is None else self.latency * 1000,
+            "calls": self.calls,
+            "errors": self.errors,
+            **self.breaker.stats(),
+        }
+
+
+class RatesProviderRouter:
+    """
+    Route every call to the fastest healthy provider.
+
+    Providers are tried by breaker state and latency moving average; when one
+    fails the next one is tried. The call fails only when every provider did.
+    """
+
+    def __init__(self, providers: List[TrackedRatesProvider]):
+        self.providers = providers
+
+    async def call(self, call: Callable[[RatesProviderAbstract], Awaitable[T]]) -> T:
+        error: ExternalAPIUnreachableException = None
+        for provider in sorted(self.providers, key=TrackedRatesProvider.sort_key):
+            try:
+                return await provider.call(call)
+            except ExternalAPICircuitOpenException as exception:
+                error = error or exception
+            except ExternalAPIUnreachableException as exception:
+                error = exception
+        raise error or ExternalAPIUnreachableException
+
+    async def get_symbols(self) -> Set[str]:
+        return await self.call(lambda provider: provider.get_symbols())
+
+    async def get_rate_table(self, reference: str) -> RateTable:
+        return await self.call(lambda provider: provider.get_rate_table(reference))
+
+    def reset(self) -> None:
+        for provider in self.providers:
+            provider.breaker.reset()
+            provider.latency = None
+
+    def stats(self) -> dict:
+        return {provider.name: provider.stats() for provider in self.providers}
+
+
+def build_rates_provider(settings: Settings, name: str) -> RatesProviderAbstract:
+    if name == ExchangeRateHostProvider.name:
+        return ExchangeRateHostProvider(settings, settings.currency_api_url)
+    if name == FrankfurterProvider.name:
+        return FrankfurterProvider(settings, settings.currency_api_frankfurter_url)
+    if name == StubRatesProvider.name:
+        return StubRatesProvider()
+    raise ValueError(f"Unknown currency rates provider: {name}")
+
+
+def build_rates_provider_router(settings: Settings) -> RatesProviderRouter:
+    return RatesProviderRouter(
+        [
+            TrackedRatesProvider(
+                build_rates_provider(settings, name),
+                CircuitBreaker(
+                    failure_rate_threshold=settings.currency_api_breaker_failure_rate,
+                    window_size=settings.currency_api_breaker_window_size,
+                    minimum_calls=settings.currency_api_breaker_minimum_calls,
+                    open_timeout=settings.currency_api_breaker_open_timeout,
+                ),
+            )
+            for name in settings.currency_api_providers
+        ]
+    )
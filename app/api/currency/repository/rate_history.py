@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict
+
+import pymongo
+from bson.decimal128 import Decimal128, create_decimal128_context
+from pymongo.errors import CollectionInvalid
+
+from app.api.currency.rates import RateTable
+from app.db.mongodb import AsyncIOMotorClient
+from app.settings import Settings
+
+DECIMAL128_CONTEXT = create_decimal128_context()
+
+
+class RateHistoryRepositoryAbstract(ABC):
+    @abstractmethod
+    def create_collection(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_rate_table(self, rate_table: RateTable) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_daily_rate_tables(
+        self, reference: str, start: date, end: date
+    ) -> Dict[date, RateTable]:
+        raise NotImplementedError
+
+
+class RateHistoryRepository(RateHistoryRepositoryAbstract):
+    """
+    Every fetched reference rate table, in a time-series collection.
+
+    A snapshot stores its currencies and rates as two aligned arrays, sorted by
+    currency, rather than one field per currency. Rates are Decimal128, exact
+    to 34 digits.
+    """
+
+    def __init__(self, settings: Settings, conn: AsyncIOMotorClient):
+        self.conn = conn
+        self._settings = settings
+        self._database_name = (
+            settings.mongo_test_database_name
+            if settings.test
+            else settings.mongo_database_name
+        )
+
+    @property
+    def _collection(self):
+        return self.conn[self._database_name][
+            self._settings.rate_history_collection_name
+        ]
+
+    async def create_collection(self) -> None:
+        try:
+            await self.conn[self._database_name].create_collection(
+                self._settings.rate_history_collection_name,
+                timeseries={
+                    "timeField": "fetched_at",
+                    "metaField": "reference",
+                    "granularity": "hours",
+                },
+            )
+        except CollectionInvalid:
+            pass
+        await self._collection.create_index(
+            [("reference", pymongo.ASCENDING), ("fetched_at", pymongo.ASCENDING)]
+        )
+
+    async def record_rate_table(self, rate_table: RateTable) -> None:
+        currencies = sorted(rate_table.rates)
+        await self._collection.insert_one(
+            {
+                "reference": rate_table.reference,
+                "fetched_at": datetime.fromtimestamp(
+                    rate_table.fetched_at, tz=timezone.utc
+                ),
+                "currencies": currencies,
+                "rates": [
+                    Decimal128(
+                        DECIMAL128_CONTEXT.create_decimal(rate_table.rates[iso_4217])
+                    )
+                    for iso_4217 in currencies
+                ],
+            }
+        )
+
+    async def get_daily_rate_tables(
+        self, reference: str, start: date, end: date
+    ) -> Dict[date, RateTable]:
+        """
+        Get the last rate table recorded on each UTC day from start to end.
+
+        :param reference: reference currency of the rate tables
+        :param start: first day, included
+        :param end: last day, included
+
+        :return: rate table by day, for the days with a recorded one
+        """
+        rows = self._collection.aggregate(
+            [
+                {
+                    "$match": {
+                        "reference": reference,
+                        "fetched_at": {
+                            "$gte": datetime.combine(start, time(), timezone.utc),
+                            "$lt": datetime.combine(
+                                end + timedelta(days=1), time(), timezone.utc
+                            ),
+                        },
+                    }
+                },
+                {"$sort": {"fetched_at": pymongo.ASCENDING}},
+                {
+                    "$group": {
+                        "_id": {"$dateTrunc": {"date": "$fetched_at", "unit": "day"}},
+                        "fetched_at": {"$last": "$fetched_at"},
+                        "currencies": {"$last": "$currencies"},
+                        "rates": {"$last": "$rates"},
+                    }
+                },
+            ]
+        )
+        return {
+            row["_id"].date(): RateTable(
+                reference,
+                {
+                    iso_4217: rate.to_decimal()
+                    for iso_4217, rate in zip(row["currencies"], row["rates"])
+                },
+                fetched_at=row["fetched_at"].replace(tzinfo=timezone.utc).timestamp(),
+            )
+            async for row in rows
+        }
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timezone
+from typing import Dict, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.api.currency.rate_rollup import period_starts
+from app.api.currency.rates import RateTable
+from app.db.mongodb import AsyncIOMotorClient
+from app.settings import Settings
+
+DUPLICATE_KEY_ERROR_CODE = 11000
+# Snapshots each rollup remembers having taken. One recorded again after this
+# many newer ones reached the same rollup would count twice; writes time out
+# in seconds, long before that.
+APPLIED_SNAPSHOTS_KEPT = 256
+
+
+class RateRollupRepositoryAbstract(ABC):
+    @abstractmethod
+    def record_rate_table(self, rate_table: RateTable) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rate_stats(
+        self, reference: str, iso_4217: str, periods: List[Tuple[str, date]]
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+
+class RateRollupRepository(RateRollupRepositoryAbstract):
+    """
+    Daily, weekly and monthly stats of every currency against the reference.
+
+    Each snapshot updates the three rollups it falls in with $min, $max and $inc,
+    so the stats of a window are merged from a few documents. A rollup keeps
+    the fetched_at of the snapshots it took and skips those, so snapshots from
+    several workers are all counted whatever the order they land in, and none
+    is counted twice.
+    """
+
+    def __init__(self, settings: Settings, conn: AsyncIOMotorClient):
+        self.conn = conn
+        self._settings = settings
+        self._database_name = (
+            settings.mongo_test_database_name
+            if settings.test
+            else settings.mongo_database_name
+        )
+
+    @property
+    def _collection(self):
+        return self.conn[self._database_name][
+            self._settings.rate_rollup_collection_name
+        ]
+
+    @staticmethod
+    def _rollup_id(reference: str, period: str, start: date) -> Dict:
+        return {
+            "reference": reference,
+            "period": period,
+            "start": datetime.combine(start, time(), timezone.utc),
+        }
+
+    async def record_rate_table(self, rate_table: RateTable) -> None:
+        fetched_at = datetime.fromtimestamp(rate_table.fetched_at, tz=timezone.utc)
+        update = {
+            "$min": {},
+            "$max": {},
+            "$inc": {},
+            "$push": {
+                "snapshots": {"$each": [fetched_at], "$slice": -APPLIED_SNAPSHOTS_KEPT}
+            },
+        }
+        for iso_4217, rate in rate_table.rates.items():
+            rate = float(rate)
+            update["$min"][f"rates.{iso_4217}.min"] = rate
+            update["$max"][f"rates.{iso_4217}.max"] = rate
+            update["$inc"][f"rates.{iso_4217}.sum"] = rate
+            update["$inc"][f"rates.{iso_4217}.count"] = 1
+            # Documents compare on their first field, so the newest snapshot
+            # stays the latest even when an older one lands after it.
+            update["$max"][f"rates.{iso_4217}.latest"] = {
+                "at": fetched_at,
+                "rate": rate,
+            }
+
+        try:
+            await self._collection.bulk_write(
+                [
+                    UpdateOne(
+                        {
+                            "_id": self._rollup_id(rate_table.reference, period, start),
+                            "snapshots": {"$ne": fetched_at},
+                        },
+                        update,
+                        upsert=True,
+                    )
+                    for period, start in period_starts(fetched_at.date()).items()
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as exception:
+            # A rollup that already took this snapshot matches no document, so
+            # its upsert collides with the existing _id: nothing left to apply.
+            if any(
+                error["code"] != DUPLICATE_KEY_ERROR_CODE
+                for error in exception.details["writeErrors"]
+            ) or exception.details.get("writeConcernErrors"):
+                raise
+
+    async def get_rate_stats(
+        self, reference: str, iso_4217: str, periods: List[Tuple[str, date]]
+    ) -> List[Dict]:
+        """
+        Get the stats of one currency in the given rollups.
+
+        :param reference: reference currency of the rollups
+        :param iso_4217: currency
+        :param periods: (period, first day) of each rollup
+
+        :return: min, max, sum, count, last and last_at of each rollup holding
+            the currency
+        """
+        rows = self._collection.find(
+            {
+                "_id": {
+                    "$in": [
+                        self._rollup_id(reference, period, start)
+                        for period, start in periods
+                    ]
+                }
+            },
+            {f"rates.{iso_4217}": True},
+        )
+        return [
+            self._rate_stats(row["rates"][iso_4217])
+            async for row in rows
+            if iso_4217 in row.get("rates", {})
+        ]
+
+    @staticmethod
+    def _rate_stats(stats: Dict) -> Dict:
+        return {
+            "min": stats["min"],
+            "max": stats["max"],
+            "sum": stats["sum"],
+            "count": stats["count"],
+            "last": stats["latest"]["rate"],
+            "last_at": stats["latest"]["at"],
+        }
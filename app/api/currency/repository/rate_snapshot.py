@@ -0,0 +1,78 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pymongo
+
+from app.api.currency.rates import RateTable
+from app.db.mongodb import AsyncIOMotorClient
+from app.db.mongodb_utils import get_read_preference
+from app.settings import Settings
+
+
+class RateSnapshotRepositoryAbstract(ABC):
+    @abstractmethod
+    def create_indexes(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_latest_rate_table(self, reference: str) -> RateTable:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_rate_table(self, rate_table: RateTable) -> None:
+        raise NotImplementedError
+
+
+class RateSnapshotRepository(RateSnapshotRepositoryAbstract):
+    """Rate tables shared by every worker, expired by a TTL index."""
+
+    def __init__(self, settings: Settings, conn: AsyncIOMotorClient):
+        self.conn = conn
+        self._settings = settings
+        self._database_name = (
+            settings.mongo_test_database_name
+            if settings.test
+            else settings.mongo_database_name
+        )
+
+    @property
+    def _collection(self):
+        return self.conn[self._database_name][
+            self._settings.rate_snapshot_collection_name
+        ]
+
+    async def create_indexes(self) -> None:
+        await self._collection.create_index(
+            "fetched_at", expireAfterSeconds=self._settings.rate_snapshot_ttl
+        )
+        await self._collection.create_index(
+            [("reference", pymongo.ASCENDING), ("fetched_at", pymongo.DESCENDING)]
+        )
+
+    async def get_latest_rate_table(self, reference: str) -> RateTable:
+        # Snapshots carry their own fetched_at, so a lagging secondary is fine.
+        row = await self._collection.with_options(
+            read_preference=get_read_preference(self._settings.mongo_read_preference)
+        ).find_one({"reference": reference}, sort=[("fetched_at", pymongo.DESCENDING)])
+        if row is None:
+            return None
+
+        return RateTable(
+            row["reference"],
+            {iso_4217: Decimal(rate) for iso_4217, rate in row["rates"].items()},
+            fetched_at=row["fetched_at"].replace(tzinfo=timezone.utc).timestamp(),
+        )
+
+    async def save_rate_table(self, rate_table: RateTable) -> None:
+        await self._collection.insert_one(
+            {
+                "reference": rate_table.reference,
+                "rates": {
+                    iso_4217: str(rate) for iso_4217, rate in rate_table.rates.items()
+                },
+                "fetched_at": datetime.fromtimestamp(
+                    rate_table.fetched_at, tz=timezone.utc
+                ),
+            }
+        )
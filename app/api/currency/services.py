@@ -1,32 +1,87 @@
 """
 isort:skip_file
 """
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from bson.objectid import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import PyMongoError
+from starlette.status import (
+    HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
+    HTTP_500_INTERNAL_SERVER_ERROR,
+)
 
 from app.api.currency.model import (
+    CurrenciesBatchConversionInputSchema,
     CurrenciesPriceOutputSchema,
+    CurrencyBulkOperationSchema,
     CurrencySchema,
     CurrencyUpdateInputSchema,
 )
+from app.api.currency.fixed_point import (
+    MINOR_UNIT_SCALE,
+    fixed_point_rate_table_cache,
+    from_minor_units,
+    to_minor_units,
+)
+from app.api.currency.rate_history import daily_rate_tables
+from app.api.currency.rate_rollup import cover_window, merge_rate_stats
+from app.api.currency.rate_matrix import (
+    cross_rate_matrix_json_cache,
+    rate_matrix_cache,
+)
 from app.api.currency.repository.currency_api import CurrencyExternalAPIRepository
+from app.api.currency.repository.currency_event import (
+    BULK_EVENT,
+    CREATE_EVENT,
+    DELETE_EVENT,
+    UPDATE_EVENT,
+    CurrencyEventRepository,
+)
 from app.api.currency.repository.database import CurrencyRepository
+from app.api.currency.repository.rate_history import RateHistoryRepository
+from app.api.currency.repository.rate_rollup import RateRollupRepository
 from app.api.helpers.exception import (
     CurrencyAlreadyExistException,
     CurrencyDoesNotExistException,
+    DomainException,
+    InvalidDateRangeException,
     NoCurrencyFoundException,
+    NoRateRecordedException,
 )
+from app.api.helpers.pagination import decode_page_cursor, encode_page_cursor
 from app.db.mongodb import AsyncIOMotorClient
 from app.settings import Settings
 
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+_WriteOp = Union[InsertOne, UpdateOne, DeleteOne]
+
 
 class CurrencyServiceAbstract(ABC):
     @abstractmethod
     def get_currencies(self):
         raise NotImplementedError
 
+    @abstractmethod
+    def get_currencies_json(self) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_currencies_page_json(
+        self, limit: int, next_token: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_currencies_ndjson(self) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
     @abstractmethod
     def create_currency(self, new_currency_schema: CurrencySchema):
         raise NotImplementedError
@@ -35,6 +90,26 @@ class CurrencyServiceAbstract(ABC):
     def get_currencies_price(self, CurrenciesPriceInputSchema) -> List[Dict]:
         raise NotImplementedError
 
+    @abstractmethod
+    def convert_batch(
+        self, batch_conversion: CurrenciesBatchConversionInputSchema
+    ) -> Tuple[List[float], np.ndarray]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_cross_rate_matrix_json(self) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rate_history(
+        self, iso_4217: str, base_currency: str, start: date, end: date
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rate_stats(self, iso_4217: str, days: int) -> Dict:
+        raise NotImplementedError
+
     @abstractmethod
     def update_currency(
         self, _id: str, update_currency_schema: CurrencyUpdateInputSchema
@@ -45,34 +120,54 @@ class CurrencyServiceAbstract(ABC):
     async def delete_currency(self, _id: ObjectId) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    def bulk_currencies(
+        self, operations: List[CurrencyBulkOperationSchema]
+    ) -> List[Dict]:
+        raise NotImplementedError
+
 
 class CurrencyService(CurrencyServiceAbstract):
     def __init__(self, conn: AsyncIOMotorClient, settings: Settings):
+        self.settings = settings
         self.currency_repository = CurrencyRepository(settings, conn)
-        self.currency_external_api_repository = CurrencyExternalAPIRepository(settings)
+        self.currency_event_repository = CurrencyEventRepository(settings, conn)
+        self.currency_external_api_repository = CurrencyExternalAPIRepository(
+            settings, conn
+        )
+        self.rate_history_repository = RateHistoryRepository(settings, conn)
+        self.missing_rates: List[str] = []
+        self.rate_rollup_repository = RateRollupRepository(settings, conn)
 
     async def get_currencies(self) -> List[CurrencySchema]:
         return await self.currency_repository.get_currencies()
 
-    async def create_currency(
-        self, new_currency_schema: CurrencySchema
-    ) -> CurrencySchema:  # noqa
-        await self.__check_if_iso_4217_exists(new_currency_schema.iso_4217)
+    async def get_currencies_json(self) -> bytes:
+        return await self.currency_repository.get_currencies_json()
 
-        currency: CurrencySchema = (
-            await self.currency_repository.get_currency_by_iso_4217(
-                new_currency_schema.iso_4217
-            )
+    async def get_currencies_page_json(
+        self, limit: int, next_token: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        after = None if next_token is None else decode_page_cursor(next_token)
+        content, last_id = await self.currency_repository.get_currencies_page_json(
+            limit, after
         )
+        return content, None if last_id is None else encode_page_cursor(last_id)
 
-        is_currency_already_created = currency is not None
+    def stream_currencies_ndjson(self) -> AsyncIterator[bytes]:
+        return self.currency_repository.stream_currencies_ndjson()
 
-        if is_currency_already_created:
-            raise CurrencyAlreadyExistException
+    async def create_currency(
+        self, new_currency_schema: CurrencySchema
+    ) -> CurrencySchema:  # noqa
+        await self.__check_if_iso_4217_exists(new_currency_schema.iso_4217)
 
-        return await self.currency_repository.create_currency(
+        # The unique index on iso_4217 rejects already created currencies.
+        currency = await self.currency_repository.create_currency(
             new_currency_schema
         )  # no qa
+        await self.__currencies_changed(CREATE_EVENT, currency.id)
+        return currency
 
     async def get_currencies_price(
         self, CurrenciesPriceInputSchema
@@ -86,60 +181,394 @@ class CurrencyService(CurrencyServiceAbstract):
         if len(currencies) == 0:
             raise NoCurrencyFoundException
 
-        currencies_iso4217 = [item.iso_4217 for item in currencies]
-        currencies_price = (
-            await self.currency_external_api_repository.get_currencies_price(
-                currencies_iso4217,
-                CurrenciesPriceInputSchema.amount,
-                CurrenciesPriceInputSchema.base_currency,
-            )
-        )
+        rate_table = await self.currency_external_api_repository.get_rate_table()
+        rates = fixed_point_rate_table_cache.get(rate_table)
+        base_currency = CurrenciesPriceInputSchema.base_currency
+        # Only checks the base has a usable rate: without one the whole request
+        # fails with CurrencyDoesNotExistException, not each currency.
+        rates.ratio_of(base_currency)
+        amount_minor = to_minor_units(CurrenciesPriceInputSchema.amount)
         response_list = []
 
         for currency in currencies:
+            if currency.iso_4217 not in rates.ratios:
+                # The provider serving this table does not price it, the other
+                # currencies are still answered.
+                self.missing_rates.append(currency.iso_4217)
+                continue
             response_list.append(
                 CurrenciesPriceOutputSchema(
                     name=currency.name,
                     iso_4217=currency.iso_4217,
-                    amount=currencies_price[currency.iso_4217],
+                    amount=from_minor_units(
+                        rates.convert_minor(
+                            amount_minor, base_currency, currency.iso_4217
+                        )
+                    ),
                 )
             )
 
         return response_list
 
-    async def update_currency(
-        self, _id: str, update_currency_schema: CurrencyUpdateInputSchema
-    ) -> None:
-        update_dict: dict = await self.currency_repository.get_currency_by__id(
-            ObjectId(_id)
+    async def convert_batch(
+        self, batch_conversion: CurrenciesBatchConversionInputSchema
+    ) -> Tuple[List[float], np.ndarray]:
+        """
+        Convert many amounts between any pair of currencies in one pass.
+
+        Only the rate table is needed, so the currencies do not have to be
+        saved.
+
+        :param batch_conversion: amounts and currency pairs, as columns
+
+        :return: the converted amounts and the rates used, as columns
+        """
+        amounts = batch_conversion.amounts
+        base_currencies = batch_conversion.base_currencies
+        target_currencies = batch_conversion.target_currencies
+
+        rate_table = await self.currency_external_api_repository.get_rate_table()
+        rates = rate_matrix_cache.get(rate_table).cross_rates(
+            base_currencies, target_currencies
+        )
+        converted_minor = fixed_point_rate_table_cache.get(
+            rate_table
+        ).convert_many_minor(
+            [to_minor_units(amount) for amount in amounts],
+            base_currencies,
+            target_currencies,
         )
+        return [amount / MINOR_UNIT_SCALE for amount in converted_minor], rates
 
-        if not update_dict:
-            raise CurrencyDoesNotExistException
-        del update_dict["_id"]
-        if update_currency_schema.iso_4217:
-            await self.__check_if_iso_4217_exists(update_currency_schema.iso_4217)
+    async def get_cross_rate_matrix_json(self) -> bytes:
+        """
+        Price every saved currency in every other saved currency.
 
-            currency = await self.currency_repository.get_currency_by_iso_4217(
-                update_currency_schema.iso_4217
+        :return: the serialized matrix, reused while neither the rate table nor
+            the saved currencies change
+        """
+        currencies: List[
+            CurrencySchema
+        ] = await self.currency_repository.get_currencies()
+
+        if len(currencies) == 0:
+            raise NoCurrencyFoundException
+
+        rate_table = await self.currency_external_api_repository.get_rate_table()
+        rate_matrix = rate_matrix_cache.get(rate_table)
+        self.missing_rates = [
+            currency.iso_4217
+            for currency in currencies
+            if currency.iso_4217 not in rate_matrix
+        ]
+        return cross_rate_matrix_json_cache.get(
+            rate_table,
+            [
+                currency.iso_4217
+                for currency in currencies
+                if currency.iso_4217 in rate_matrix
+            ],
+        )
+
+    async def get_rate_history(
+        self, iso_4217: str, base_currency: str, start: date, end: date
+    ) -> List[Dict]:
+        """
+        Get the daily rate of base_currency -> iso_4217 from the recorded rates.
+
+        A day is settled `rate_history_settle_time` seconds after it ends, once
+        its last snapshot, written in background by any worker, has landed.
+        Settled days never change, so once read they are served from memory,
+        the days without any recorded rate included. Only the uncached days
+        are read from the database, in one query.
+
+        :param iso_4217: target currency
+        :param base_currency: base currency
+        :param start: first day, included
+        :param end: last day, included
+
+        :return: the closing rate of each day, for the days both currencies
+            were recorded
+        """
+        if start > end or (end - start).days >= self.settings.rate_history_max_days:
+            raise InvalidDateRangeException
+
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        settled_before = (
+            now - timedelta(seconds=self.settings.rate_history_settle_time)
+        ).date()
+        days = [
+            start + timedelta(days=offset)
+            for offset in range((min(end, today) - start).days + 1)
+        ]
+        rate_tables = {
+            day: daily_rate_tables.get(day) for day in days if day in daily_rate_tables
+        }
+        missing_days = [day for day in days if day not in rate_tables]
+        if missing_days:
+            fetched_rate_tables = (
+                await self.rate_history_repository.get_daily_rate_tables(
+                    self.settings.currency_reference_base,
+                    missing_days[0],
+                    missing_days[-1],
+                )
             )
-            if currency:
-                raise CurrencyAlreadyExistException
+            for day in missing_days:
+                rate_tables[day] = fetched_rate_tables.get(day)
+                if day < settled_before:
+                    daily_rate_tables.set(day, rate_tables[day])
+
+        return [
+            dict(date=day, rate=rate_tables[day].cross_rate(base_currency, iso_4217))
+            for day in days
+            if rate_tables[day] is not None
+            and base_currency in rate_tables[day]
+            and iso_4217 in rate_tables[day]
+        ]
+
+    async def get_rate_stats(self, iso_4217: str, days: int) -> Dict:
+        """
+        Get the stats of a currency against the reference over the last days.
+
+        The window is answered from the fewest monthly, weekly and daily rollups
+        covering it, never from the raw snapshots.
+
+        :param iso_4217: currency
+        :param days: window length, today included
+
+        :return: min, max, mean, last and count of the recorded rates
+        """
+        today = datetime.now(timezone.utc).date()
+        rate_stats = await self.rate_rollup_repository.get_rate_stats(
+            self.settings.currency_reference_base,
+            iso_4217,
+            cover_window(today - timedelta(days=days - 1), today),
+        )
+        stats = merge_rate_stats(rate_stats)
+        if stats is None:
+            raise NoRateRecordedException
+        return stats
+
+    def get_rates_age(self) -> Optional[float]:
+        """Age in seconds of the rate snapshot used by get_currencies_price."""
+        rate_table = self.currency_external_api_repository.rate_table
+        return None if rate_table is None else rate_table.age()
 
+    def get_missing_rates(self) -> List[str]:
+        """Saved currencies get_currencies_price left out, having no rate."""
+        return self.missing_rates
+
+    def is_rates_stale(self) -> bool:
+        """Whether get_currencies_price fell back to the last known good rates."""
+        return self.currency_external_api_repository.rates_stale
+
+    async def update_currency(
+        self, _id: str, update_currency_schema: CurrencyUpdateInputSchema
+    ) -> None:
+        update_dict = {}
+        if update_currency_schema.iso_4217:
+            await self.__check_if_iso_4217_exists(update_currency_schema.iso_4217)
             update_dict["iso_4217"] = update_currency_schema.iso_4217
 
         if update_currency_schema.name:
             update_dict["name"] = update_currency_schema.name
 
+        # Not found and iso_4217 conflicts are reported by the update itself.
         await self.currency_repository.update_currency(_id, update_dict)
+        await self.__currencies_changed(UPDATE_EVENT, ObjectId(_id))
 
     async def delete_currency(self, _id: ObjectId) -> None:
-        currency = await self.currency_repository.get_currency_by__id(ObjectId(_id))
+        await self.currency_repository.delete_currency(ObjectId(_id))
+        await self.__currencies_changed(DELETE_EVENT, ObjectId(_id))
 
-        if not currency:
-            raise CurrencyDoesNotExistException
+    async def bulk_currencies(
+        self, operations: List[CurrencyBulkOperationSchema]
+    ) -> List[Dict]:
+        """
+        Create, update and delete many currencies at once.
 
-        await self.currency_repository.delete_currency(ObjectId(_id))
+        The iso_4217 codes are checked in one batch, the updated and deleted
+        currencies are read in one query and every write goes in one unordered
+        bulk write, so a failing operation does not stop the others.
+
+        :param operations: bulk operations
+
+        :return: one result per operation, in the same order
+        """
+        unknown_iso_4217 = (
+            await self.currency_external_api_repository.get_unknown_currencies(
+                {operation.iso_4217 for operation in operations if operation.iso_4217}
+            )
+        )
+        ids = [operation.id for operation in operations if operation.id]
+        current_iso_4217 = (
+            await self.currency_repository.get_iso_4217_by__id(ids) if ids else {}
+        )
+        taken_iso_4217 = await self.__get_taken_iso_4217(operations)
+
+        results: List[Dict] = []
+        requests: list = []
+        request_results: List[Dict] = []
+        for index, operation in enumerate(operations):
+            result, request = self.__plan_bulk_operation(
+                index, operation, unknown_iso_4217, current_iso_4217, taken_iso_4217
+            )
+            results.append(result)
+            if request is not None:
+                requests.append(request)
+                request_results.append(result)
+
+        write_errors = await self.currency_repository.bulk_write(requests)
+        for request_index, code in write_errors.items():
+            result = request_results[request_index]
+            result.update(
+                self.__bulk_write_error(
+                    result["index"], operations[result["index"]], code
+                )
+            )
+
+        if len(write_errors) < len(requests):
+            await self.__currencies_changed(BULK_EVENT, None)
+        return results
+
+    def __plan_bulk_operation(
+        self,
+        index: int,
+        operation: CurrencyBulkOperationSchema,
+        unknown_iso_4217: Set[str],
+        current_iso_4217: Dict[ObjectId, str],
+        taken_iso_4217: Optional[Set[str]],
+    ) -> Tuple[Dict, Optional[_WriteOp]]:
+        if operation.iso_4217 in unknown_iso_4217:
+            return (
+                self.__bulk_error(index, operation, CurrencyDoesNotExistException()),
+                None,
+            )
+
+        if operation.action != DELETE_EVENT and not self.__claim_iso_4217(
+            operation, current_iso_4217, taken_iso_4217
+        ):
+            return (
+                self.__bulk_error(index, operation, CurrencyAlreadyExistException()),
+                None,
+            )
+
+        if operation.action == CREATE_EVENT:
+            _id = ObjectId()
+            return (
+                self.__bulk_result(index, operation, HTTP_201_CREATED, _id),
+                InsertOne(
+                    dict(_id=_id, name=operation.name, iso_4217=operation.iso_4217)
+                ),
+            )
+
+        if operation.id not in current_iso_4217:
+            return (
+                self.__bulk_error(index, operation, CurrencyDoesNotExistException()),
+                None,
+            )
+
+        result = self.__bulk_result(index, operation, HTTP_204_NO_CONTENT, operation.id)
+        if operation.action == DELETE_EVENT:
+            return result, DeleteOne({"_id": operation.id})
+
+        if operation.iso_4217 == current_iso_4217[operation.id]:
+            return (
+                self.__bulk_error(index, operation, CurrencyAlreadyExistException()),
+                None,
+            )
+
+        update_dict = {
+            field: value
+            for field, value in (
+                ("name", operation.name),
+                ("iso_4217", operation.iso_4217),
+            )
+            if value
+        }
+        if not update_dict:
+            return result, None
+        return result, UpdateOne({"_id": operation.id}, {"$set": update_dict})
+
+    async def __get_taken_iso_4217(
+        self, operations: List[CurrencyBulkOperationSchema]
+    ) -> Optional[Set[str]]:
+        """The saved iso_4217 written by operations, None when the index checks."""
+        if await self.currency_repository.has_unique_iso_4217_index():
+            return None
+        return await self.currency_repository.get_existing_iso_4217(
+            {
+                operation.iso_4217
+                for operation in operations
+                if operation.iso_4217 and operation.action != DELETE_EVENT
+            }
+        )
+
+    @staticmethod
+    def __claim_iso_4217(
+        operation: CurrencyBulkOperationSchema,
+        current_iso_4217: Dict[ObjectId, str],
+        taken_iso_4217: Optional[Set[str]],
+    ) -> bool:
+        if taken_iso_4217 is None or not operation.iso_4217:
+            return True
+        if operation.iso_4217 == current_iso_4217.get(operation.id):
+            # Reported as a conflict by the update planning itself.
+            return True
+        if operation.iso_4217 in taken_iso_4217:
+            return False
+        taken_iso_4217.add(operation.iso_4217)
+        return True
+
+    def __bulk_write_error(
+        self, index: int, operation: CurrencyBulkOperationSchema, code: int
+    ) -> Dict:
+        if code == DUPLICATE_KEY_ERROR_CODE:
+            return self.__bulk_error(index, operation, CurrencyAlreadyExistException())
+        return self.__bulk_result(
+            index,
+            operation,
+            HTTP_500_INTERNAL_SERVER_ERROR,
+            error_code="bulk_write_error",
+        )
+
+    async def __currencies_changed(self, action: str, _id: ObjectId) -> None:
+        self.currency_repository.invalidate_currencies_cache()
+        try:
+            await self.currency_event_repository.append_event(action, _id)
+        except PyMongoError:
+            # Other workers fall back on the currencies cache TTL.
+            logging.warning("Could not publish currency event")
+
+    @staticmethod
+    def __bulk_result(
+        index: int,
+        operation: CurrencyBulkOperationSchema,
+        status_code: int,
+        _id: ObjectId = None,
+        error_code: str = None,
+    ) -> Dict:
+        return dict(
+            index=index,
+            action=operation.action,
+            status_code=status_code,
+            _id=_id,
+            error_code=error_code,
+        )
+
+    def __bulk_error(
+        self,
+        index: int,
+        operation: CurrencyBulkOperationSchema,
+        exception: DomainException,
+    ) -> Dict:
+        return self.__bulk_result(
+            index,
+            operation,
+            exception.status_code,
+            error_code=exception.error_code,
+        )
 
     async def __check_if_iso_4217_exists(self, iso_4217):
         is_currency_exists = (
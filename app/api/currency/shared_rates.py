@@ -0,0 +1,177 @@
+import fcntl
+import os
+import struct
+import tempfile
+from decimal import Decimal
+from multiprocessing import resource_tracker, shared_memory
+
+from app.api.currency.rates import RateTable
+from app.settings import settings
+
+MAGIC = b"CXR2"
+# magic, version, fetched_at, reference, count
+HEADER = struct.Struct("<4sQd3sxI")
+VERSION = struct.Struct("<Q")
+VERSION_OFFSET = 4
+# iso_4217, rate as decimal text so every worker reads the exact Decimal
+ENTRY = struct.Struct("<3sx32s")
+MAX_READ_RETRIES = 8
+
+
+def _encode_iso_4217(iso_4217: str) -> bytes:
+    encoded = iso_4217.encode()
+    if len(encoded) != 3:
+        raise ValueError(f"Cannot share rate of {iso_4217!r}, not a 3 letters code")
+    return encoded
+
+
+def _encode_rate(rate: Decimal) -> bytes:
+    encoded = str(rate).encode()
+    if len(encoded) > ENTRY.size - 4:
+        raise ValueError(f"Cannot share rate {rate}, more than {ENTRY.size - 4} chars")
+    return encoded
+
+
+class SharedRateTable:
+    """
+    Reference rate table published in a shared memory segment.
+
+    One elected worker (the holder of an exclusive file lock) writes the table;
+    every worker of the node reads it. The header carries a version used as a
+    seqlock: the writer makes it odd while writing and even once done, readers
+    retry when it is odd or changed under them. Readers decode a version once,
+    so the hot path is a single 8 bytes read and no lock is taken.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.size = HEADER.size + capacity * ENTRY.size
+        self._segment: shared_memory.SharedMemory = None
+        self._lock_file = None
+        self._version = None
+        self._rate_table: RateTable = None
+
+    @property
+    def is_attached(self) -> bool:
+        return self._segment is not None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def attach(self) -> None:
+        # Workers attach one at a time, so a segment an earlier deploy left too
+        # small is recreated once and never under a worker that just made it.
+        lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.attach.lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            segment = self._open_segment()
+            if segment.size < self.size:
+                # Workers still attached to the old segment keep their mapping.
+                segment.close()
+                segment.unlink()
+                segment = self._open_segment()
+        # The segment outlives any single worker, do not let the resource
+        # tracker unlink it when this process exits.
+        resource_tracker.unregister(segment._name, "shared_memory")
+        self._segment = segment
+
+    def _open_segment(self) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(self.name, create=True, size=self.size)
+        except FileExistsError:
+            return shared_memory.SharedMemory(self.name)
+
+    def detach(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        self._version = None
+        self._rate_table = None
+
+    def try_become_leader(self) -> bool:
+        if self._lock_file is not None:
+            return True
+
+        lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def publish(self, rate_table: RateTable) -> None:
+        if len(rate_table.rates) > self.capacity:
+            raise ValueError(f"Shared memory {self.name} holds {self.capacity} rates")
+        # Everything is encoded before the version turns odd, so a rejected
+        # table leaves the published one readable.
+        reference = _encode_iso_4217(rate_table.reference)
+        entries = [
+            (_encode_iso_4217(iso_4217), _encode_rate(rate))
+            for iso_4217, rate in rate_table.rates.items()
+        ]
+
+        buffer = self._segment.buf
+        (version,) = VERSION.unpack_from(buffer, VERSION_OFFSET)
+        writing_version = version + 1 if version % 2 == 0 else version
+        VERSION.pack_into(buffer, VERSION_OFFSET, writing_version)
+
+        for index, (iso_4217, rate) in enumerate(entries):
+            ENTRY.pack_into(buffer, HEADER.size + index * ENTRY.size, iso_4217, rate)
+        HEADER.pack_into(
+            buffer,
+            0,
+            MAGIC,
+            writing_version,
+            rate_table.fetched_at,
+            reference,
+            len(entries),
+        )
+        VERSION.pack_into(buffer, VERSION_OFFSET, writing_version + 1)
+
+    def read(self) -> RateTable:
+        buffer = self._segment.buf
+        for _ in range(MAX_READ_RETRIES):
+            (version,) = VERSION.unpack_from(buffer, VERSION_OFFSET)
+            if version == self._version:
+                return self._rate_table
+            if version % 2 == 1:
+                continue
+
+            magic, _, fetched_at, reference, count = HEADER.unpack_from(buffer, 0)
+            if magic != MAGIC:
+                return None
+            rates = {}
+            for index in range(count):
+                iso_4217, rate = ENTRY.unpack_from(
+                    buffer, HEADER.size + index * ENTRY.size
+                )
+                rates[iso_4217.decode()] = Decimal(rate.rstrip(b"\0").decode())
+
+            if VERSION.unpack_from(buffer, VERSION_OFFSET)[0] == version:
+                self._version = version
+                self._rate_table = RateTable(
+                    reference.decode(), rates, fetched_at=fetched_at
+                )
+                return self._rate_table
+        return self._rate_table
+
+    def stats(self) -> dict:
+        return {
+            "attached": self.is_attached,
+            "leader": self.is_leader,
+            "version": self._version,
+        }
+
+
+shared_rates = SharedRateTable(
+    settings.currency_rates_shared_memory_name,
+    settings.currency_rates_shared_memory_capacity,
+)
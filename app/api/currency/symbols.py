@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, FrozenSet, Iterable
+
+from app.api.helpers.cache import TTLCache
+from app.api.helpers.exception import ExternalAPIUnreachableException
+from app.settings import settings
+
+SymbolsLoader = Callable[[], Awaitable[Iterable[str]]]
+
+
+class CurrencySymbols:
+    """
+    Every iso_4217 code listed by the external currency API.
+
+    The set is loaded once and refreshed in background, so checking a code is a
+    set lookup. Codes that were not found are remembered for a while, and only
+    the first miss of a code asks for an early refresh.
+    """
+
+    def __init__(self, negative_ttl: float):
+        self.codes: FrozenSet[str] = frozenset()
+        self.loaded_at: float = None
+        self.unknown = TTLCache(negative_ttl)
+        self._refresh_task: asyncio.Task = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def replace(self, codes: Iterable[str]) -> None:
+        self.codes = frozenset(codes)
+        self.loaded_at = time.monotonic()
+        self.unknown.clear()
+
+    def clear(self) -> None:
+        self.codes = frozenset()
+        self.loaded_at = None
+        self.unknown.clear()
+
+    def __contains__(self, iso_4217: str) -> bool:
+        return iso_4217 in self.codes
+
+    async def refresh(self, loader: SymbolsLoader) -> None:
+        self.replace(await loader())
+
+    async def safe_refresh(self, loader: SymbolsLoader) -> None:
+        try:
+            await self.refresh(loader)
+        except ExternalAPIUnreachableException:
+            logging.warning("Could not refresh currency symbols")
+        except Exception:
+            # A malformed upstream answer must not end the refresher loop.
+            logging.exception("Unexpected error while refreshing currency symbols")
+
+    def request_refresh(self, loader: SymbolsLoader) -> None:
+        """Refresh in background, at most once per negative cache window."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if time.monotonic() - self.loaded_at < self.unknown.ttl:
+            return
+        self._refresh_task = asyncio.create_task(self.safe_refresh(loader))
+
+
+currency_symbols = CurrencySymbols(settings.currency_symbols_negative_cache_ttl)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+
+from pymongo.errors import PyMongoError
+
+from app.api.currency.events import currency_event_feed
+from app.api.currency.repository.currency_api import CurrencyExternalAPIRepository
+from app.api.currency.repository.currency_event import CurrencyEventRepository
+from app.api.currency.repository.database import CurrencyRepository
+from app.api.currency.repository.rate_history import RateHistoryRepository
+from app.api.currency.repository.rate_snapshot import RateSnapshotRepository
+from app.api.currency.shared_rates import shared_rates
+from app.api.currency.symbols import currency_symbols
+from app.api.helpers.exception import ExternalAPIUnreachableException
+from app.db.mongodb import db
+from app.settings import settings
+
+
+async def create_currency_indexes():
+    """Create the indexes every currency collection relies on."""
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                CurrencyRepository(settings, db.client).create_indexes(),
+                RateSnapshotRepository(settings, db.client).create_indexes(),
+                RateHistoryRepository(settings, db.client).create_collection(),
+            ),
+            timeout=settings.mongo_index_timeout,
+        )
+    except (PyMongoError, asyncio.TimeoutError):
+        logging.warning("Could not create currency indexes")
+
+
+class BackgroundTasks:
+    currency_symbols: asyncio.Task = None
+    currency_rates: asyncio.Task = None
+    currency_events: asyncio.Task = None
+
+
+background_tasks = BackgroundTasks()
+
+
+async def _refresh_currency_symbols_forever():
+    currency_external_api_repository = CurrencyExternalAPIRepository(settings)
+    while True:
+        await currency_symbols.safe_refresh(
+            currency_external_api_repository.get_symbols
+        )
+        await asyncio.sleep(settings.currency_symbols_refresh_interval)
+
+
+async def start_currency_symbols_refresher():
+    # The first load runs in background, requests load the symbols themselves
+    # until it lands.
+    background_tasks.currency_symbols = asyncio.create_task(
+        _refresh_currency_symbols_forever()
+    )
+
+
+async def stop_currency_symbols_refresher():
+    if background_tasks.currency_symbols is not None:
+        background_tasks.currency_symbols.cancel()
+        background_tasks.currency_symbols = None
+
+
+async def _refresh_currency_rates():
+    if shared_rates.is_attached and not shared_rates.try_become_leader():
+        # The elected worker refreshes and publishes rates for the whole node.
+        return
+    try:
+        await CurrencyExternalAPIRepository(settings).refresh_rate_table()
+    except ExternalAPIUnreachableException:
+        logging.warning("Could not refresh currency rates")
+    except Exception:
+        # A malformed upstream answer must not end the refresher loop.
+        logging.exception("Unexpected error while refreshing currency rates")
+
+
+async def _refresh_currency_rates_forever():
+    while True:
+        await _refresh_currency_rates()
+        await asyncio.sleep(settings.currency_rates_refresh_interval)
+
+
+async def start_currency_rates_refresher():
+    if settings.use_shared_rates():
+        shared_rates.attach()
+
+    # The first refresh runs in background, requests fetch the rates themselves
+    # until it lands.
+    background_tasks.currency_rates = asyncio.create_task(
+        _refresh_currency_rates_forever()
+    )
+
+
+async def stop_currency_rates_refresher():
+    if background_tasks.currency_rates is not None:
+        background_tasks.currency_rates.cancel()
+        background_tasks.currency_rates = None
+    shared_rates.detach()
+
+
+async def _follow_currency_events_forever():
+    currency_event_repository = CurrencyEventRepository(settings, db.client)
+    last_event_id = None
+    while True:
+        try:
+            if last_event_id is None:
+                last_event_id = await currency_event_repository.get_last_event_id()
+            cursor = currency_event_repository.tail(last_event_id)
+            while cursor.alive:
+                async for event in cursor:
+                    last_event_id = event["_id"]
+                    currency_event_feed.apply(event)
+        except PyMongoError:
+            logging.warning("Could not follow currency events")
+        await asyncio.sleep(settings.currency_event_retry_interval)
+
+
+async def start_currency_event_feed():
+    try:
+        await asyncio.wait_for(
+            CurrencyEventRepository(settings, db.client).create_collection(),
+            timeout=settings.currency_event_timeout,
+        )
+    except (PyMongoError, asyncio.TimeoutError):
+        logging.warning("Could not create currency events collection")
+
+    background_tasks.currency_events = asyncio.create_task(
+        _follow_currency_events_forever()
+    )
+
+
+async def stop_currency_event_feed():
+    if background_tasks.currency_events is not None:
+        background_tasks.currency_events.cancel()
+        background_tasks.currency_events = None
@@ -4,3 +4,9 @@ def iso_4217_check(iso_4217: str):
     if len(iso_4217) != 3:
         raise ValueError("iso_4217 must contain only 3 characters.")
     return str(iso_4217).upper()
+
+
+def finite_amounts_check(amounts: list):
+    if not all(amount.is_finite() for amount in amounts):
+        raise ValueError("amounts must be finite numbers.")
+    return amounts
@@ -1,12 +1,16 @@
 """
 isort:skip_file
 """
-from typing import Dict, List
+import json
+from datetime import date
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_400_BAD_REQUEST,
     HTTP_204_NO_CONTENT,
     HTTP_404_NOT_FOUND,
     HTTP_409_CONFLICT,
@@ -15,11 +19,18 @@ from starlette.status import (
 )
 
 from app.api.currency.model import (
+    CurrenciesBatchConversionInputSchema,
+    CurrenciesBatchConversionOutputSchema,
     CurrenciesPriceInputSchema,
     CurrenciesPriceOutputSchema,
+    CurrencyBulkInputSchema,
+    CurrencyBulkOutputSchema,
     CurrencySchema,
     CurrencyUpdateInputSchema,
+    CrossRateMatrixOutputSchema,
     MessageError,
+    RateHistoryOutputSchema,
+    RateStatsOutputSchema,
 )
 from app.api.currency.services import CurrencyService
 from app.api.helpers.exception import (
@@ -28,26 +39,94 @@ from app.api.helpers.exception import (
     DomainException,
     ExternalAPIUnreachableException,
     HTTPError,
+    InvalidDateRangeException,
+    InvalidPageCursorException,
     NoCurrencyFoundException,
+    NoRateRecordedException,
 )
 from app.db.mongodb import AsyncIOMotorClient, get_database
 from app.settings import settings
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ISO_4217_REGEX = "^[A-Za-z]{3}$"
+
 router = APIRouter()
 
 
-@router.get("/", status_code=HTTP_200_OK, response_model=List[CurrencySchema])
-async def index(conn: AsyncIOMotorClient = Depends(get_database)):
+def _set_rates_headers(response: Response, currency_service: CurrencyService) -> None:
+    """Set the X-Rates-Age, X-Rates-Stale and X-Rates-Missing headers."""
+    rates_age = currency_service.get_rates_age()
+    if rates_age is not None:
+        response.headers["X-Rates-Age"] = f"{rates_age:.3f}"
+    if currency_service.is_rates_stale():
+        response.headers["X-Rates-Stale"] = "true"
+    missing_rates = currency_service.get_missing_rates()
+    if missing_rates:
+        response.headers["X-Rates-Missing"] = ",".join(missing_rates)
+
+
+@router.get(
+    "/",
+    status_code=HTTP_200_OK,
+    response_model=List[CurrencySchema],
+    responses={
+        HTTP_200_OK: {"content": {NDJSON_MEDIA_TYPE: {}}},
+        HTTP_400_BAD_REQUEST: {"model": MessageError},
+    },
+)
+async def index(
+    request: Request,
+    stream: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=settings.currency_page_max_limit),
+    page_token: Optional[str] = Query(None, alias="next"),
+    conn: AsyncIOMotorClient = Depends(get_database),
+):
     """
     List all currencies.
 
+    Rows come from the database already validated, so the cached JSON is sent
+    as is instead of being validated again against the response model.
+
+    With `stream=true` or `Accept: application/x-ndjson` the currencies are
+    streamed as NDJSON, one currency per line, straight from the database.
+
+    With `limit` or `next` one page is returned, and the `X-Next-Cursor` header
+    holds the `next` token of the following page when there is one.
+
+    :param stream: stream the currencies as NDJSON
+    :param limit: page size
+    :param next: token of the page to return
 
     :return: list of currency
     """
     try:
         currency_service: CurrencyService = CurrencyService(conn, settings)
-        return await currency_service.get_currencies()
+        if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            return StreamingResponse(
+                currency_service.stream_currencies_ndjson(),
+                media_type=NDJSON_MEDIA_TYPE,
+            )
 
+        if limit is not None or page_token is not None:
+            content, next_token = await currency_service.get_currencies_page_json(
+                limit or settings.currency_page_default_limit, page_token
+            )
+            response = Response(content=content, media_type="application/json")
+            if next_token is not None:
+                response.headers["X-Next-Cursor"] = next_token
+            return response
+
+        return Response(
+            content=await currency_service.get_currencies_json(),
+            media_type="application/json",
+        )
+
+    except InvalidPageCursorException as exception:
+        raise HTTPError(
+            status_code=HTTP_400_BAD_REQUEST,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
     except Exception as e:  # pragma: no cover
         raise e  # pragma: no cover
 
@@ -98,6 +177,40 @@ async def create(
         )
 
 
+@router.post(
+    "/bulk",
+    status_code=HTTP_200_OK,
+    responses={
+        HTTP_503_SERVICE_UNAVAILABLE: {"model": MessageError},
+    },
+    response_model=List[CurrencyBulkOutputSchema],
+)
+async def bulk(
+    bulk_input_schema: CurrencyBulkInputSchema,
+    conn: AsyncIOMotorClient = Depends(get_database),
+):
+    """
+    Create, update and delete many currencies at once.
+
+    Operations are independent: each one gets its own result, with the status
+    code and error code the single currency endpoints would answer.
+
+    :param bulk_input_schema: A list of bulk operations
+
+    :return: One result per operation, in the same order
+    """
+    try:
+        currency_service: CurrencyService = CurrencyService(conn, settings)
+        return await currency_service.bulk_currencies(bulk_input_schema.operations)
+
+    except ExternalAPIUnreachableException as exception:
+        raise HTTPError(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+
+
 @router.patch(
     "/{_id}",
     status_code=HTTP_204_NO_CONTENT,
@@ -188,6 +301,7 @@ async def delete(
 )
 async def currencies_price(
     currencies_price: CurrenciesPriceInputSchema,
+    response: Response,
     conn: AsyncIOMotorClient = Depends(get_database),
 ):
     """
@@ -199,14 +313,115 @@ async def currencies_price(
 
     :param amount: [optional] The amount to be converted.
 
+    Saved currencies without a rate are left out and listed in the
+    `X-Rates-Missing` header.
+
     :return: list of currency
     """
     try:
         currency_service: CurrencyService = CurrencyService(conn, settings)
-        return await currency_service.get_currencies_price(currencies_price)
+        currencies = await currency_service.get_currencies_price(currencies_price)
+
+        _set_rates_headers(response, currency_service)
+        return currencies
+
+    except (NoCurrencyFoundException, CurrencyDoesNotExistException) as exception:
+
+        raise HTTPError(
+            status_code=HTTP_404_NOT_FOUND,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+    except ExternalAPIUnreachableException as exception:
+        raise HTTPError(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+
+
+@router.get(
+    "/currencies-price/matrix",
+    status_code=HTTP_200_OK,
+    responses={
+        HTTP_404_NOT_FOUND: {"model": MessageError},
+        HTTP_503_SERVICE_UNAVAILABLE: {"model": MessageError},
+    },
+    response_model=CrossRateMatrixOutputSchema,
+)
+async def currencies_price_matrix(conn: AsyncIOMotorClient = Depends(get_database)):
+    """
+    Price every saved currency in every other saved currency.
+
+    `rates[i][j]` is the price of one `currencies[i]` in `currencies[j]`.
+    Saved currencies without a rate are left out and listed in the
+    `X-Rates-Missing` header.
+
+    :return: saved currencies and their cross-rate matrix
+    """
+    try:
+        currency_service: CurrencyService = CurrencyService(conn, settings)
+        response = Response(
+            content=await currency_service.get_cross_rate_matrix_json(),
+            media_type="application/json",
+        )
+        _set_rates_headers(response, currency_service)
+        return response
 
     except (NoCurrencyFoundException, CurrencyDoesNotExistException) as exception:
+        raise HTTPError(
+            status_code=HTTP_404_NOT_FOUND,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+    except ExternalAPIUnreachableException as exception:
+        raise HTTPError(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+
+
+@router.post(
+    "/currencies-price/batch",
+    status_code=HTTP_200_OK,
+    responses={
+        HTTP_404_NOT_FOUND: {"model": MessageError},
+        HTTP_503_SERVICE_UNAVAILABLE: {"model": MessageError},
+    },
+    response_model=CurrenciesBatchConversionOutputSchema,
+)
+async def currencies_price_batch(
+    batch_conversion: CurrenciesBatchConversionInputSchema,
+    conn: AsyncIOMotorClient = Depends(get_database),
+):
+    """
+    Convert many amounts between currency pairs in one vectorized pass.
+
+    Input and output are columns: the i-th amount is converted from the i-th
+    base currency to the i-th target currency.
+
+    :param amounts: The amounts to be converted.
+    :param base_currencies: The currency of each amount.
+    :param target_currencies: The currency to convert each amount to.
+
+    :return: converted amounts rounded to 2 places and the rates used
+    """
+    try:
+        currency_service: CurrencyService = CurrencyService(conn, settings)
+        amounts, rates = await currency_service.convert_batch(batch_conversion)
 
+        response = Response(
+            content=json.dumps(
+                {"amounts": amounts, "rates": rates.tolist()},
+                separators=(",", ":"),
+            ),
+            media_type="application/json",
+        )
+        _set_rates_headers(response, currency_service)
+        return response
+
+    except CurrencyDoesNotExistException as exception:
         raise HTTPError(
             status_code=HTTP_404_NOT_FOUND,
             error_message=str(exception),
@@ -218,3 +433,91 @@ async def currencies_price(
             error_message=str(exception),
             error_code=exception.error_code,
         )
+
+
+@router.get(
+    "/rates/history",
+    status_code=HTTP_200_OK,
+    responses={
+        HTTP_400_BAD_REQUEST: {"model": MessageError},
+    },
+    response_model=RateHistoryOutputSchema,
+)
+async def rates_history(
+    iso_4217: str = Query(..., regex=ISO_4217_REGEX),
+    start: date = Query(...),
+    end: date = Query(...),
+    base_currency: str = Query(settings.currency_reference_base, regex=ISO_4217_REGEX),
+    conn: AsyncIOMotorClient = Depends(get_database),
+):
+    """
+    Daily rate history of a currency, from the rates recorded at each refresh.
+
+    No provider is called: days without a recorded rate are left out.
+
+    :param iso_4217: The three-letter code of the priced currency.
+    :param start: First day, as YYYY-MM-DD.
+    :param end: Last day, included, as YYYY-MM-DD.
+    :param base_currency: [optional] The three-letter code of the currency the \
+        rates are given in. Defaults to the reference currency.
+
+    :return: the closing rate of each day
+    """
+    try:
+        currency_service: CurrencyService = CurrencyService(conn, settings)
+        iso_4217 = iso_4217.upper()
+        base_currency = base_currency.upper()
+        return RateHistoryOutputSchema(
+            base_currency=base_currency,
+            iso_4217=iso_4217,
+            rates=await currency_service.get_rate_history(
+                iso_4217, base_currency, start, end
+            ),
+        )
+
+    except InvalidDateRangeException as exception:
+        raise HTTPError(
+            status_code=HTTP_400_BAD_REQUEST,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
+
+
+@router.get(
+    "/rates/stats",
+    status_code=HTTP_200_OK,
+    responses={
+        HTTP_404_NOT_FOUND: {"model": MessageError},
+    },
+    response_model=RateStatsOutputSchema,
+)
+async def rates_stats(
+    iso_4217: str = Query(..., regex=ISO_4217_REGEX),
+    days: int = Query(30, ge=1, le=settings.rate_history_max_days),
+    conn: AsyncIOMotorClient = Depends(get_database),
+):
+    """
+    Stats of a currency against the reference currency over the last days.
+
+    :param iso_4217: The three-letter code of the priced currency.
+    :param days: [optional] Window length in days, today included. \
+        example: 7, 30 or 365.
+
+    :return: min, max, mean and last rate, and the number of recorded rates
+    """
+    try:
+        currency_service: CurrencyService = CurrencyService(conn, settings)
+        iso_4217 = iso_4217.upper()
+        return RateStatsOutputSchema(
+            base_currency=settings.currency_reference_base,
+            iso_4217=iso_4217,
+            days=days,
+            **await currency_service.get_rate_stats(iso_4217, days),
+        )
+
+    except NoRateRecordedException as exception:
+        raise HTTPError(
+            status_code=HTTP_404_NOT_FOUND,
+            error_message=str(exception),
+            error_code=exception.error_code,
+        )
@@ -0,0 +1,128 @@
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque
+
+from app.api.helpers.exception import (
+    ExternalAPICircuitOpenException,
+    ExternalAPIUnreachableException,
+)
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while.
+
+    The breaker opens when the failure rate of the last `window_size` calls
+    reaches `failure_rate_threshold` (after at least `minimum_calls`). While open,
+    calls fail fast with ExternalAPICircuitOpenException. After `open_timeout`
+    seconds a single probe call is let through: success closes the breaker,
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate_threshold: float,
+        window_size: int,
+        minimum_calls: int,
+        open_timeout: float,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_timeout = open_timeout
+        self._results: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at: float = None
+        self._probe_in_flight = False
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.open_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    @property
+    def accepts_calls(self) -> bool:
+        """Whether a call made now would go through, the half-open probe included."""
+        state = self.state
+        return state == self.CLOSED or (
+            state == self.HALF_OPEN and not self._probe_in_flight
+        )
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            self.reset()
+            return
+        self._results.append(True)
+
+    def record_failure(self) -> None:
+        if self._opened_at is not None:
+            self._open()
+            return
+        self._results.append(False)
+        if (
+            len(self._results) >= self.minimum_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def reset(self) -> None:
+        self._results.clear()
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.opened_count += 1
+
+    async def call(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        is_probe = self.state == self.HALF_OPEN
+        if not self.allow_request():
+            self.rejected_count += 1
+            raise ExternalAPICircuitOpenException
+
+        # A call started before the breaker opened only counts while it is
+        # still closed, the probe alone decides when it is not.
+        try:
+            result = await call()
+        except ExternalAPIUnreachableException:
+            if is_probe or self._opened_at is None:
+                self.record_failure()
+            raise
+        finally:
+            if is_probe:
+                self._probe_in_flight = False
+
+        if is_probe or self._opened_at is None:
+            self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate,
+            "opened": self.opened_count,
+            "rejected": self.rejected_count,
+        }
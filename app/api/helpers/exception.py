@@ -5,6 +5,7 @@ import http
 from http.client import BAD_REQUEST
 
 from starlette.status import (
+    HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
     HTTP_409_CONFLICT,
     HTTP_503_SERVICE_UNAVAILABLE,
@@ -39,6 +40,13 @@ class ExternalAPIUnreachableException(DomainException):
         self.status_code = HTTP_503_SERVICE_UNAVAILABLE
 
 
+class ExternalAPICircuitOpenException(ExternalAPIUnreachableException):
+    def __init__(self, message="External Currency API is failing, try again later"):
+        super().__init__(message)
+        self.error_code = "open_circuit_external_api_error"
+        self.status_code = HTTP_503_SERVICE_UNAVAILABLE
+
+
 class NoCurrencyFoundException(DomainException):
     def __init__(self, message="Cannot find any currency on database"):
         super().__init__(message)
@@ -46,6 +54,27 @@ class NoCurrencyFoundException(DomainException):
         self.status_code = HTTP_404_NOT_FOUND
 
 
+class NoRateRecordedException(DomainException):
+    def __init__(self, message="Cannot find any recorded rate on database"):
+        super().__init__(message)
+        self.error_code = "no_rate_recorded_error"
+        self.status_code = HTTP_404_NOT_FOUND
+
+
+class InvalidPageCursorException(DomainException):
+    def __init__(self, message="Invalid page cursor"):
+        super().__init__(message)
+        self.error_code = "invalid_page_cursor_error"
+        self.status_code = HTTP_400_BAD_REQUEST
+
+
+class InvalidDateRangeException(DomainException):
+    def __init__(self, message="Invalid date range"):
+        super().__init__(message)
+        self.error_code = "invalid_date_range_error"
+        self.status_code = HTTP_400_BAD_REQUEST
+
+
 class HTTPError(Exception):
     def __init__(
         self,
@@ -0,0 +1,74 @@
+import bisect
+import threading
+from typing import Callable, Dict, Sequence
+
+Collector = Callable[[], dict]
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, in seconds for latencies.
+
+    Observations may come from driver threads, so updates hold a lock.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, maximum = self._sum, self._max
+
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = cumulative + counts[-1]
+        return {
+            "count": buckets["+Inf"],
+            "sum": total,
+            "max": maximum,
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """In-process metrics, collected on demand from the registered components."""
+
+    def __init__(self):
+        self._collectors: Dict[str, Collector] = {}
+
+    def register(self, name: str, collector: Collector) -> None:
+        self._collectors[name] = collector
+
+    def collect(self) -> Dict[str, dict]:
+        return {name: collector() for name, collector in self._collectors.items()}
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,18 @@
+import base64
+import binascii
+
+from bson.objectid import ObjectId
+
+from app.api.helpers.exception import InvalidPageCursorException
+
+
+def encode_page_cursor(_id: ObjectId) -> str:
+    """Opaque `next` token pointing after the given _id."""
+    return base64.urlsafe_b64encode(_id.binary).decode("ascii")
+
+
+def decode_page_cursor(token: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidPageCursorException
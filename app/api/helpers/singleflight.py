@@ -0,0 +1,46 @@
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls.
+
+    The first caller of a key starts the call, the callers that arrive while it
+    is in flight await the same task. Results and errors are handed to every
+    waiter and are not kept once the call finishes.
+    """
+
+    def __init__(self):
+        self.issued = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.issued += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._forget, key))
+        else:
+            self.coalesced += 1
+
+        # Shielded, so a cancelled waiter does not cancel the shared call.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        calls = self.issued + self.coalesced
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+            "fan_in_ratio": calls / self.issued if self.issued else 0.0,
+        }
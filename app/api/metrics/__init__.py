@@ -0,0 +1,4 @@
+"""Metrics API."""
+from app.api.metrics.views import router
+
+__all__ = ["router"]
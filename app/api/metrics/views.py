@@ -0,0 +1,12 @@
+import time
+
+from fastapi import APIRouter
+
+from app.api.helpers.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> dict:
+    return {"metrics": metrics.collect(), "collected_at": time.time()}
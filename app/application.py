@@ -5,10 +5,20 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi_pagination import add_pagination
 
+from app.api.currency.tasks import (
+    create_currency_indexes,
+    start_currency_event_feed,
+    start_currency_rates_refresher,
+    start_currency_symbols_refresher,
+    stop_currency_event_feed,
+    stop_currency_rates_refresher,
+    stop_currency_symbols_refresher,
+)
 from app.api.helpers.handler import register_exception_handlers
 from app.api.helpers.middlewares import CatchExceptionsMiddleware
 from app.api.router import api_router
 from app.db.mongodb_utils import close_mongo_connection, connect_to_mongo
+from app.http_client.client_utils import close_http_client, open_http_client
 from app.settings import settings
 
 APP_ROOT = Path(__file__).parent
@@ -38,7 +48,16 @@ def get_app() -> FastAPI:
     app.add_middleware(CatchExceptionsMiddleware)
 
     app.add_event_handler("startup", connect_to_mongo)
+    app.add_event_handler("startup", create_currency_indexes)
+    app.add_event_handler("startup", open_http_client)
+    app.add_event_handler("startup", start_currency_symbols_refresher)
+    app.add_event_handler("startup", start_currency_rates_refresher)
+    app.add_event_handler("startup", start_currency_event_feed)
+    app.add_event_handler("shutdown", stop_currency_symbols_refresher)
+    app.add_event_handler("shutdown", stop_currency_rates_refresher)
+    app.add_event_handler("shutdown", stop_currency_event_feed)
     app.add_event_handler("shutdown", close_mongo_connection)
+    app.add_event_handler("shutdown", close_http_client)
 
     app.include_router(router=api_router)
     app.mount(
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+from pymongo import monitoring
+
+from app.api.helpers.metrics import Histogram
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Latency histograms and failures of every command, by command name."""
+
+    def __init__(self):
+        self._latencies: Dict[str, Histogram] = defaultdict(Histogram)
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._observe(event.command_name, event.duration_micros)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with self._lock:
+            self._failures[event.command_name] += 1
+        self._observe(event.command_name, event.duration_micros)
+
+    def _observe(self, command_name: str, duration_micros: int) -> None:
+        with self._lock:
+            histogram = self._latencies[command_name]
+        histogram.observe(duration_micros / 1_000_000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = dict(self._latencies)
+            failures = dict(self._failures)
+        return {
+            command_name: dict(
+                histogram.stats(), failures=failures.get(command_name, 0)
+            )
+            for command_name, histogram in latencies.items()
+        }
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool checkout wait times, failures and connections in use.
+
+    A checkout starts and ends on the same driver thread, so its start time is
+    kept in a thread local.
+    """
+
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self._checkout_failures: Dict[str, int] = defaultdict(int)
+        self._created = 0
+        self._closed = 0
+        self._checked_out = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started_at = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        self._observe_checkout()
+        with self._lock:
+            self._checked_out += 1
+
+    def connection_check_out_failed(self, event) -> None:
+        self._observe_checkout()
+        with self._lock:
+            self._checkout_failures[event.reason] += 1
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self._checked_out -= 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self._created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self._closed += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def _observe_checkout(self) -> None:
+        started_at = getattr(self._local, "started_at", None)
+        if started_at is not None:
+            self._local.started_at = None
+            self.checkout_wait.observe(time.perf_counter() - started_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkout_wait": self.checkout_wait.stats(),
+                "checkout_failures": dict(self._checkout_failures),
+                "connections": self._created - self._closed,
+                "checked_out": self._checked_out,
+            }
+
+
+mongo_command_listener = MongoCommandListener()
+mongo_pool_listener = MongoPoolListener()
@@ -1,16 +1,61 @@
+import asyncio
+import logging
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 
+from app.api.helpers.metrics import metrics
 from app.db.mongodb import db
-from app.settings import settings
+from app.db.mongodb_monitoring import mongo_command_listener, mongo_pool_listener
+from app.settings import Settings, settings
 
+metrics.register("mongo_commands", mongo_command_listener.stats)
+metrics.register("mongo_pool", mongo_pool_listener.stats)
 
-async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(
+
+def get_read_preference(name: str):
+    return make_read_preference(read_pref_mode_from_name(name), None)
+
+
+def build_mongo_client(settings: Settings) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
         settings.mongo_url(),
         maxPoolSize=settings.mongo_max_connections_count,
         minPoolSize=settings.mongo_min_connections_count,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        event_listeners=[mongo_command_listener, mongo_pool_listener],
     )
 
 
+async def warm_up_mongo_client(client: AsyncIOMotorClient, connections: int) -> None:
+    """
+    Open `connections` pooled connections before the first request needs them.
+
+    Concurrent pings each check a connection out of the pool, so the pool holds
+    at least that many once they are done.
+    """
+    await asyncio.gather(
+        *(client.admin.command("ping") for _ in range(max(connections, 1)))
+    )
+
+
+async def connect_to_mongo():
+    db.client = build_mongo_client(settings)
+
+    if not settings.mongo_warm_up:
+        return
+    try:
+        await asyncio.wait_for(
+            warm_up_mongo_client(db.client, settings.mongo_min_connections_count),
+            timeout=settings.mongo_warm_up_timeout,
+        )
+    except (PyMongoError, asyncio.TimeoutError):
+        logging.warning("Could not warm up the mongo connection pool")
+
+
 async def close_mongo_connection():
     db.client.close()
+    db.client = None
@@ -0,0 +1,12 @@
+import httpx
+
+
+class HTTPClient:
+    client: httpx.AsyncClient = None
+
+
+http_client = HTTPClient()
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    return http_client.client
@@ -0,0 +1,48 @@
+import importlib.util
+
+import httpx
+
+from app.http_client.client import http_client
+from app.settings import Settings, settings
+
+
+def is_http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_http_client(settings: Settings) -> httpx.AsyncClient:
+    """
+    Build the pooled client used to talk to the external currency API.
+
+    :param settings: App settings
+
+    :return: httpx async client
+    """
+    return httpx.AsyncClient(
+        http2=settings.currency_api_http2 and is_http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.currency_api_max_connections_count,
+            max_keepalive_connections=settings.currency_api_max_keepalive_connections_count,  # noqa
+            keepalive_expiry=settings.currency_api_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.currency_api_timeout,
+            connect=settings.currency_api_connect_timeout,
+        ),
+    )
+
+
+def get_or_open_http_client() -> httpx.AsyncClient:
+    if http_client.client is None or http_client.client.is_closed:
+        http_client.client = build_http_client(settings)
+    return http_client.client
+
+
+async def open_http_client():
+    http_client.client = build_http_client(settings)
+
+
+async def close_http_client():
+    if http_client.client is not None:
+        await http_client.client.aclose()
+        http_client.client = None
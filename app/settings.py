@@ -1,3 +1,5 @@
+from typing import List, Literal, Optional
+
 from pydantic import BaseSettings
 
 
@@ -13,6 +15,28 @@ class Settings(BaseSettings):
     reload: bool
 
     currency_api_url: str
+    currency_api_frankfurter_url: str = "https://api.frankfurter.app"
+    currency_api_providers: List[str] = ["exchangerate_host"]
+    currency_api_http2: bool = True
+    currency_api_max_connections_count: int = 100
+    currency_api_max_keepalive_connections_count: int = 20
+    currency_api_keepalive_expiry: float = 30.0
+    currency_api_timeout: float = 5.0
+    currency_api_connect_timeout: float = 2.0
+    currency_api_breaker_failure_rate: float = 0.5
+    currency_api_breaker_window_size: int = 20
+    currency_api_breaker_minimum_calls: int = 5
+    currency_api_breaker_open_timeout: float = 30.0
+    currency_api_serve_stale_when_unavailable: bool = True
+
+    currency_reference_base: str = "EUR"
+    currency_rates_refresh_interval: float = 60.0
+    currency_rates_max_staleness: float = 600.0
+    currency_rates_shared_memory: bool = True
+    currency_rates_shared_memory_name: str = "currency_exchange_rates"
+    currency_rates_shared_memory_capacity: int = 512
+    currency_symbols_refresh_interval: float = 3600.0
+    currency_symbols_negative_cache_ttl: float = 300.0
 
     mongo_host: str
     mongo_port: int
@@ -24,8 +48,37 @@ class Settings(BaseSettings):
 
     mongo_max_connections_count: int
     mongo_min_connections_count: int
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_server_selection_timeout_ms: int = 30000
+    mongo_read_preference: Literal[
+        "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+    ] = "primary"
+    mongo_warm_up: bool = True
+    mongo_warm_up_timeout: float = 2.0
+    mongo_index_timeout: float = 1.0
 
     currency_collection_name = "currencies"
+    currency_cache_ttl: float = 300.0
+    currency_cursor_batch_size: int = 1000
+    currency_page_default_limit: int = 100
+    currency_page_max_limit: int = 1000
+    currency_bulk_max_operations: int = 1000
+    currency_batch_max_items: int = 100000
+    currency_event_collection_name = "currency_events"
+    currency_event_collection_size: int = 1048576
+    currency_event_collection_max: int = 10000
+    currency_event_retry_interval: float = 1.0
+    currency_event_timeout: float = 1.0
+    rate_snapshot_collection_name = "rate_snapshots"
+    rate_snapshot_ttl: int = 86400
+    rate_snapshot_timeout: float = 1.0
+    rate_history_collection_name = "rate_history"
+    rate_history_enabled: bool = True
+    rate_history_max_days: int = 366
+    rate_history_cache_size: int = 1000
+    rate_history_settle_time: float = 300.0
+    rate_rollup_collection_name = "rate_rollups"
     test = False
 
     class Config:
@@ -33,6 +86,9 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         env_prefix = "CURRENCY_EXCHANGE_"
 
+    def use_shared_rates(self) -> bool:
+        return self.currency_rates_shared_memory and self.workers_count > 1
+
     def mongo_url(self) -> str:
 
         return f"mongodb://{self.mongo_user}:{self.mongo_password}@{self.mongo_host}:{self.mongo_port}/{self.mongo_database_name}?authSource=admin"  # noqa
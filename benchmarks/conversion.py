@@ -0,0 +1,87 @@
+"""
+Microbenchmarks of the conversion paths.
+
+Run with `make benchmark` (settings are read from the environment or `.env`).
+"""
+import random
+import timeit
+from decimal import Decimal
+
+import numpy as np
+
+from app.api.currency.fixed_point import FixedPointRateTable, to_minor_units
+from app.api.currency.rate_matrix import RateMatrix
+from app.api.currency.rates import RateTable
+
+ROWS = 30_000
+REPEAT = 5
+
+randomizer = random.Random(4217)
+rate_table = RateTable(
+    "EUR",
+    {
+        f"C{index:02d}": Decimal(str(round(randomizer.uniform(0.0001, 20000), 6)))
+        for index in range(170)
+    },
+)
+currencies = sorted(rate_table.rates)
+amounts = [Decimal(randomizer.randint(0, 10**9)).scaleb(-2) for _ in range(ROWS)]
+base_currencies = [randomizer.choice(currencies) for _ in range(ROWS)]
+target_currencies = [randomizer.choice(currencies) for _ in range(ROWS)]
+
+
+def decimal_path():
+    # The conversion before the integer kernel: Decimal cross rate, then quantize.
+    for amount, base, target in zip(amounts, base_currencies, target_currencies):
+        (amount * rate_table.cross_rate(base, target)).quantize(Decimal("1.00"))
+
+
+fixed_point_rates = FixedPointRateTable(rate_table)
+amounts_minor = [to_minor_units(amount) for amount in amounts]
+
+
+def fixed_point_single_path():
+    convert_minor = fixed_point_rates.convert_minor
+    for amount_minor, base, target in zip(
+        amounts_minor, base_currencies, target_currencies
+    ):
+        convert_minor(amount_minor, base, target)
+
+
+def fixed_point_batch_path():
+    fixed_point_rates.convert_many_minor(
+        amounts_minor, base_currencies, target_currencies
+    )
+
+
+rate_matrix = RateMatrix(rate_table)
+float_amounts = np.array([float(amount) for amount in amounts])
+
+
+def float_matrix_path():
+    np.round(
+        float_amounts * rate_matrix.cross_rates(base_currencies, target_currencies), 2
+    )
+
+
+def main():
+    results = {
+        name: min(timeit.repeat(function, number=1, repeat=REPEAT))
+        for name, function in (
+            ("decimal", decimal_path),
+            ("fixed_point_single", fixed_point_single_path),
+            ("fixed_point_batch", fixed_point_batch_path),
+            ("float_matrix (inexact)", float_matrix_path),
+        )
+    }
+    baseline = results["decimal"]
+    print(f"{ROWS} conversions, best of {REPEAT}")
+    for name, seconds in results.items():
+        print(
+            f"{name:<24} {seconds * 1000:8.2f} ms "
+            f"{seconds / ROWS * 1e9:8.0f} ns/row {baseline / seconds:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
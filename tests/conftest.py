@@ -1,9 +1,16 @@
+from unittest.mock import AsyncMock, patch
+
 import pymongo
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.api.currency.rate_history import daily_rate_tables
+from app.api.currency.rates import rate_snapshot
+from app.api.currency.repository.currency_api import rates_providers
+from app.api.currency.repository.database import currencies_cache, currency_indexes
+from app.api.currency.symbols import currency_symbols
 from app.application import get_app
 from app.settings import settings
 
@@ -30,13 +37,25 @@ def mongo_db():
     client = pymongo.MongoClient(settings.mongo_test_url())
     yield client
     client[settings.mongo_test_database_name][settings.currency_collection_name].drop()
+    client[settings.mongo_test_database_name][
+        settings.rate_snapshot_collection_name
+    ].drop()
+    client[settings.mongo_test_database_name][
+        settings.rate_history_collection_name
+    ].drop()
+    client[settings.mongo_test_database_name][
+        settings.rate_rollup_collection_name
+    ].drop()
     client.close()
 
 
 @pytest.fixture()
 def client(async_mongo_db):
-    with (TestClient(get_app())) as client:
-        yield client
+    # Tests set the rates themselves, the background refresher must not race them.
+    with patch("app.api.currency.tasks._refresh_currency_rates", new=AsyncMock()):
+        with (TestClient(get_app())) as client:
+            reset_caches()
+            yield client
 
 
 @pytest.fixture()
@@ -69,3 +88,30 @@ def exchangerate_api_response() -> dict:
             "USD": 0.20,
         },
     }
+
+
+@pytest.fixture()
+def exchangerate_symbols_response() -> dict:
+    return {
+        "success": True,
+        "symbols": {
+            "BRL": {"description": "Brazilian Real", "code": "BRL"},
+            "USD": {"description": "United States Dollar", "code": "USD"},
+        },
+    }
+
+
+def reset_caches():
+    rate_snapshot.clear()
+    currency_symbols.clear()
+    rates_providers.reset()
+    currencies_cache.clear()
+    daily_rate_tables.clear()
+    currency_indexes.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    reset_caches()
+    yield
+    reset_caches()
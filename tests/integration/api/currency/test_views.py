@@ -1,7 +1,12 @@
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
 import httpx
 import pytest
+from bson.decimal128 import Decimal128
 from deepdiff import DeepDiff
 from fastapi.testclient import TestClient
 from mongomock import MongoClient, ObjectId
@@ -9,12 +14,15 @@ from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
     HTTP_409_CONFLICT,
     HTTP_422_UNPROCESSABLE_ENTITY,
     HTTP_503_SERVICE_UNAVAILABLE,
 )
 
+from app.api.currency.model import CurrencySchema
+from app.api.currency.rates import RateTable, rate_snapshot
 from app.settings import settings
 
 
@@ -33,6 +41,56 @@ async def test_get_all_currencies_view(client: TestClient, mongo_db: MongoClient
     assert response.status_code == HTTP_200_OK
 
 
+@pytest.mark.parametrize(
+    "params, headers",
+    [({"stream": True}, {}), ({}, {"Accept": "application/x-ndjson"})],
+)
+def test_should_stream_currencies_as_ndjson(
+    client: TestClient,
+    mongo_db: MongoClient,
+    currencies_payload: list,
+    params: dict,
+    headers: dict,
+):
+    mongo_db[settings.mongo_test_database_name][
+        settings.currency_collection_name
+    ].insert_many([dict(item) for item in currencies_payload])
+
+    response = client.get("/api/currency/", params=params, headers=headers)
+
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    result = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["iso_4217"] for item in result] == [
+        item["iso_4217"] for item in currencies_payload
+    ]
+
+
+def test_should_paginate_currencies_by_next_token(
+    client: TestClient, mongo_db: MongoClient, currencies_payload: list
+):
+    mongo_db[settings.mongo_test_database_name][
+        settings.currency_collection_name
+    ].insert_many([dict(item) for item in currencies_payload])
+
+    first_page = client.get("/api/currency/", params={"limit": 1})
+    next_token = first_page.headers["X-Next-Cursor"]
+    second_page = client.get("/api/currency/", params={"limit": 1, "next": next_token})
+
+    assert first_page.status_code == HTTP_200_OK
+    assert second_page.status_code == HTTP_200_OK
+    assert "X-Next-Cursor" not in second_page.headers
+    assert [item["iso_4217"] for item in first_page.json() + second_page.json()] == [
+        item["iso_4217"] for item in currencies_payload
+    ]
+
+
+def test_should_not_paginate_with_invalid_next_token(client: TestClient):
+    response = client.get("/api/currency/", params={"next": "not-a-cursor"})
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
 def test_shoud_create_a_currency(client: TestClient, currency_payload: dict):
     response = client.post("/api/currency/", json=currency_payload)
     result = response.json()
@@ -88,9 +146,7 @@ def test_shoud_not_create_an_already_created_currency(
 async def test_shoud_not_create_currency_when_external_service_is_down(
     client: TestClient, currency_payload: dict
 ):
-    with patch(
-        "app.api.currency.repository.currency_api.httpx.AsyncClient.get"
-    ) as mocky:
+    with patch("app.api.currency.repository.providers.httpx.AsyncClient.get") as mocky:
         mocky.side_effect = httpx.RequestError("error")
         response = client.post("/api/currency/", json=currency_payload)
 
@@ -117,16 +173,45 @@ def test_shoud_get_currencies_price(
     mongo_db[settings.mongo_test_database_name][
         settings.currency_collection_name
     ].insert_many(currencies_payload)
-    with patch(
-        "app.api.currency.repository.currency_api.CurrencyExternalAPIRepository.get_currencies_price"
-    ) as mocky:
-        mocky.return_value = exchangerate_api_response["rates"]
-        response = client.post(
-            "/api/currency/currencies-price", json=currencies_price_payload
-        )
-        result = response.json()
-        assert DeepDiff(expected_payload, result)
-        assert response.status_code == HTTP_200_OK
+    rate_snapshot.rate_table = RateTable(
+        exchangerate_api_response["base"],
+        {
+            iso_4217: Decimal(str(rate))
+            for iso_4217, rate in exchangerate_api_response["rates"].items()
+        },
+    )
+    response = client.post(
+        "/api/currency/currencies-price", json=currencies_price_payload
+    )
+    result = response.json()
+    assert DeepDiff(expected_payload, result)
+    assert response.status_code == HTTP_200_OK
+
+
+@patch(
+    "app.api.currency.repository.currency_api.CurrencyExternalAPIRepository.check_if_currency_exist"
+)
+def test_shoud_report_rates_age_on_currencies_price(
+    mock_check_if_currency_exist: MagicMock,
+    client: TestClient,
+    mongo_db: MongoClient,
+    currencies_payload: dict,
+    currencies_price_payload: dict,
+):
+    mock_check_if_currency_exist.return_value = True
+    mongo_db[settings.mongo_test_database_name][
+        settings.currency_collection_name
+    ].insert_many(currencies_payload)
+    rate_snapshot.rate_table = RateTable(
+        "BRL", {"USD": Decimal("0.2")}, fetched_at=time.time() - 5
+    )
+
+    response = client.post(
+        "/api/currency/currencies-price", json=currencies_price_payload
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert float(response.headers["X-Rates-Age"]) >= 5
 
 
 @pytest.mark.parametrize(
@@ -179,11 +264,12 @@ def test_shoud_not_get_currencies_price_with_inexistent_iso_4217(
 
 @pytest.mark.asyncio
 async def test_shoud_not_get_currencies_price_when_external_service_is_down(
-    client: TestClient, currencies_price_payload: dict
+    client: TestClient, mongo_db: MongoClient, currencies_price_payload: dict
 ):
-    with patch(
-        "app.api.currency.repository.currency_api.httpx.AsyncClient.get"
-    ) as mocky:
+    mongo_db[settings.mongo_test_database_name][
+        settings.rate_snapshot_collection_name
+    ].drop()
+    with patch("app.api.currency.repository.providers.httpx.AsyncClient.get") as mocky:
         mocky.side_effect = httpx.RequestError("error")
         response = client.post(
             "/api/currency/currencies-price", json=currencies_price_payload
@@ -296,9 +382,7 @@ async def test_shoud_not_get_update_when_external_service_is_down(
     mongo_db[settings.mongo_test_database_name][
         settings.currency_collection_name
     ].insert_one(currency_payload)
-    with patch(
-        "app.api.currency.repository.currency_api.httpx.AsyncClient.get"
-    ) as mocky:
+    with patch("app.api.currency.repository.providers.httpx.AsyncClient.get") as mocky:
         mocky.side_effect = httpx.RequestError("error")
 
         currency_id = currency_payload["_id"].__str__()
@@ -321,9 +405,7 @@ def test_shoud_not_update_currency_with_wrong_iso_4217(
         settings.currency_collection_name
     ].insert_one(currency_payload)
 
-    with patch(
-        "app.api.currency.repository.currency_api.httpx.AsyncClient.get"
-    ) as mocky:
+    with patch("app.api.currency.repository.providers.httpx.AsyncClient.get") as mocky:
         mocky.side_effect = httpx.RequestError("error")
 
         currency_id = currency_payload["_id"].__str__()
@@ -344,10 +426,10 @@ def test_shoud_not_update_with_empty_database(
     ].insert_one(currency_payload)
 
     with patch(
-        "app.api.currency.repository.database.CurrencyRepository.get_currency_by__id"
+        "app.api.currency.repository.currency_api.CurrencyExternalAPIRepository.check_if_currency_exist"
     ) as mocky:
-        mocky.return_value = []
-        currency_id = currency_payload["_id"].__str__()
+        mocky.return_value = True
+        currency_id = ObjectId().__str__()
         update_dict = dict(iso_4217="USD", name="Dolar")
         response = client.patch(f"/api/currency/{currency_id}", json=update_dict)
         assert response.status_code == HTTP_404_NOT_FOUND
@@ -415,17 +497,215 @@ def test_should_not_delete_a_inexistent_currency(
         settings.currency_collection_name
     ].insert_one(currency_payload)
 
+    response = client.delete(f"/api/currency/{ObjectId().__str__()}")
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+    new_currency = mongo_db[settings.mongo_test_database_name][
+        settings.currency_collection_name
+    ].find_one({"_id": currency_payload["_id"]})
+
+    assert new_currency is not None
+
+
+def test_should_run_bulk_currency_operations(
+    client: TestClient, mongo_db: MongoClient, currency_payload: dict
+):
+    mongo_db[settings.mongo_test_database_name][
+        settings.currency_collection_name
+    ].insert_one(currency_payload)
     currency_id = currency_payload["_id"].__str__()
+
     with patch(
-        "app.api.currency.repository.database.CurrencyRepository.get_currency_by__id"
+        "app.api.currency.repository.currency_api.CurrencyExternalAPIRepository.check_if_currency_exist"  # noqa
     ) as mocky:
-        mocky.return_value = []
-        response = client.delete(f"/api/currency/{currency_id}")
-
-        assert response.status_code == HTTP_404_NOT_FOUND
+        mocky.side_effect = lambda iso_4217: iso_4217 != "XNR"
+        response = client.post(
+            "/api/currency/bulk",
+            json={
+                "operations": [
+                    {"action": "create", "name": "dolar", "iso_4217": "USD"},
+                    {"action": "create", "name": "real", "iso_4217": "BRL"},
+                    {"action": "create", "name": "nope", "iso_4217": "XNR"},
+                    {"action": "update", "_id": currency_id, "name": "Real"},
+                    {"action": "delete", "_id": ObjectId().__str__()},
+                ]
+            },
+        )
 
-        new_currency = mongo_db[settings.mongo_test_database_name][
+    assert response.status_code == HTTP_200_OK
+    assert [item["status_code"] for item in response.json()] == [
+        HTTP_201_CREATED,
+        HTTP_409_CONFLICT,
+        HTTP_404_NOT_FOUND,
+        HTTP_204_NO_CONTENT,
+        HTTP_404_NOT_FOUND,
+    ]
+    assert (
+        mongo_db[settings.mongo_test_database_name][
             settings.currency_collection_name
-        ].find_one({"_id": ObjectId(currency_id)})
+        ].count_documents({})
+        == 2
+    )
+
+
+def test_should_not_run_bulk_create_without_iso_4217(client: TestClient):
+    response = client.post(
+        "/api/currency/bulk",
+        json={"operations": [{"action": "create", "name": "dolar"}]},
+    )
+
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_should_convert_currencies_price_batch(client: TestClient):
+    rate_snapshot.rate_table = RateTable(
+        settings.currency_reference_base,
+        {"BRL": Decimal("5.0"), "USD": Decimal("1.0")},
+    )
+
+    response = client.post(
+        "/api/currency/currencies-price/batch",
+        json={
+            "amounts": [50.0, 10.0],
+            "base_currencies": ["BRL", "USD"],
+            "target_currencies": ["USD", "BRL"],
+        },
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {"amounts": [10.0, 50.0], "rates": [0.2, 5.0]}
+    assert "X-Rates-Age" in response.headers
+
+
+def test_should_not_convert_currencies_price_batch_with_unknown_currency(
+    client: TestClient,
+):
+    rate_snapshot.rate_table = RateTable(
+        settings.currency_reference_base, {"BRL": Decimal("5.0")}
+    )
+
+    response = client.post(
+        "/api/currency/currencies-price/batch",
+        json={
+            "amounts": [1.0],
+            "base_currencies": ["BRL"],
+            "target_currencies": ["XNR"],
+        },
+    )
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+def test_should_not_convert_currencies_price_batch_with_uneven_columns(
+    client: TestClient,
+):
+    response = client.post(
+        "/api/currency/currencies-price/batch",
+        json={
+            "amounts": [1.0, 2.0],
+            "base_currencies": ["BRL"],
+            "target_currencies": ["USD"],
+        },
+    )
+
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_should_get_currencies_price_matrix(client: TestClient):
+    rate_snapshot.rate_table = RateTable(
+        settings.currency_reference_base,
+        {"BRL": Decimal("5.0"), "USD": Decimal("1.0")},
+    )
+
+    with patch(
+        "app.api.currency.repository.database.CurrencyRepository.get_currencies"
+    ) as mocky:
+        mocky.return_value = [
+            CurrencySchema(name="real", iso_4217="BRL"),
+            CurrencySchema(name="dolar", iso_4217="USD"),
+        ]
+        response = client.get("/api/currency/currencies-price/matrix")
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {
+        "currencies": ["BRL", "USD"],
+        "rates": [[1.0, 0.2], [5.0, 1.0]],
+    }
+
+
+def test_should_get_rates_history(client: TestClient, mongo_db: MongoClient):
+    mongo_db[settings.mongo_test_database_name][
+        settings.rate_history_collection_name
+    ].insert_many(
+        [
+            {
+                "reference": settings.currency_reference_base,
+                "fetched_at": datetime(2022, 4, 28, hour, tzinfo=timezone.utc),
+                "currencies": ["BRL", "USD"],
+                "rates": [Decimal128(rate), Decimal128("1")],
+            }
+            for hour, rate in ((8, "4"), (20, "5"))
+        ]
+    )
+
+    response = client.get(
+        "/api/currency/rates/history",
+        params={
+            "iso_4217": "usd",
+            "base_currency": "BRL",
+            "start": "2022-04-27",
+            "end": "2022-04-29",
+        },
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {
+        "base_currency": "BRL",
+        "iso_4217": "USD",
+        "rates": [{"date": "2022-04-28", "rate": 0.2}],
+    }
+
+
+def test_should_not_get_rates_history_ending_before_start(client: TestClient):
+    response = client.get(
+        "/api/currency/rates/history",
+        params={"iso_4217": "USD", "start": "2022-04-29", "end": "2022-04-28"},
+    )
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+def test_should_get_rates_stats(client: TestClient):
+    with patch(
+        "app.api.currency.repository.rate_rollup.RateRollupRepository.get_rate_stats"
+    ) as mocky:
+        mocky.return_value = [
+            dict(min=1.0, max=1.2, sum=2.2, count=2, last=1.2, last_at=1),
+            dict(min=0.9, max=1.0, sum=1.9, count=2, last=1.0, last_at=0),
+        ]
+        response = client.get(
+            "/api/currency/rates/stats", params={"iso_4217": "usd", "days": 7}
+        )
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {
+        "base_currency": settings.currency_reference_base,
+        "iso_4217": "USD",
+        "days": 7,
+        "min": 0.9,
+        "max": 1.2,
+        "mean": 1.025,
+        "last": 1.2,
+        "count": 4,
+    }
+
+
+def test_should_not_get_rates_stats_without_recorded_rates(client: TestClient):
+    with patch(
+        "app.api.currency.repository.rate_rollup.RateRollupRepository.get_rate_stats"
+    ) as mocky:
+        mocky.return_value = []
+        response = client.get("/api/currency/rates/stats", params={"iso_4217": "USD"})
 
-        assert new_currency is not None
+    assert response.status_code == HTTP_404_NOT_FOUND
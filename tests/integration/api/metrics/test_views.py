@@ -0,0 +1,29 @@
+from tests.conftest import TestClient
+
+
+def test_should_get_metrics(client: TestClient):
+    response = client.get("/metrics")
+    result = response.json()
+
+    assert response.status_code == 200
+    assert "currency_api_upstream_calls" in result["metrics"]
+    assert set(result["metrics"]["currency_api_upstream_calls"]) == {
+        "issued",
+        "coalesced",
+        "in_flight",
+        "fan_in_ratio",
+    }
+
+
+def test_should_get_mongo_metrics(client: TestClient):
+    response = client.get("/metrics")
+    result = response.json()
+
+    assert response.status_code == 200
+    assert "mongo_commands" in result["metrics"]
+    assert set(result["metrics"]["mongo_pool"]) == {
+        "checkout_wait",
+        "checkout_failures",
+        "connections",
+        "checked_out",
+    }
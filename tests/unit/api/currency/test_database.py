@@ -0,0 +1,318 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pymongo import ReadPreference
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.api.currency.model import CurrencySchema
+from app.api.currency.repository.database import (
+    CURRENCY_PROJECTION,
+    CurrencyRepository,
+    currency_indexes,
+)
+from app.api.helpers.exception import (
+    CurrencyAlreadyExistException,
+    CurrencyDoesNotExistException,
+)
+from app.settings import settings
+
+
+class AsyncCursor:
+    def __init__(self, rows):
+        self._rows = iter(rows)
+
+    def sort(self, key, direction):
+        self._rows = iter(sorted(self._rows, key=lambda row: row[key]))
+        return self
+
+    def limit(self, limit):
+        self._rows = iter(list(self._rows)[:limit])
+        return self
+
+    async def to_list(self, length):
+        return list(self._rows)[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.fixture()
+def rows(currencies_payload: list) -> list:
+    return [dict(item, _id=ObjectId()) for item in currencies_payload]
+
+
+@pytest.fixture()
+def collection(rows: list) -> MagicMock:
+    collection = MagicMock()
+    collection.with_options.return_value = collection
+    collection.find.side_effect = lambda *args, **kwargs: AsyncCursor(rows)
+    collection.find_one = AsyncMock()
+    collection.insert_one = AsyncMock()
+    collection.find_one_and_update = AsyncMock()
+    collection.find_one_and_delete = AsyncMock()
+    collection.index_information = AsyncMock(
+        return_value={
+            "_id_": {"key": [("_id", 1)]},
+            "iso_4217_1": {"key": [("iso_4217", 1)], "unique": True},
+        }
+    )
+    return collection
+
+
+@pytest.fixture()
+def currency_repository(collection: MagicMock) -> CurrencyRepository:
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+    return CurrencyRepository(settings, conn)
+
+
+@pytest.mark.asyncio
+async def test_should_read_currencies_once(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    first = await currency_repository.get_currencies()
+    second = await currency_repository.get_currencies()
+
+    assert [item.iso_4217 for item in first] == ["BRL", "USD"]
+    assert [item.iso_4217 for item in second] == ["BRL", "USD"]
+    assert collection.find.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_should_lookup_cached_currencies(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    await currency_repository.get_currencies()
+
+    by_iso_4217 = await currency_repository.get_currency_by_iso_4217("USD")
+    by__id = await currency_repository.get_currency_by__id(rows[0]["_id"])
+    missing = await currency_repository.get_currency_by_iso_4217("EUR")
+
+    assert by_iso_4217 == rows[1]
+    assert by__id == rows[0]
+    assert missing is None
+    collection.find_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_should_read_currencies_again_after_invalidation(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    await currency_repository.get_currencies()
+
+    currency_repository.invalidate_currencies_cache()
+    await currency_repository.get_currencies()
+
+    assert collection.find.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_should_raise_already_exist_on_duplicate_iso_4217(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    collection.insert_one.side_effect = DuplicateKeyError("E11000")
+
+    with pytest.raises(CurrencyAlreadyExistException):
+        await currency_repository.create_currency(
+            CurrencySchema(name="Real", iso_4217="BRL")
+        )
+
+    collection.find_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_should_update_currency_in_one_operation(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    collection.find_one_and_update.return_value = dict(rows[0], name="Real")
+
+    currency = await currency_repository.update_currency(
+        str(rows[0]["_id"]), {"name": "Real"}
+    )
+
+    assert currency.name == "Real"
+    collection.find_one_and_update.assert_awaited_once()
+    collection.find_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_should_raise_does_not_exist_when_updating_missing_currency(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = None
+
+    with pytest.raises(CurrencyDoesNotExistException):
+        await currency_repository.update_currency(str(ObjectId()), {"iso_4217": "USD"})
+
+
+@pytest.mark.asyncio
+async def test_should_raise_already_exist_when_updating_to_same_iso_4217(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {"_id": rows[0]["_id"]}
+
+    with pytest.raises(CurrencyAlreadyExistException):
+        await currency_repository.update_currency(
+            str(rows[0]["_id"]), {"iso_4217": rows[0]["iso_4217"]}
+        )
+
+
+@pytest.mark.asyncio
+async def test_should_raise_already_exist_when_updating_to_taken_iso_4217(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    collection.find_one_and_update.side_effect = DuplicateKeyError("E11000")
+
+    with pytest.raises(CurrencyAlreadyExistException):
+        await currency_repository.update_currency(
+            str(rows[0]["_id"]), {"iso_4217": rows[1]["iso_4217"]}
+        )
+
+
+@pytest.mark.asyncio
+async def test_should_raise_does_not_exist_when_deleting_missing_currency(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    collection.find_one_and_delete.return_value = None
+
+    with pytest.raises(CurrencyDoesNotExistException):
+        await currency_repository.delete_currency(ObjectId())
+
+    collection.find_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_should_read_currencies_with_projection_and_batch_size(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    await currency_repository.get_currencies()
+
+    collection.find.assert_called_once_with(
+        {}, CURRENCY_PROJECTION, batch_size=settings.currency_cursor_batch_size
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_serialize_currencies_like_the_response_model(
+    currency_repository: CurrencyRepository, rows: list
+):
+    content = await currency_repository.get_currencies_json()
+
+    expected = jsonable_encoder(
+        [CurrencySchema(**row) for row in rows],
+        by_alias=True,
+        custom_encoder={ObjectId: str},
+    )
+    assert json.loads(content) == expected
+    assert await currency_repository.get_currencies_json() is content
+
+
+@pytest.mark.asyncio
+async def test_should_stream_currencies_as_ndjson(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    lines = [line async for line in currency_repository.stream_currencies_ndjson()]
+
+    assert [json.loads(line) for line in lines] == [
+        {"_id": str(row["_id"]), "name": row["name"], "iso_4217": row["iso_4217"]}
+        for row in rows
+    ]
+    assert all(line.endswith(b"\n") for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_should_read_currencies_page_by_keyset(
+    currency_repository: CurrencyRepository, collection: MagicMock, rows: list
+):
+    content, last_id = await currency_repository.get_currencies_page_json(1)
+
+    assert [item["_id"] for item in json.loads(content)] == [str(rows[0]["_id"])]
+    assert last_id == rows[0]["_id"]
+
+    await currency_repository.get_currencies_page_json(1, last_id)
+
+    assert collection.find.call_args.args[0] == {"_id": {"$gt": rows[0]["_id"]}}
+
+
+@pytest.mark.asyncio
+async def test_should_not_return_next_on_last_page(
+    currency_repository: CurrencyRepository, rows: list
+):
+    content, last_id = await currency_repository.get_currencies_page_json(len(rows))
+
+    assert len(json.loads(content)) == len(rows)
+    assert last_id is None
+
+
+@pytest.mark.asyncio
+async def test_should_return_bulk_write_errors_by_index(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    collection.bulk_write = AsyncMock(
+        side_effect=BulkWriteError(
+            {"writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000"}]}
+        )
+    )
+
+    errors = await currency_repository.bulk_write([MagicMock(), MagicMock()])
+
+    assert errors == {1: 11000}
+    assert collection.bulk_write.await_args.kwargs == {"ordered": False}
+
+
+@pytest.mark.asyncio
+async def test_should_read_pages_with_configured_read_preference(
+    collection: MagicMock,
+):
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+    currency_repository = CurrencyRepository(
+        settings.copy(update={"mongo_read_preference": "secondaryPreferred"}), conn
+    )
+
+    await currency_repository.get_currencies_page_json(1)
+    await currency_repository.get_currencies()
+
+    collection.with_options.assert_called_once_with(
+        read_preference=ReadPreference.SECONDARY_PREFERRED
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_check_iso_4217_while_unique_index_is_missing(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    collection.index_information.return_value = {"_id_": {"key": [("_id", 1)]}}
+    collection.find_one.return_value = {"_id": ObjectId()}
+
+    with pytest.raises(CurrencyAlreadyExistException):
+        await currency_repository.create_currency(
+            CurrencySchema(name="Real", iso_4217="BRL")
+        )
+
+    collection.insert_one.assert_not_awaited()
+    assert currency_indexes.unique_iso_4217 is False
+
+
+@pytest.mark.asyncio
+async def test_should_stop_checking_iso_4217_once_unique_index_exists(
+    currency_repository: CurrencyRepository, collection: MagicMock
+):
+    for _ in range(2):
+        await currency_repository.create_currency(
+            CurrencySchema(name="Real", iso_4217="BRL")
+        )
+
+    collection.index_information.assert_awaited_once()
+    collection.find_one.assert_not_awaited()
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from app.api.currency.events import CurrencyEventFeed
+from app.api.currency.repository.currency_event import NOOP_EVENT, UPDATE_EVENT
+from app.api.currency.repository.database import CURRENCIES_CACHE_KEY, currencies_cache
+
+
+def test_should_invalidate_currencies_cache_on_event():
+    currency_event_feed = CurrencyEventFeed()
+    currencies_cache.set(CURRENCIES_CACHE_KEY, object())
+
+    currency_event_feed.apply(
+        {
+            "action": UPDATE_EVENT,
+            "currency_id": ObjectId(),
+            "emitted_at": datetime.utcnow() - timedelta(milliseconds=50),
+        }
+    )
+
+    assert CURRENCIES_CACHE_KEY not in currencies_cache
+    assert currency_event_feed.applied == 1
+    assert currency_event_feed.stats()["last_lag_ms"] >= 50
+
+
+def test_should_ignore_noop_event():
+    currency_event_feed = CurrencyEventFeed()
+    currencies_cache.set(CURRENCIES_CACHE_KEY, "cached")
+
+    currency_event_feed.apply(
+        {"action": NOOP_EVENT, "currency_id": None, "emitted_at": datetime.utcnow()}
+    )
+
+    assert currencies_cache.get(CURRENCIES_CACHE_KEY) == "cached"
+    assert currency_event_feed.applied == 0
@@ -0,0 +1,130 @@
+import random
+from decimal import ROUND_HALF_EVEN, Decimal, localcontext
+
+import pytest
+
+from app.api.currency.fixed_point import (
+    FixedPointRateTable,
+    FixedPointRateTableCache,
+    from_minor_units,
+    to_minor_units,
+)
+from app.api.currency.rates import RateTable
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+
+@pytest.fixture()
+def rate_table() -> RateTable:
+    return RateTable(
+        "EUR",
+        {
+            "BRL": Decimal("5.1647"),
+            "USD": Decimal("1.0892"),
+            "JPY": Decimal("163.21"),
+            "BTC": Decimal("0.000023"),
+        },
+    )
+
+
+def exact_conversion(rate_table: RateTable, amount: Decimal, base: str, target: str):
+    with localcontext() as context:
+        context.prec = 60
+        return (amount * rate_table.rates[target] / rate_table.rates[base]).quantize(
+            Decimal("1.00"), rounding=ROUND_HALF_EVEN
+        )
+
+
+def test_should_convert_minor_units_exactly(rate_table: RateTable):
+    rates = FixedPointRateTable(rate_table)
+    currencies = sorted(rates.ratios)
+    randomizer = random.Random(4217)
+
+    for _ in range(1000):
+        amount = Decimal(randomizer.randint(0, 10**12)).scaleb(-2)
+        base, target = randomizer.choice(currencies), randomizer.choice(currencies)
+
+        converted = rates.convert_minor(to_minor_units(amount), base, target)
+
+        assert from_minor_units(converted) == exact_conversion(
+            rate_table, amount, base, target
+        )
+
+
+def test_should_round_ties_half_even():
+    rates = FixedPointRateTable(RateTable("EUR", {"USD": Decimal("0.5")}))
+
+    assert rates.convert_minor(1, "EUR", "USD") == 0
+    assert rates.convert_minor(3, "EUR", "USD") == 2
+    assert rates.convert_minor(5, "EUR", "USD") == 2
+
+
+def test_should_convert_many_like_one_by_one(rate_table: RateTable):
+    rates = FixedPointRateTable(rate_table)
+    amounts = [5000, 123456, 1, 999999999]
+    bases = ["BRL", "USD", "JPY", "BTC"]
+    targets = ["USD", "JPY", "BTC", "EUR"]
+
+    assert rates.convert_many_minor(amounts, bases, targets) == [
+        rates.convert_minor(amount, base, target)
+        for amount, base, target in zip(amounts, bases, targets)
+    ]
+
+
+def test_should_not_convert_unknown_currency(rate_table: RateTable):
+    rates = FixedPointRateTable(rate_table)
+
+    with pytest.raises(CurrencyDoesNotExistException):
+        rates.convert_minor(100, "BRL", "XNR")
+    with pytest.raises(CurrencyDoesNotExistException):
+        rates.convert_many_minor([100], ["XNR"], ["BRL"])
+
+
+def test_should_scale_amounts_to_minor_units():
+    assert to_minor_units(Decimal("50.00")) == 5000
+    assert to_minor_units(Decimal("0.125")) == 12
+    assert from_minor_units(994) == Decimal("9.94")
+
+
+def test_should_reuse_table_of_same_rate_table(rate_table: RateTable):
+    cache = FixedPointRateTableCache()
+
+    table = cache.get(rate_table)
+
+    assert cache.get(rate_table) is table
+    assert cache.get(RateTable("EUR", rate_table.rates)) is not table
+
+
+@pytest.mark.parametrize(
+    "rates",
+    [
+        {"BTC": Decimal("0.0000234567891234"), "USD": Decimal("1.08923456789012")},
+        {"XTN": Decimal("1E-15"), "VES": Decimal("98765432109.87654321")},
+        {"IRR": Decimal("45612.3456789"), "XAU": Decimal("0.000512345678901234")},
+    ],
+)
+def test_should_convert_exactly_with_any_rate_precision_or_magnitude(rates: dict):
+    rate_table = RateTable("EUR", rates)
+    fixed_point_rates = FixedPointRateTable(rate_table)
+    currencies = sorted(fixed_point_rates.ratios)
+    randomizer = random.Random(4217)
+
+    for _ in range(1000):
+        amount = Decimal(randomizer.randint(0, 10**14)).scaleb(-2)
+        base = randomizer.choice(currencies)
+        target = randomizer.choice(currencies)
+
+        converted = fixed_point_rates.convert_minor(
+            to_minor_units(amount), base, target
+        )
+
+        assert from_minor_units(converted) == exact_conversion(
+            rate_table, amount, base, target
+        )
+
+
+def test_should_leave_out_currencies_without_a_positive_rate():
+    rates = FixedPointRateTable(RateTable("EUR", {"ZZZ": Decimal(0)}))
+
+    assert list(rates.ratios) == ["EUR"]
+    with pytest.raises(CurrencyDoesNotExistException):
+        rates.convert_minor(100, "ZZZ", "EUR")
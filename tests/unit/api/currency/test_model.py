@@ -3,7 +3,11 @@ from unittest.mock import MagicMock, patch
 import pytest
 from bson.objectid import ObjectId
 
-from app.api.currency.model import CurrencySchema, PyObjectId
+from app.api.currency.model import (
+    CurrenciesBatchConversionInputSchema,
+    CurrencySchema,
+    PyObjectId,
+)
 
 
 def test_should_create_currency(currency_payload: dict):
@@ -45,3 +49,28 @@ def test_should_not_validate_invalid_object_id(mock_is_valid: MagicMock):
     with pytest.raises(ValueError):
         PyObjectId.validate("xxxxxxxxxxxxxxxx")
         assert mock_is_valid.assert_called_once()
+
+
+@pytest.mark.parametrize("amount", ["NaN", "Infinity", "-Infinity"])
+def test_should_not_accept_non_finite_batch_amounts(amount: str):
+    with pytest.raises(ValueError):
+        CurrenciesBatchConversionInputSchema(
+            amounts=[amount], base_currencies=["BRL"], target_currencies=["USD"]
+        )
+
+
+def test_should_upper_case_batch_currencies():
+    batch = CurrenciesBatchConversionInputSchema(
+        amounts=["1"], base_currencies=["usd"], target_currencies=["brl"]
+    )
+
+    assert batch.base_currencies == ["USD"]
+    assert batch.target_currencies == ["BRL"]
+
+
+@pytest.mark.parametrize("wrong_iso", ["BR", "BRLL", "123", ""])
+def test_should_not_accept_invalid_batch_currencies(wrong_iso: str):
+    with pytest.raises(ValueError):
+        CurrenciesBatchConversionInputSchema(
+            amounts=["1"], base_currencies=["BRL"], target_currencies=[wrong_iso]
+        )
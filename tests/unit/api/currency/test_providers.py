@@ -0,0 +1,196 @@
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from app.api.currency.rates import RateTable
+from app.api.currency.repository.providers import (
+    ExchangeRateHostProvider,
+    FrankfurterProvider,
+    RatesProviderRouter,
+    StubRatesProvider,
+    TrackedRatesProvider,
+    build_rates_provider,
+)
+from app.api.helpers.circuit_breaker import CircuitBreaker
+from app.api.helpers.exception import (
+    ExternalAPICircuitOpenException,
+    ExternalAPIUnreachableException,
+)
+from app.settings import settings
+
+
+def tracked(provider) -> TrackedRatesProvider:
+    return TrackedRatesProvider(
+        provider,
+        CircuitBreaker(
+            failure_rate_threshold=0.5, window_size=2, minimum_calls=2, open_timeout=30
+        ),
+    )
+
+
+def failing_provider(name: str):
+    provider = AsyncMock()
+    provider.name = name
+    provider.get_rate_table.side_effect = ExternalAPIUnreachableException
+    return provider
+
+
+def http_provider(provider_class, status_code=200, **response):
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(status_code, **response)
+        )
+    )
+    return provider_class(settings, "https://rates.test", client)
+
+
+@pytest.mark.asyncio
+async def test_should_parse_http_provider_rates():
+    provider = http_provider(
+        ExchangeRateHostProvider, json={"base": "EUR", "rates": {"USD": 1.0545}}
+    )
+
+    rate_table = await provider.get_rate_table("EUR")
+
+    assert rate_table.rates["USD"] == Decimal("1.0545")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "status_code, response",
+    [
+        (429, {"json": {"message": "Too many requests"}}),
+        (404, {"json": {"message": "not found"}}),
+        (503, {"json": {}}),
+        (200, {"json": {"success": False, "error": {"code": 101}}}),
+        (200, {"json": {"rates": {"USD": "n/a"}}}),
+        (200, {"json": ["USD"]}),
+        (200, {"text": "<html>maintenance</html>"}),
+    ],
+)
+async def test_should_treat_unusable_answers_as_unreachable(status_code, response):
+    for provider_class in (ExchangeRateHostProvider, FrankfurterProvider):
+        provider = http_provider(provider_class, status_code, **response)
+
+        with pytest.raises(ExternalAPIUnreachableException):
+            await provider.get_rate_table("EUR")
+
+
+@pytest.mark.asyncio
+async def test_should_treat_a_symbols_error_answer_as_unreachable():
+    provider = http_provider(ExchangeRateHostProvider, json={"success": False})
+
+    with pytest.raises(ExternalAPIUnreachableException):
+        await provider.get_symbols()
+
+
+@pytest.mark.asyncio
+async def test_should_fail_over_on_an_error_answer():
+    broken = tracked(
+        http_provider(ExchangeRateHostProvider, json={"success": False, "error": {}})
+    )
+    stub = tracked(StubRatesProvider())
+    router = RatesProviderRouter([broken, stub])
+
+    await router.get_rate_table("EUR")
+
+    assert broken.errors == 1
+    assert stub.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_should_get_stub_rates_against_any_reference():
+    provider = StubRatesProvider({"EUR": "1", "BRL": "5", "USD": "1.25"})
+
+    rate_table = await provider.get_rate_table("USD")
+
+    assert rate_table.reference == "USD"
+    assert rate_table.rates["BRL"] == Decimal(4)
+    assert await provider.get_symbols() == {"EUR", "BRL", "USD"}
+
+
+@pytest.mark.asyncio
+async def test_should_route_to_fastest_provider():
+    slow = tracked(StubRatesProvider())
+    slow.provider.name = "slow"
+    slow.latency = 0.5
+    fast = tracked(StubRatesProvider())
+    fast.provider.name = "fast"
+    fast.latency = 0.05
+    router = RatesProviderRouter([slow, fast])
+
+    await router.get_rate_table("EUR")
+
+    assert fast.calls == 1
+    assert slow.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_should_fail_over_to_next_provider():
+    broken = tracked(failing_provider("broken"))
+    stub = tracked(StubRatesProvider())
+    router = RatesProviderRouter([broken, stub])
+
+    rate_table = await router.get_rate_table("EUR")
+
+    assert isinstance(rate_table, RateTable)
+    assert broken.errors == 1
+    assert stub.calls == 1
+    assert router.stats()["broken"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_should_skip_provider_with_open_circuit():
+    broken = tracked(failing_provider("broken"))
+    stub = tracked(StubRatesProvider())
+    router = RatesProviderRouter([broken, stub])
+    broken.breaker._open()
+
+    await router.get_rate_table("EUR")
+
+    assert broken.provider.get_rate_table.await_count == 0
+
+
+@pytest.mark.asyncio
+async def test_should_probe_a_recovered_fast_provider_before_falling_back():
+    slow = tracked(StubRatesProvider())
+    slow.provider.name = "slow"
+    slow.latency = 0.5
+    fast = tracked(StubRatesProvider())
+    fast.provider.name = "fast"
+    fast.latency = 0.05
+    fast.breaker._open()
+    fast.breaker.open_timeout = 0
+    router = RatesProviderRouter([slow, fast])
+
+    await router.get_rate_table("EUR")
+    await router.get_rate_table("EUR")
+
+    assert fast.calls == 2
+    assert slow.calls == 0
+    assert fast.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_should_raise_when_every_provider_fails():
+    router = RatesProviderRouter([tracked(failing_provider("broken"))])
+
+    with pytest.raises(ExternalAPIUnreachableException):
+        await router.get_rate_table("EUR")
+
+
+@pytest.mark.asyncio
+async def test_should_raise_circuit_open_when_every_circuit_is_open():
+    broken = tracked(failing_provider("broken"))
+    broken.breaker._open()
+    router = RatesProviderRouter([broken])
+
+    with pytest.raises(ExternalAPICircuitOpenException):
+        await router.get_rate_table("EUR")
+
+
+def test_should_not_build_unknown_provider():
+    with pytest.raises(ValueError):
+        build_rates_provider(settings, "unknown")
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.decimal128 import Decimal128
+
+from app.api.currency.rate_history import DailyRateTables
+from app.api.currency.rates import RateTable
+from app.api.currency.repository.rate_history import RateHistoryRepository
+from app.settings import settings
+
+
+class AsyncRows:
+    def __init__(self, rows):
+        self._rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.fixture()
+def collection() -> MagicMock:
+    collection = MagicMock()
+    collection.insert_one = AsyncMock()
+    return collection
+
+
+@pytest.fixture()
+def rate_history_repository(collection: MagicMock) -> RateHistoryRepository:
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+    return RateHistoryRepository(settings, conn)
+
+
+def test_should_evict_least_recently_used_day():
+    daily_rate_tables = DailyRateTables(max_size=2)
+    first, second, third = date(2022, 4, 27), date(2022, 4, 28), date(2022, 4, 29)
+
+    daily_rate_tables.set(first, RateTable("EUR", {}))
+    daily_rate_tables.set(second, None)
+    daily_rate_tables.get(first)
+    daily_rate_tables.set(third, RateTable("EUR", {}))
+
+    assert first in daily_rate_tables
+    assert second not in daily_rate_tables
+    assert third in daily_rate_tables
+    assert len(daily_rate_tables) == 2
+
+
+@pytest.mark.asyncio
+async def test_should_record_rates_as_aligned_arrays(
+    rate_history_repository: RateHistoryRepository, collection: MagicMock
+):
+    await rate_history_repository.record_rate_table(
+        RateTable(
+            "EUR",
+            {"USD": Decimal("1.08"), "BRL": Decimal("5.3")},
+            fetched_at=1651190400.0,
+        )
+    )
+
+    collection.insert_one.assert_awaited_once_with(
+        {
+            "reference": "EUR",
+            "fetched_at": datetime(2022, 4, 29, tzinfo=timezone.utc),
+            "currencies": ["BRL", "EUR", "USD"],
+            "rates": [Decimal128("5.3"), Decimal128("1"), Decimal128("1.08")],
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_rebuild_one_rate_table_per_day(
+    rate_history_repository: RateHistoryRepository, collection: MagicMock
+):
+    collection.aggregate.return_value = AsyncRows(
+        [
+            {
+                "_id": datetime(2022, 4, 29),
+                "fetched_at": datetime(2022, 4, 29, 23),
+                "currencies": ["BRL", "EUR", "USD"],
+                "rates": [Decimal128("5.3"), Decimal128("1"), Decimal128("1.08")],
+            }
+        ]
+    )
+
+    rate_tables = await rate_history_repository.get_daily_rate_tables(
+        "EUR", date(2022, 4, 28), date(2022, 4, 29)
+    )
+
+    assert list(rate_tables) == [date(2022, 4, 29)]
+    assert rate_tables[date(2022, 4, 29)].rates["BRL"] == Decimal("5.3")
+    assert rate_tables[date(2022, 4, 29)].fetched_at == 1651273200.0
+    match = collection.aggregate.call_args.args[0][0]["$match"]
+    assert match["fetched_at"] == {
+        "$gte": datetime(2022, 4, 28, tzinfo=timezone.utc),
+        "$lt": datetime(2022, 4, 30, tzinfo=timezone.utc),
+    }
@@ -0,0 +1,107 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.api.currency.rate_matrix import (
+    CrossRateMatrixJSONCache,
+    RateMatrix,
+    RateMatrixCache,
+)
+from app.api.currency.rates import RateTable
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+
+@pytest.fixture()
+def rate_table() -> RateTable:
+    return RateTable(
+        "EUR",
+        {"BRL": Decimal("5.1647"), "USD": Decimal("1.0892"), "JPY": Decimal("163.21")},
+    )
+
+
+def test_should_gather_cross_rates_by_pair(rate_table: RateTable):
+    pairs = [("BRL", "USD"), ("USD", "JPY"), ("JPY", "EUR"), ("EUR", "EUR")]
+
+    rates = RateMatrix(rate_table).cross_rates(
+        [base for base, _ in pairs], [target for _, target in pairs]
+    )
+
+    for (base, target), rate in zip(pairs, rates):
+        assert rate == pytest.approx(float(rate_table.cross_rate(base, target)))
+
+
+def test_should_not_gather_cross_rates_of_unknown_currency(rate_table: RateTable):
+    with pytest.raises(CurrencyDoesNotExistException):
+        RateMatrix(rate_table).cross_rates(["BRL"], ["XNR"])
+
+
+def test_should_reuse_matrix_of_same_rate_table(rate_table: RateTable):
+    cache = RateMatrixCache()
+
+    rate_matrix = cache.get(rate_table)
+
+    assert cache.get(rate_table) is rate_matrix
+    assert cache.get(RateTable("EUR", rate_table.rates)) is not rate_matrix
+
+
+def test_should_serialize_cross_rate_matrix_once(rate_table: RateTable):
+    cache = CrossRateMatrixJSONCache(RateMatrixCache())
+
+    content = cache.get(rate_table, ["BRL", "USD"])
+
+    assert cache.get(rate_table, ("BRL", "USD")) is content
+    result = json.loads(content)
+    assert result["currencies"] == ["BRL", "USD"]
+    assert result["rates"][0][0] == 1.0
+    assert result["rates"][0][1] == pytest.approx(1.0892 / 5.1647)
+    assert result["rates"][1][0] == pytest.approx(5.1647 / 1.0892)
+
+
+def test_should_serialize_cross_rate_matrix_again_on_change(rate_table: RateTable):
+    cache = CrossRateMatrixJSONCache(RateMatrixCache())
+
+    content = cache.get(rate_table, ["BRL", "USD"])
+
+    assert cache.get(rate_table, ["BRL", "USD", "JPY"]) is not content
+    assert cache.get(RateTable("EUR", rate_table.rates), ["BRL", "USD"]) is not content
+
+
+def test_should_leave_out_currencies_without_a_usable_rate():
+    rate_matrix = RateMatrix(
+        RateTable(
+            "EUR",
+            {
+                "BRL": Decimal("5.1647"),
+                "XAA": Decimal(0),
+                "XBB": Decimal("-1"),
+                "XCC": Decimal("NaN"),
+                "XDD": Decimal("Infinity"),
+                "XEE": Decimal("1e400"),
+            },
+        )
+    )
+
+    assert rate_matrix.currencies == ("BRL", "EUR")
+    assert "XAA" not in rate_matrix
+    with pytest.raises(CurrencyDoesNotExistException):
+        rate_matrix.cross_rates(["BRL"], ["XAA"])
+
+
+def test_should_serialize_a_matrix_without_usable_rates_as_strict_json():
+    rate_table = RateTable("EUR", {"BRL": Decimal("5.1647"), "XAA": Decimal(0)})
+    rate_matrix_cache = RateMatrixCache()
+
+    content = CrossRateMatrixJSONCache(rate_matrix_cache).get(
+        rate_table,
+        [
+            iso_4217
+            for iso_4217 in ("BRL", "EUR", "XAA")
+            if iso_4217 in rate_matrix_cache.get(rate_table)
+        ],
+    )
+
+    assert json.loads(content, parse_constant=pytest.fail)["currencies"] == [
+        "BRL",
+        "EUR",
+    ]
@@ -0,0 +1,185 @@
+from calendar import monthrange
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.api.currency.rate_rollup import (
+    DAY,
+    MONTH,
+    WEEK,
+    cover_window,
+    merge_rate_stats,
+    period_starts,
+)
+from app.api.currency.rates import RateTable
+from app.api.currency.repository.rate_rollup import RateRollupRepository
+from app.settings import settings
+
+
+def test_should_find_period_starts_of_a_day():
+    assert period_starts(date(2022, 4, 29)) == {
+        DAY: date(2022, 4, 29),
+        WEEK: date(2022, 4, 25),
+        MONTH: date(2022, 4, 1),
+    }
+
+
+def test_should_cover_window_with_the_fewest_rollups():
+    assert cover_window(date(2022, 3, 30), date(2022, 5, 10)) == [
+        (DAY, date(2022, 3, 30)),
+        (DAY, date(2022, 3, 31)),
+        (MONTH, date(2022, 4, 1)),
+        (DAY, date(2022, 5, 1)),
+        (WEEK, date(2022, 5, 2)),
+        (DAY, date(2022, 5, 9)),
+        (DAY, date(2022, 5, 10)),
+    ]
+
+
+def test_should_not_split_a_whole_month_for_a_week():
+    assert cover_window(date(2022, 8, 29), date(2022, 9, 30)) == [
+        (DAY, date(2022, 8, 29)),
+        (DAY, date(2022, 8, 30)),
+        (DAY, date(2022, 8, 31)),
+        (MONTH, date(2022, 9, 1)),
+    ]
+
+
+def test_should_use_every_whole_month_of_a_year():
+    periods = cover_window(date(2025, 3, 4), date(2026, 3, 3))
+
+    assert [start for period, start in periods if period == MONTH] == [
+        date(2025, month, 1) for month in range(4, 13)
+    ] + [date(2026, 1, 1), date(2026, 2, 1)]
+    assert len(periods) == 24
+
+
+def _period_length(period, first):
+    if period == MONTH:
+        return monthrange(first.year, first.month)[1]
+    return 7 if period == WEEK else 1
+
+
+def test_should_cover_every_day_of_a_year_once_whatever_the_alignment():
+    for shift in range(366):
+        end = date(2026, 3, 3) + timedelta(days=shift)
+        start = end - timedelta(days=364)
+
+        days = [
+            first + timedelta(days=offset)
+            for period, first in cover_window(start, end)
+            for offset in range(_period_length(period, first))
+        ]
+
+        assert days == [start + timedelta(days=offset) for offset in range(365)]
+        assert len(cover_window(start, end)) <= 30
+
+
+def test_should_merge_rate_stats():
+    assert merge_rate_stats(
+        [
+            dict(min=1.0, max=3.0, sum=6.0, count=3, last=2.0, last_at=2),
+            dict(min=0.5, max=2.0, sum=2.0, count=1, last=0.5, last_at=1),
+        ]
+    ) == dict(min=0.5, max=3.0, mean=2.0, last=2.0, count=4)
+    assert merge_rate_stats([]) is None
+
+
+@pytest.mark.asyncio
+async def test_should_update_day_week_and_month_rollups_at_once():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock()
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+
+    await RateRollupRepository(settings, conn).record_rate_table(
+        RateTable("EUR", {"USD": Decimal("1.08")}, fetched_at=1651190400.0)
+    )
+
+    requests = collection.bulk_write.call_args.args[0]
+    fetched_at = datetime(2022, 4, 29, tzinfo=timezone.utc)
+    assert [request._filter["_id"]["period"] for request in requests] == [
+        DAY,
+        WEEK,
+        MONTH,
+    ]
+    assert requests[1]._filter["_id"]["start"] == datetime(
+        2022, 4, 25, tzinfo=timezone.utc
+    )
+    assert requests[0]._doc["$min"]["rates.USD.min"] == 1.08
+    assert requests[0]._doc["$inc"]["rates.USD.count"] == 1
+    assert all(request._upsert for request in requests)
+    assert requests[0]._doc["$max"]["rates.USD.latest"] == {
+        "at": fetched_at,
+        "rate": 1.08,
+    }
+    assert all(
+        request._filter["snapshots"] == {"$ne": fetched_at} for request in requests
+    )
+    assert requests[0]._doc["$push"]["snapshots"]["$each"] == [fetched_at]
+
+
+@pytest.mark.asyncio
+async def test_should_skip_rollups_that_already_took_the_snapshot():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(
+        side_effect=BulkWriteError(
+            {"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000"}]}
+        )
+    )
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+
+    await RateRollupRepository(settings, conn).record_rate_table(
+        RateTable("EUR", {"USD": Decimal("1.08")}, fetched_at=1651190400.0)
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_raise_other_rollup_write_errors():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(
+        side_effect=BulkWriteError(
+            {"writeErrors": [{"index": 1, "code": 121, "errmsg": "invalid"}]}
+        )
+    )
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+
+    with pytest.raises(BulkWriteError):
+        await RateRollupRepository(settings, conn).record_rate_table(
+            RateTable("EUR", {"USD": Decimal("1.08")}, fetched_at=1651190400.0)
+        )
+
+
+@pytest.mark.asyncio
+async def test_should_read_rollup_stats_with_their_latest_rate():
+    rows = MagicMock()
+    rows.__aiter__.return_value = [
+        {
+            "rates": {
+                "USD": {
+                    "min": 1.0,
+                    "max": 1.2,
+                    "sum": 2.2,
+                    "count": 2,
+                    "latest": {"at": 2, "rate": 1.2},
+                }
+            }
+        },
+        {"rates": {"BRL": {}}},
+    ]
+    collection = MagicMock()
+    collection.find.return_value = rows
+    conn = MagicMock()
+    conn.__getitem__.return_value.__getitem__.return_value = collection
+
+    rate_stats = await RateRollupRepository(settings, conn).get_rate_stats(
+        "EUR", "USD", [(DAY, date(2022, 4, 29))]
+    )
+
+    assert rate_stats == [dict(min=1.0, max=1.2, sum=2.2, count=2, last=1.2, last_at=2)]
+    assert collection.find.call_args.args[1] == {"rates.USD": True}
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pytest
+
+from app.api.currency.rates import CROSS_RATE_RELATIVE_TOLERANCE, RateTable
+from app.api.helpers.exception import CurrencyDoesNotExistException
+
+
+@pytest.fixture()
+def rate_table() -> RateTable:
+    return RateTable(
+        "EUR",
+        {"BRL": Decimal("5.2285"), "USD": Decimal("1.0545"), "JPY": Decimal("137.2")},
+    )
+
+
+def test_should_include_reference_currency(rate_table: RateTable):
+    assert rate_table.cross_rate("EUR", "EUR") == Decimal(1)
+    assert rate_table.cross_rate("EUR", "USD") == Decimal("1.0545")
+
+
+def test_should_triangulate_cross_rate(rate_table: RateTable):
+    rate = rate_table.cross_rate("BRL", "USD")
+
+    assert rate.quantize(Decimal("1.000000")) == Decimal("0.201683")
+    assert abs(rate_table.cross_rate("USD", "BRL") * rate - 1) < Decimal("1e-15")
+
+
+def test_should_get_rates_for_listed_currencies(rate_table: RateTable):
+    rates = rate_table.rates_for("USD", ["BRL", "JPY", "XMR"])
+
+    assert set(rates) == {"BRL", "JPY"}
+
+
+def test_should_raise_when_base_currency_is_unknown(rate_table: RateTable):
+    with pytest.raises(CurrencyDoesNotExistException):
+        rate_table.rates_for("XMR")
+
+
+def test_should_match_direct_rate_within_tolerance(rate_table: RateTable):
+    # Direct BRL->JPY upstream answer for 1000 BRL, rounded to 2 places.
+    direct_amount = Decimal("26240.78")
+    amount = Decimal(1000) * rate_table.cross_rate("BRL", "JPY")
+
+    tolerance = Decimal("0.01") + direct_amount * CROSS_RATE_RELATIVE_TOLERANCE
+    assert abs(amount.quantize(Decimal("1.00")) - direct_amount) <= tolerance
@@ -1,11 +1,19 @@
+import asyncio
+import time
+from decimal import Decimal
 from typing import Dict
-from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, PropertyMock, patch
 
 import httpx
 import pytest
+from starlette.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
 
+from app.api.currency.rates import RateTable, rate_snapshot
 from app.api.currency.repository.currency_api import CurrencyExternalAPIRepository
-from app.api.helpers.exception import ExternalAPIUnreachableException
+from app.api.helpers.exception import (
+    ExternalAPICircuitOpenException,
+    ExternalAPIUnreachableException,
+)
 from app.settings import settings
 
 
@@ -25,102 +33,374 @@ def test_should_create_url_with_all_parameters():
         CurrencyExternalAPIRepository(settings)
     )
     list_currencies = ["BRL", "USD", "EUR"]
-    amount = 50.00
     base_currency = "BRL"
 
-    url = currency_external_api._url_builder(list_currencies, amount, base_currency)
+    url = currency_external_api._url_builder(list_currencies, base_currency)
 
-    assert (
-        url
-        == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR&places=2&amount=50.00&base=BRL"
-    )
+    assert url == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR&base=BRL"
 
 
-def test_should_create_url_with_missing_amount_parameters():
+def test_should_create_url_with_missing_list_currencies_parameters():
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
-    list_currencies = ["BRL", "USD", "EUR"]
-    amount = None
     base_currency = "BRL"
 
-    url = currency_external_api._url_builder(list_currencies, amount, base_currency)
+    url = currency_external_api._url_builder(base_currency=base_currency)
 
-    assert (
-        url
-        == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR&places=2&base=BRL"
-    )
+    assert url == "https://api.exchangerate.host/latest?base=BRL"
 
 
-def test_should_create_url_with_missing_list_currencies_parameters():
+def test_should_create_url_with_missing_base_currency_parameters():
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
     list_currencies = ["BRL", "USD", "EUR"]
-    amount = 50.00
-    base_currency = None
 
-    url = currency_external_api._url_builder(list_currencies, amount, base_currency)
+    url = currency_external_api._url_builder(list_currencies)
 
-    assert (
-        url
-        == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR&places=2&amount=50.00"
-    )
+    assert url == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR"
 
 
-@pytest.mark.asyncio
-@patch("app.api.currency.repository.currency_api.httpx.AsyncClient.get")
-async def test_should_create_url_with_missing_amount_and_list_currencies_parameters(
-    mock_httpx: MagicMock,
-):
+def test_should_create_url_without_parameters():
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
-    list_currencies = ["BRL", "USD", "EUR"]
-    amount = None
-    base_currency = None
 
-    url = currency_external_api._url_builder(list_currencies, amount, base_currency)
+    url = currency_external_api._url_builder()
 
-    assert url == "https://api.exchangerate.host/latest?symbols=BRL,USD,EUR&places=2"
+    assert url == "https://api.exchangerate.host/latest"
 
 
 @pytest.mark.asyncio
-@patch("app.api.currency.repository.currency_api.httpx.AsyncClient.get")
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
 async def test_shoud_get_currencies_rates(
     mock_httpx: MagicMock, exchangerate_api_response: dict
 ):
-    mock_httpx.return_value = Mock()
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
     mock_httpx.return_value.json.return_value = exchangerate_api_response
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
     list_currencies = ["BRL", "USD"]
-    result = await currency_external_api.get_currencies_price(list_currencies)
+    result = (await currency_external_api.get_rate_table()).rates_for(
+        None, list_currencies
+    )
     assert set(result) == set(exchangerate_api_response["rates"])
 
 
 @pytest.mark.asyncio
-@patch("app.api.currency.repository.currency_api.httpx.AsyncClient.get")
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
 async def test_shoud_raise_exception_when_external_api_is_off(mock_httpx: MagicMock):
     mock_httpx.side_effect = httpx.RequestError("error")
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
-    list_currencies = ["BRL", "USD", "EUR"]
     with pytest.raises(ExternalAPIUnreachableException):
-        await currency_external_api.get_currencies_price(list_currencies)
+        await currency_external_api.get_rate_table()
 
 
 @pytest.mark.asyncio
-@patch("app.api.currency.repository.currency_api.httpx.AsyncClient.get")
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
 async def test_shoud_return_false_when_iso_4217_does_not_exists(
-    mock_httpx: MagicMock, exchangerate_api_response: dict
+    mock_httpx: MagicMock, exchangerate_symbols_response: dict
 ):
-    mock_httpx.return_value = Mock()
-    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_symbols_response
     currency_external_api: CurrencyExternalAPIRepository = (
         CurrencyExternalAPIRepository(settings)
     )
     result = await currency_external_api.check_if_currency_exist("BRX")
     assert result == False
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_fetch_reference_rates_once_for_every_base_currency(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    first = (await currency_external_api.get_rate_table()).rates_for("BRL", ["USD"])
+    second = (await currency_external_api.get_rate_table()).rates_for(
+        "USD", ["BRL", "USD"]
+    )
+
+    assert first == {"USD": Decimal("0.2")}
+    assert second == {"BRL": Decimal("5"), "USD": Decimal("1")}
+    mock_httpx.assert_called_once_with(
+        "https://api.exchangerate.host/latest?base=EUR",
+        timeout=settings.currency_api_timeout,
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_check_iso_4217_against_cached_symbols(
+    mock_httpx: MagicMock, exchangerate_symbols_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_symbols_response
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    assert await currency_external_api.check_if_currency_exist("BRL") is True
+    assert await currency_external_api.check_if_currency_exist("USD") is True
+    assert await currency_external_api.check_if_currency_exist("BRX") is False
+    assert await currency_external_api.check_if_currency_exist("BRX") is False
+    assert mock_httpx.call_count == 1
+    mock_httpx.assert_called_once_with(
+        "https://api.exchangerate.host/symbols", timeout=settings.currency_api_timeout
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_serve_stale_rates_while_revalidating(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    stale_age = settings.currency_rates_refresh_interval + 1
+    rate_snapshot.rate_table = RateTable(
+        "BRL", {"USD": Decimal("0.19")}, fetched_at=time.time() - stale_age
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    result = (await currency_external_api.get_rate_table()).rates_for("BRL", ["USD"])
+
+    assert result == {"USD": Decimal("0.19")}
+    assert currency_external_api.rate_table.age() >= stale_age
+
+    await rate_snapshot.revalidation
+
+    assert rate_snapshot.rate_table.rates["USD"] == Decimal("0.2")
+    assert mock_httpx.call_count == 1
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_leave_revalidation_to_the_elected_worker(mock_httpx: MagicMock):
+    rate_snapshot.rate_table = RateTable(
+        "BRL",
+        {"USD": Decimal("0.19")},
+        fetched_at=time.time() - settings.currency_rates_refresh_interval - 1,
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with patch(
+        "app.api.currency.repository.currency_api.shared_rates"
+    ) as mock_shared_rates:
+        mock_shared_rates.is_attached = True
+        mock_shared_rates.is_leader = False
+        mock_shared_rates.read.return_value = None
+        result = (await currency_external_api.get_rate_table()).rates_for(
+            "BRL", ["USD"]
+        )
+
+    assert result == {"USD": Decimal("0.19")}
+    assert rate_snapshot.revalidation is None
+    assert mock_httpx.call_count == 0
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_fetch_rates_synchronously_past_max_staleness(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    rate_snapshot.rate_table = RateTable(
+        "BRL",
+        {"USD": Decimal("0.19")},
+        fetched_at=time.time() - settings.currency_rates_max_staleness - 1,
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    result = (await currency_external_api.get_rate_table()).rates_for("BRL", ["USD"])
+
+    assert result == {"USD": Decimal("0.2")}
+    assert currency_external_api.rate_table.age() < 1
+    assert rate_snapshot.revalidation is None
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_raise_exception_when_external_api_fails(mock_httpx: MagicMock):
+    mock_httpx.return_value = Mock(status_code=HTTP_503_SERVICE_UNAVAILABLE)
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with pytest.raises(ExternalAPIUnreachableException):
+        await currency_external_api.get_rate_table()
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_fail_fast_when_circuit_is_open(mock_httpx: MagicMock):
+    mock_httpx.side_effect = httpx.ConnectTimeout("timeout")
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    for _ in range(settings.currency_api_breaker_minimum_calls):
+        with pytest.raises(ExternalAPIUnreachableException):
+            await currency_external_api.get_rate_table()
+
+    with pytest.raises(ExternalAPICircuitOpenException):
+        await currency_external_api.get_rate_table()
+    assert mock_httpx.call_count == settings.currency_api_breaker_minimum_calls
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_serve_last_known_good_rates_when_external_api_is_off(
+    mock_httpx: MagicMock,
+):
+    mock_httpx.side_effect = httpx.RequestError("error")
+    rate_snapshot.rate_table = RateTable(
+        "BRL",
+        {"USD": Decimal("0.19")},
+        fetched_at=time.time() - settings.currency_rates_max_staleness - 1,
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    result = (await currency_external_api.get_rate_table()).rates_for("BRL", ["USD"])
+
+    assert result == {"USD": Decimal("0.19")}
+    assert currency_external_api.rates_stale is True
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_read_fresh_rates_from_shared_snapshot(mock_httpx: MagicMock):
+    rate_snapshot_repository = AsyncMock()
+    rate_snapshot_repository.get_latest_rate_table.return_value = RateTable(
+        "EUR", {"BRL": Decimal("5"), "USD": Decimal("1")}
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with patch.object(
+        CurrencyExternalAPIRepository,
+        "rate_snapshot_repository",
+        new_callable=PropertyMock,
+        return_value=rate_snapshot_repository,
+    ):
+        result = (await currency_external_api.get_rate_table()).rates_for(
+            "BRL", ["USD"]
+        )
+
+    assert result == {"USD": Decimal("0.2")}
+    mock_httpx.assert_not_called()
+    rate_snapshot_repository.save_rate_table.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_fetch_and_share_rates_when_shared_snapshot_is_old(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    rate_snapshot_repository = AsyncMock()
+    rate_snapshot_repository.get_latest_rate_table.return_value = RateTable(
+        "EUR",
+        {"BRL": Decimal("5"), "USD": Decimal("1")},
+        fetched_at=time.time() - settings.currency_rates_refresh_interval - 1,
+    )
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with patch.object(
+        CurrencyExternalAPIRepository,
+        "rate_snapshot_repository",
+        new_callable=PropertyMock,
+        return_value=rate_snapshot_repository,
+    ):
+        result = (await currency_external_api.get_rate_table()).rates_for(
+            "BRL", ["USD"]
+        )
+
+    assert result == {"USD": Decimal("0.2")}
+    rate_snapshot_repository.save_rate_table.assert_awaited_once_with(
+        rate_snapshot.rate_table
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_record_rate_history_when_fetching_rates(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    rate_history_repository = AsyncMock()
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with patch.object(
+        CurrencyExternalAPIRepository,
+        "rate_history_repository",
+        new_callable=PropertyMock,
+        return_value=rate_history_repository,
+    ):
+        await currency_external_api.get_rate_table()
+        await asyncio.gather(*rate_snapshot.history_recordings)
+
+    rate_history_repository.record_rate_table.assert_awaited_once_with(
+        rate_snapshot.rate_table
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.api.currency.repository.providers.httpx.AsyncClient.get")
+async def test_should_not_wait_for_rate_history_when_fetching_rates(
+    mock_httpx: MagicMock, exchangerate_api_response: dict
+):
+    mock_httpx.return_value = Mock(status_code=HTTP_200_OK)
+    mock_httpx.return_value.json.return_value = exchangerate_api_response
+    started, recorded = asyncio.Event(), asyncio.Event()
+
+    async def record_rate_table(_):
+        started.set()
+        await recorded.wait()
+
+    rate_history_repository = AsyncMock()
+    rate_history_repository.record_rate_table.side_effect = record_rate_table
+    currency_external_api: CurrencyExternalAPIRepository = (
+        CurrencyExternalAPIRepository(settings)
+    )
+
+    with patch.object(
+        CurrencyExternalAPIRepository,
+        "rate_history_repository",
+        new_callable=PropertyMock,
+        return_value=rate_history_repository,
+    ):
+        await asyncio.wait_for(currency_external_api.get_rate_table(), timeout=1)
+        await asyncio.wait_for(started.wait(), timeout=1)
+        (recording,) = rate_snapshot.history_recordings
+
+        assert not recording.done()
+        recorded.set()
+        await recording
+
+    assert not rate_snapshot.history_recordings
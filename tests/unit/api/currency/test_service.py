@@ -0,0 +1,278 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson.objectid import ObjectId
+
+from app.api.currency.model import (
+    CurrenciesBatchConversionInputSchema,
+    CurrenciesPriceInputSchema,
+    CurrencyBulkOperationSchema,
+    CurrencySchema,
+)
+from app.api.currency.rates import RateTable
+from app.api.currency.repository.currency_event import DELETE_EVENT
+from app.api.currency.services import CurrencyService
+from app.api.helpers.exception import InvalidDateRangeException, NoRateRecordedException
+from app.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_should_convert_amount_locally_with_unit_rates(
+    currencies_payload: list,
+):
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.get_currencies.return_value = [
+        CurrencySchema(**item) for item in currencies_payload
+    ]
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.check_if_currency_exist.return_value = (  # noqa
+        True
+    )
+    currency_service.currency_external_api_repository.get_rate_table.return_value = (
+        RateTable("BRL", {"USD": Decimal("0.19875")})
+    )
+
+    result = await currency_service.get_currencies_price(
+        CurrenciesPriceInputSchema(base_currency="BRL", amount="50.00")
+    )
+
+    assert [item.amount for item in result] == [Decimal("50.00"), Decimal("9.94")]
+    currency_service.currency_external_api_repository.get_rate_table.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_should_publish_event_when_deleting_currency():
+    _id = ObjectId()
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.invalidate_currencies_cache = MagicMock()
+    currency_service.currency_event_repository = AsyncMock()
+
+    await currency_service.delete_currency(str(_id))
+
+    currency_service.currency_repository.get_currency_by__id.assert_not_awaited()
+    currency_service.currency_repository.invalidate_currencies_cache.assert_called_once()
+    currency_service.currency_event_repository.append_event.assert_awaited_once_with(
+        DELETE_EVENT, _id
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_create_currency_without_reading_it_first():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.check_if_currency_exist.return_value = (  # noqa
+        True
+    )
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.invalidate_currencies_cache = MagicMock()
+    currency_service.currency_repository.create_currency.return_value = CurrencySchema(
+        name="Real", iso_4217="BRL"
+    )
+    currency_service.currency_event_repository = AsyncMock()
+
+    await currency_service.create_currency(CurrencySchema(name="Real", iso_4217="BRL"))
+
+    currency_service.currency_repository.get_currency_by_iso_4217.assert_not_awaited()
+    currency_service.currency_repository.create_currency.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_should_run_bulk_operations_with_per_item_results():
+    existing_id, missing_id, taken_id = ObjectId(), ObjectId(), ObjectId()
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.get_unknown_currencies.return_value = {  # noqa
+        "XNR"
+    }
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.invalidate_currencies_cache = MagicMock()
+    currency_service.currency_repository.get_iso_4217_by__id.return_value = {
+        existing_id: "BRL",
+        taken_id: "EUR",
+    }
+    currency_service.currency_repository.bulk_write.return_value = {2: 11000}
+    currency_service.currency_event_repository = AsyncMock()
+
+    results = await currency_service.bulk_currencies(
+        [
+            CurrencyBulkOperationSchema(action="create", name="Dolar", iso_4217="USD"),
+            CurrencyBulkOperationSchema(action="create", name="Nope", iso_4217="XNR"),
+            CurrencyBulkOperationSchema(action="update", _id=existing_id, name="Real"),
+            CurrencyBulkOperationSchema(
+                action="update", _id=existing_id, iso_4217="BRL"
+            ),
+            CurrencyBulkOperationSchema(action="delete", _id=missing_id),
+            CurrencyBulkOperationSchema(action="update", _id=taken_id, iso_4217="USD"),
+        ]
+    )
+
+    assert [result["status_code"] for result in results] == [
+        201,
+        404,
+        204,
+        409,
+        404,
+        409,
+    ]
+    assert results[0]["_id"] is not None
+    assert results[5]["error_code"] == "currency_already_exists_error"
+    requests = currency_service.currency_repository.bulk_write.await_args.args[0]
+    assert len(requests) == 3
+    currency_service.currency_repository.invalidate_currencies_cache.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_should_read_past_rate_history_only_once():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.rate_history_repository = AsyncMock()
+    currency_service.rate_history_repository.get_daily_rate_tables.return_value = {
+        date(2022, 4, 28): RateTable("EUR", {"BRL": Decimal("5"), "USD": Decimal("1")})
+    }
+
+    for _ in range(2):
+        history = await currency_service.get_rate_history(
+            "USD", "BRL", date(2022, 4, 27), date(2022, 4, 28)
+        )
+
+    assert history == [dict(date=date(2022, 4, 28), rate=Decimal("0.2"))]
+    currency_service.rate_history_repository.get_daily_rate_tables.assert_awaited_once_with(  # noqa
+        settings.currency_reference_base, date(2022, 4, 27), date(2022, 4, 28)
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_reject_rate_history_range_ending_before_start():
+    currency_service = CurrencyService(MagicMock(), settings)
+
+    with pytest.raises(InvalidDateRangeException):
+        await currency_service.get_rate_history(
+            "USD", "BRL", date(2022, 4, 29), date(2022, 4, 28)
+        )
+
+
+@pytest.mark.asyncio
+async def test_should_answer_rate_stats_from_rollups():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.rate_rollup_repository = AsyncMock()
+    currency_service.rate_rollup_repository.get_rate_stats.return_value = [
+        dict(min=1.0, max=1.2, sum=2.2, count=2, last=1.2, last_at=1)
+    ]
+
+    stats = await currency_service.get_rate_stats("USD", 7)
+
+    assert stats == dict(min=1.0, max=1.2, mean=1.1, last=1.2, count=2)
+    (
+        reference,
+        iso_4217,
+        periods,
+    ) = currency_service.rate_rollup_repository.get_rate_stats.call_args.args
+    assert (reference, iso_4217) == (settings.currency_reference_base, "USD")
+    assert sum(7 if period == "week" else 1 for period, _ in periods) == 7
+
+
+@pytest.mark.asyncio
+async def test_should_not_answer_rate_stats_without_recorded_rates():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.rate_rollup_repository = AsyncMock()
+    currency_service.rate_rollup_repository.get_rate_stats.return_value = []
+
+    with pytest.raises(NoRateRecordedException):
+        await currency_service.get_rate_stats("USD", 30)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rates", [{}, {"USD": Decimal(0)}])
+async def test_should_skip_and_report_currencies_without_rate(
+    currencies_payload: list, rates: dict
+):
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.get_currencies.return_value = [
+        CurrencySchema(**item) for item in currencies_payload
+    ]
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.check_if_currency_exist.return_value = (  # noqa
+        True
+    )
+    currency_service.currency_external_api_repository.get_rate_table.return_value = (
+        RateTable("BRL", rates)
+    )
+
+    result = await currency_service.get_currencies_price(
+        CurrenciesPriceInputSchema(base_currency="BRL", amount="50.00")
+    )
+
+    assert [item.iso_4217 for item in result] == ["BRL"]
+    assert currency_service.get_missing_rates() == ["USD"]
+
+
+@pytest.mark.asyncio
+async def test_should_check_bulk_iso_4217_while_unique_index_is_missing():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.get_unknown_currencies.return_value = (  # noqa
+        set()
+    )
+    currency_service.currency_repository = AsyncMock()
+    currency_service.currency_repository.invalidate_currencies_cache = MagicMock()
+    currency_service.currency_repository.has_unique_iso_4217_index.return_value = False
+    currency_service.currency_repository.get_existing_iso_4217.return_value = {"BRL"}
+    currency_service.currency_repository.bulk_write.return_value = {}
+    currency_service.currency_event_repository = AsyncMock()
+
+    results = await currency_service.bulk_currencies(
+        [
+            CurrencyBulkOperationSchema(action="create", name="Real", iso_4217="BRL"),
+            CurrencyBulkOperationSchema(action="create", name="Dolar", iso_4217="USD"),
+            CurrencyBulkOperationSchema(action="create", name="Dolar", iso_4217="USD"),
+        ]
+    )
+
+    assert [result["status_code"] for result in results] == [409, 201, 409]
+    requests = currency_service.currency_repository.bulk_write.await_args.args[0]
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_should_round_batch_amounts_as_decimals():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.currency_external_api_repository = AsyncMock()
+    currency_service.currency_external_api_repository.get_rate_table.return_value = (
+        RateTable("BRL", {"USD": Decimal("0.2")})
+    )
+
+    amounts, rates = await currency_service.convert_batch(
+        CurrenciesBatchConversionInputSchema(
+            amounts=[1.015, "2.5"],
+            base_currencies=["BRL", "USD"],
+            target_currencies=["BRL", "BRL"],
+        )
+    )
+
+    assert amounts == [1.02, 12.5]
+    assert rates.tolist() == [1.0, 5.0]
+
+
+@pytest.mark.asyncio
+async def test_should_not_cache_rate_history_of_a_day_still_settling():
+    currency_service = CurrencyService(MagicMock(), settings)
+    currency_service.rate_history_repository = AsyncMock()
+    currency_service.rate_history_repository.get_daily_rate_tables.return_value = {}
+    end_of_day = datetime(2022, 4, 29, tzinfo=timezone.utc)
+
+    for seconds_after_end in (1, settings.rate_history_settle_time + 1, 0):
+        with patch("app.api.currency.services.datetime") as mock_datetime:
+            mock_datetime.now.return_value = end_of_day + timedelta(
+                seconds=seconds_after_end
+            )
+            await currency_service.get_rate_history(
+                "USD", "BRL", date(2022, 4, 28), date(2022, 4, 28)
+            )
+
+    assert (
+        currency_service.rate_history_repository.get_daily_rate_tables.await_count == 2
+    )
@@ -0,0 +1,111 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.api.currency.rates import RateTable
+from app.api.currency.shared_rates import VERSION, VERSION_OFFSET, SharedRateTable
+
+
+@pytest.fixture()
+def shared_rate_tables():
+    name = f"test_rates_{uuid.uuid4().hex[:8]}"
+    writer = SharedRateTable(name, capacity=8)
+    reader = SharedRateTable(name, capacity=8)
+    writer.attach()
+    reader.attach()
+    yield writer, reader
+    writer._segment.unlink()
+    writer.detach()
+    reader.detach()
+
+
+def test_should_read_nothing_before_first_publish(shared_rate_tables):
+    _, reader = shared_rate_tables
+
+    assert reader.read() is None
+
+
+def test_should_read_published_rate_table(shared_rate_tables):
+    writer, reader = shared_rate_tables
+    writer.publish(
+        RateTable("EUR", {"BRL": Decimal("5.2285")}, fetched_at=1651190400.0)
+    )
+
+    rate_table = reader.read()
+
+    assert rate_table.reference == "EUR"
+    assert rate_table.rates == {"BRL": Decimal("5.2285"), "EUR": Decimal(1)}
+    assert rate_table.fetched_at == 1651190400.0
+    assert reader.read() is rate_table
+
+
+def test_should_read_new_version_after_publish(shared_rate_tables):
+    writer, reader = shared_rate_tables
+    writer.publish(RateTable("EUR", {"BRL": Decimal("5.2285")}))
+    reader.read()
+
+    writer.publish(RateTable("EUR", {"BRL": Decimal("5.3")}))
+
+    assert reader.read().rates["BRL"] == Decimal("5.3")
+
+
+def test_should_keep_previous_table_while_writer_is_publishing(shared_rate_tables):
+    writer, reader = shared_rate_tables
+    writer.publish(RateTable("EUR", {"BRL": Decimal("5.2285")}))
+    rate_table = reader.read()
+
+    VERSION.pack_into(writer._segment.buf, VERSION_OFFSET, 3)
+
+    assert reader.read() is rate_table
+
+
+def test_should_elect_a_single_leader(shared_rate_tables):
+    writer, reader = shared_rate_tables
+
+    assert writer.try_become_leader() is True
+    assert reader.try_become_leader() is False
+
+
+def test_should_not_publish_more_rates_than_capacity(shared_rate_tables):
+    writer, _ = shared_rate_tables
+    rates = {f"C{index:02d}": Decimal(index) for index in range(10)}
+
+    with pytest.raises(ValueError):
+        writer.publish(RateTable("EUR", rates))
+
+
+def test_should_read_rates_exactly_as_published(shared_rate_tables):
+    writer, reader = shared_rate_tables
+    rate = Decimal("0.0000234567891234567891")
+    writer.publish(RateTable("EUR", {"BTC": rate}))
+
+    assert reader.read().rates["BTC"] == rate
+
+
+def test_should_not_publish_codes_longer_than_3_letters(shared_rate_tables):
+    writer, reader = shared_rate_tables
+    writer.publish(RateTable("EUR", {"BRL": Decimal("5.2285")}))
+
+    with pytest.raises(ValueError):
+        writer.publish(RateTable("EUR", {"USDT": Decimal("1.08")}))
+
+    assert reader.read().rates["BRL"] == Decimal("5.2285")
+
+
+def test_should_recreate_a_segment_left_too_small():
+    name = f"test_rates_{uuid.uuid4().hex[:8]}"
+    old = SharedRateTable(name, capacity=1)
+    old.attach()
+    grown = SharedRateTable(name, capacity=8)
+
+    grown.attach()
+    grown.publish(
+        RateTable("EUR", {f"X{index:02}": Decimal(index) for index in range(7)})
+    )
+
+    assert grown._segment.size >= grown.size
+    assert len(grown.read().rates) == 8
+    grown._segment.unlink()
+    grown.detach()
+    old.detach()
@@ -0,0 +1,65 @@
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.api.currency.symbols import CurrencySymbols
+from app.api.helpers.exception import ExternalAPIUnreachableException
+
+
+@pytest.mark.asyncio
+async def test_should_replace_symbols_on_refresh():
+    currency_symbols = CurrencySymbols(negative_ttl=60)
+    loader = AsyncMock(return_value={"BRL", "USD"})
+
+    await currency_symbols.refresh(loader)
+
+    assert currency_symbols.is_loaded
+    assert "BRL" in currency_symbols
+    assert "XMR" not in currency_symbols
+
+
+@pytest.mark.asyncio
+async def test_should_keep_symbols_when_refresh_fails():
+    currency_symbols = CurrencySymbols(negative_ttl=60)
+    currency_symbols.replace({"BRL"})
+    loader = AsyncMock(side_effect=ExternalAPIUnreachableException)
+
+    await currency_symbols.safe_refresh(loader)
+
+    assert "BRL" in currency_symbols
+
+
+@pytest.mark.asyncio
+async def test_should_keep_symbols_when_answer_is_malformed():
+    currency_symbols = CurrencySymbols(negative_ttl=60)
+    currency_symbols.replace({"BRL"})
+    loader = AsyncMock(side_effect=KeyError("symbols"))
+
+    await currency_symbols.safe_refresh(loader)
+
+    assert "BRL" in currency_symbols
+
+
+@pytest.mark.asyncio
+async def test_should_not_request_refresh_inside_negative_cache_window():
+    currency_symbols = CurrencySymbols(negative_ttl=60)
+    currency_symbols.replace({"BRL"})
+    loader = AsyncMock(return_value={"BRL", "USD"})
+
+    currency_symbols.request_refresh(loader)
+
+    assert currency_symbols._refresh_task is None
+
+
+@pytest.mark.asyncio
+async def test_should_request_refresh_after_negative_cache_window():
+    currency_symbols = CurrencySymbols(negative_ttl=60)
+    currency_symbols.replace({"BRL"})
+    currency_symbols.loaded_at = time.monotonic() - 61
+    loader = AsyncMock(return_value={"BRL", "USD"})
+
+    currency_symbols.request_refresh(loader)
+    await currency_symbols._refresh_task
+
+    assert "USD" in currency_symbols
@@ -0,0 +1,39 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.currency import tasks
+
+
+@pytest.mark.asyncio
+async def test_should_keep_refreshing_rates_after_malformed_answer():
+    with patch.object(
+        tasks.CurrencyExternalAPIRepository,
+        "refresh_rate_table",
+        new_callable=AsyncMock,
+        side_effect=KeyError("rates"),
+    ) as refresh_rate_table, patch.object(tasks.logging, "exception") as log:
+        await tasks._refresh_currency_rates()
+
+    refresh_rate_table.assert_awaited_once()
+    log.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_should_not_wait_for_upstream_when_starting_rates_refresher():
+    with patch.object(
+        tasks, "_refresh_currency_rates", new_callable=AsyncMock
+    ) as refresh_currency_rates:
+        await tasks.start_currency_rates_refresher()
+        refresh_currency_rates.assert_not_awaited()
+        await tasks.stop_currency_rates_refresher()
+
+
+@pytest.mark.asyncio
+async def test_should_not_wait_for_upstream_when_starting_symbols_refresher():
+    with patch.object(
+        tasks.CurrencyExternalAPIRepository, "get_symbols", new_callable=AsyncMock
+    ) as get_symbols:
+        await tasks.start_currency_symbols_refresher()
+        get_symbols.assert_not_awaited()
+        await tasks.stop_currency_symbols_refresher()
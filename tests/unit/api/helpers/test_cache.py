@@ -0,0 +1,30 @@
+import time
+
+from app.api.helpers.cache import TTLCache
+
+
+def test_should_get_value_before_it_expires():
+    cache = TTLCache(ttl=60)
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert "key" in cache
+
+
+def test_should_expire_value_after_ttl():
+    cache = TTLCache(ttl=60)
+    cache.set("key", "value")
+    cache._entries["key"] = (time.monotonic() - 1, "value")
+
+    assert cache.get("key", "default") == "default"
+    assert "key" not in cache
+
+
+def test_should_not_set_value_loaded_before_invalidation():
+    cache = TTLCache(ttl=60)
+    generation = cache.generation
+
+    cache.invalidate("key")
+    cache.set("key", "stale", generation)
+
+    assert cache.get("key") is None
@@ -0,0 +1,94 @@
+import pytest
+
+from app.api.helpers.circuit_breaker import CircuitBreaker
+from app.api.helpers.exception import (
+    ExternalAPICircuitOpenException,
+    ExternalAPIUnreachableException,
+)
+
+
+@pytest.fixture()
+def circuit_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_rate_threshold=0.5, window_size=4, minimum_calls=4, open_timeout=30
+    )
+
+
+async def failing_call():
+    raise ExternalAPIUnreachableException
+
+
+async def successful_call():
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_should_stay_closed_below_failure_rate(circuit_breaker: CircuitBreaker):
+    for call in (successful_call, successful_call, successful_call, failing_call):
+        try:
+            await circuit_breaker.call(call)
+        except ExternalAPIUnreachableException:
+            pass
+
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_should_open_at_failure_rate(circuit_breaker: CircuitBreaker):
+    for call in (successful_call, successful_call, failing_call, failing_call):
+        try:
+            await circuit_breaker.call(call)
+        except ExternalAPIUnreachableException:
+            pass
+
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(ExternalAPICircuitOpenException):
+        await circuit_breaker.call(successful_call)
+
+
+@pytest.mark.asyncio
+async def test_should_close_after_successful_probe(circuit_breaker: CircuitBreaker):
+    circuit_breaker._open()
+    circuit_breaker.open_timeout = 0
+
+    assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    assert await circuit_breaker.call(successful_call) == "ok"
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_should_reopen_after_failed_probe(circuit_breaker: CircuitBreaker):
+    circuit_breaker._open()
+    circuit_breaker.open_timeout = 0
+
+    with pytest.raises(ExternalAPIUnreachableException):
+        await circuit_breaker.call(failing_call)
+
+    assert circuit_breaker.opened_count == 2
+
+
+def test_should_let_a_single_probe_through(circuit_breaker: CircuitBreaker):
+    circuit_breaker._open()
+    circuit_breaker.open_timeout = 0
+
+    assert circuit_breaker.accepts_calls is True
+    assert circuit_breaker.allow_request() is True
+    assert circuit_breaker.accepts_calls is False
+    assert circuit_breaker.allow_request() is False
+
+
+@pytest.mark.asyncio
+async def test_should_ignore_a_call_started_before_opening(
+    circuit_breaker: CircuitBreaker,
+):
+    async def call_failing_after_opening():
+        circuit_breaker._open()
+        circuit_breaker.open_timeout = 0
+        assert circuit_breaker.allow_request() is True
+        raise ExternalAPIUnreachableException
+
+    with pytest.raises(ExternalAPIUnreachableException):
+        await circuit_breaker.call(call_failing_after_opening)
+
+    assert circuit_breaker.opened_count == 1
+    assert circuit_breaker.allow_request() is False
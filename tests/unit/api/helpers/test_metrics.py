@@ -0,0 +1,21 @@
+from app.api.helpers.metrics import Histogram, MetricsRegistry
+
+
+def test_should_count_observations_in_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    stats = histogram.stats()
+    assert stats["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert stats["count"] == 4
+    assert stats["sum"] == 2.65
+    assert stats["max"] == 2.0
+
+
+def test_should_collect_registered_metrics():
+    registry = MetricsRegistry()
+    registry.register("component", lambda: {"value": 1})
+
+    assert registry.collect() == {"component": {"value": 1}}
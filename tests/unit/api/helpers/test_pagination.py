@@ -0,0 +1,17 @@
+import pytest
+from bson.objectid import ObjectId
+
+from app.api.helpers.exception import InvalidPageCursorException
+from app.api.helpers.pagination import decode_page_cursor, encode_page_cursor
+
+
+def test_should_round_trip_page_cursor():
+    _id = ObjectId()
+
+    assert decode_page_cursor(encode_page_cursor(_id)) == _id
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", "AAAA", "é"])
+def test_should_reject_invalid_page_cursor(token: str):
+    with pytest.raises(InvalidPageCursorException):
+        decode_page_cursor(token)
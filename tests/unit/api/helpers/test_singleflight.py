@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.api.helpers.exception import ExternalAPIUnreachableException
+from app.api.helpers.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_should_coalesce_concurrent_calls_with_same_key():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"BRL": 1}
+
+    results = await asyncio.gather(
+        *[single_flight.do("latest?base=BRL", call) for _ in range(10)]
+    )
+
+    assert results == [{"BRL": 1}] * 10
+    assert calls == 1
+    assert single_flight.stats() == {
+        "issued": 1,
+        "coalesced": 9,
+        "in_flight": 0,
+        "fan_in_ratio": 10.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_should_not_coalesce_calls_with_different_keys():
+    single_flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+
+    await asyncio.gather(
+        single_flight.do("latest?base=BRL", call),
+        single_flight.do("latest?base=USD", call),
+    )
+
+    assert single_flight.issued == 2
+    assert single_flight.coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_should_share_errors_without_caching_them():
+    single_flight = SingleFlight()
+
+    async def failing_call():
+        await asyncio.sleep(0.01)
+        raise ExternalAPIUnreachableException
+
+    async def call():
+        return "ok"
+
+    results = await asyncio.gather(
+        single_flight.do("key", failing_call),
+        single_flight.do("key", failing_call),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, ExternalAPIUnreachableException) for r in results)
+    assert await single_flight.do("key", call) == "ok"
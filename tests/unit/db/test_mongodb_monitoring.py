@@ -0,0 +1,36 @@
+from unittest.mock import Mock
+
+from app.db.mongodb_monitoring import MongoCommandListener, MongoPoolListener
+
+
+def test_should_record_command_latency_and_failures():
+    listener = MongoCommandListener()
+
+    listener.succeeded(Mock(command_name="find", duration_micros=2000))
+    listener.failed(Mock(command_name="insert", duration_micros=500))
+
+    stats = listener.stats()
+    assert stats["find"]["count"] == 1
+    assert stats["find"]["sum"] == 0.002
+    assert stats["find"]["failures"] == 0
+    assert stats["insert"]["failures"] == 1
+
+
+def test_should_record_pool_checkout_waits():
+    listener = MongoPoolListener()
+
+    listener.connection_created(Mock())
+    listener.connection_check_out_started(Mock())
+    listener.connection_checked_out(Mock())
+    listener.connection_check_out_started(Mock())
+    listener.connection_check_out_failed(Mock(reason="timeout"))
+
+    stats = listener.stats()
+    assert stats["checkout_wait"]["count"] == 2
+    assert stats["checkout_failures"] == {"timeout": 1}
+    assert stats["connections"] == 1
+    assert stats["checked_out"] == 1
+
+    listener.connection_checked_in(Mock())
+
+    assert listener.stats()["checked_out"] == 0
@@ -0,0 +1,59 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pymongo import ReadPreference
+
+from app.db.mongodb import db
+from app.db.mongodb_utils import (
+    build_mongo_client,
+    close_mongo_connection,
+    connect_to_mongo,
+    get_read_preference,
+    warm_up_mongo_client,
+)
+from app.settings import settings
+
+
+def test_should_build_mongo_client_with_pool_settings():
+    tuned_settings = settings.copy(
+        update={
+            "mongo_max_idle_time_ms": 60000,
+            "mongo_wait_queue_timeout_ms": 500,
+            "mongo_server_selection_timeout_ms": 2000,
+        }
+    )
+
+    client = build_mongo_client(tuned_settings)
+
+    pool_options = client.delegate.options.pool_options
+    assert pool_options.max_idle_time_seconds == 60
+    assert pool_options.wait_queue_timeout == 0.5
+    assert client.delegate.options.server_selection_timeout == 2
+    client.close()
+
+
+def test_should_get_read_preference_by_name():
+    assert (
+        get_read_preference("secondaryPreferred") == ReadPreference.SECONDARY_PREFERRED
+    )
+
+
+@pytest.mark.asyncio
+async def test_should_open_min_pool_connections_on_warm_up():
+    client = MagicMock()
+    client.admin.command = AsyncMock()
+
+    await warm_up_mongo_client(client, 3)
+
+    assert client.admin.command.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_should_connect_when_warm_up_fails():
+    with patch("app.db.mongodb_utils.warm_up_mongo_client", new=AsyncMock()) as warm_up:
+        warm_up.side_effect = asyncio.TimeoutError
+        await connect_to_mongo()
+
+    assert db.client is not None
+    await close_mongo_connection()
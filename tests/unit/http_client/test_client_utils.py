@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.http_client.client import get_http_client, http_client
+from app.http_client.client_utils import (
+    build_http_client,
+    close_http_client,
+    get_or_open_http_client,
+    open_http_client,
+)
+from app.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_should_open_and_close_shared_http_client():
+    await open_http_client()
+    client = await get_http_client()
+
+    assert isinstance(client, httpx.AsyncClient)
+    assert get_or_open_http_client() is client
+
+    await close_http_client()
+
+    assert client.is_closed
+    assert http_client.client is None
+
+
+@pytest.mark.asyncio
+async def test_should_build_http_client_with_settings_timeouts():
+    client = build_http_client(settings)
+
+    assert client.timeout.read == settings.currency_api_timeout
+    assert client.timeout.connect == settings.currency_api_connect_timeout
+
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+@patch("app.http_client.client_utils.is_http2_available")
+async def test_should_fallback_to_http1_when_h2_is_missing(mock_is_http2_available):
+    mock_is_http2_available.return_value = False
+
+    client = build_http_client(settings)
+
+    assert client._transport._pool._http2 is False
+
+    await client.aclose()